@@ -1,4 +1,11 @@
-from .dds_evrika_plugin import DDSEvrikaPlugin
+try:
+    from krita import Krita
+except ImportError:
+    # Пакет импортирован вне Krita (например, бенчмарк): расширение не регистрируется
+    Krita = None
 
-# Registering the plugin in Krita
-Krita.instance().addExtension(DDSEvrikaPlugin(Krita.instance()))
+if Krita is not None:
+    from .dds_evrika_plugin import DDSEvrikaPlugin
+
+    # Registering the plugin in Krita
+    Krita.instance().addExtension(DDSEvrikaPlugin(Krita.instance()))
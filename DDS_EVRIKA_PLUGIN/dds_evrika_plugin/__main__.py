@@ -0,0 +1,6 @@
+import sys
+
+from .cli import main
+
+# python -m dds_evrika_plugin manifest.json - пакетная конвертация без Krita
+sys.exit(main())
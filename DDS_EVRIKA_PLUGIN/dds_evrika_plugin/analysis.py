@@ -0,0 +1,151 @@
+from .endpoints import np
+from . import dds_decoder
+from . import dds_encoder
+
+# Автовыбор формата сжатия ("auto"): один проход NumPy по пикселям собирает
+# признаки (альфа: нет / 1 бит / плавная; карта нормалей) и
+# выборку блоков 4x4. Кандидаты проверяются от самого дешёвого: выборка кодируется
+# и декодируется обратно, и берётся первый формат, чей PSNR не ниже порога.
+
+# Значение сжатия, при котором формат выбирается анализом изображения
+AUTO_COMPRESSION = "auto"
+# Формат для "auto", когда анализ недоступен (нет NumPy)
+FALLBACK_COMPRESSION = "dxt5"
+# Минимальный PSNR (дБ) пробного сжатия, при котором дешёвый формат принимается
+MIN_PSNR = 38.0
+# Сколько блоков 4x4 (примерно) проверяется пробным сжатием
+SAMPLE_BLOCKS = 4096
+# Доли пикселей, начиная с которых изображение считается серым / картой нормалей
+GRAYSCALE_SHARE = 0.99
+NORMAL_MAP_SHARE = 0.95
+# Шаг прореживания по строкам и столбцам для оценки цветовых признаков
+COLOR_STEP = 4
+# Строк за один шаг анализа (ограничивает временные массивы)
+CHUNK_ROWS = 256  # кратно COLOR_STEP
+
+
+def available():
+    return np is not None
+
+
+def known_compression(compression):
+    """Формат, известный до анализа пикселей; None - его выберет ``choose_compression``."""
+    if compression != AUTO_COMPRESSION:
+        return compression
+    # Без NumPy анализ невозможен: DXT5 сохраняет любую альфу
+    return None if available() else FALLBACK_COMPRESSION
+
+
+class CompressionChoice:
+    """Выбранный формат, найденные признаки изображения и PSNR пробного сжатия ``trial_format``."""
+
+    def __init__(self, compression_format, traits, trial_format=None, psnr=None):
+        self.format = compression_format
+        self.traits = traits
+        self.trial_format = trial_format
+        self.psnr = psnr
+
+
+class CompressionAnalysis:
+    """Accumulates image statistics for rows fed top to bottom with ``add``.
+
+    The whole image may be passed at once; the streaming export feeds strips.
+    Blocks for the trial compression are sampled with a fixed stride over the
+    block grid, so the result does not depend on the strip height.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.pixels = 0
+        self.opaque = True
+        self.binary_alpha = True
+        self.color_pixels = 0
+        self.gray_pixels = 0
+        self.normal_pixels = 0
+        blocks_x = (width + 3) // 4
+        self.stride = max(1, blocks_x * ((height + 3) // 4) // SAMPLE_BLOCKS)
+        self._blocks_x = blocks_x
+        self._block_index = 0
+        self._samples = []
+        self._pending = None
+
+    def add(self, rgba):
+        for start in range(0, rgba.shape[0], CHUNK_ROWS):
+            self._scan(rgba[start:start + CHUNK_ROWS])
+        # Выборка блоков: строки копятся до целого ряда блоков
+        rows = rgba if self._pending is None else np.concatenate([self._pending, rgba])
+        complete = rows.shape[0] if self.pixels >= self.width * self.height else rows.shape[0] // 4 * 4
+        self._pending = rows[complete:].copy() if complete < rows.shape[0] else None
+        if complete:
+            count = (complete + 3) // 4 * self._blocks_x
+            local = np.arange(-self._block_index % self.stride, count, self.stride)
+            # Пиксели выбранных блоков в порядке image_to_blocks (края - повтором)
+            offsets = np.arange(16)
+            ys = np.minimum((local // self._blocks_x)[:, None] * 4 + offsets // 4, complete - 1)
+            xs = np.minimum((local % self._blocks_x)[:, None] * 4 + offsets % 4, self.width - 1)
+            self._samples.append(rows[ys, xs])
+            self._block_index += count
+
+    def _scan(self, rgba):
+        alpha = rgba[..., 3]
+        self.pixels += alpha.size
+        if self.opaque and alpha.min() < 255:
+            self.opaque = False
+        if self.binary_alpha and ((alpha > 0) & (alpha < 255)).any():
+            self.binary_alpha = False
+
+        # Доли серых пикселей и нормалей оцениваются по каждому COLOR_STEP-му пикселю
+        color = rgba[::COLOR_STEP, ::COLOR_STEP, :3].astype(np.int16)
+        self.color_pixels += color.shape[0] * color.shape[1]
+        spread = np.maximum(np.abs(color[..., 0] - color[..., 1]), np.abs(color[..., 1] - color[..., 2]))
+        self.gray_pixels += int(np.count_nonzero(spread <= 2))
+
+        # Карта нормалей: цвет - единичный вектор (x, y, z) с z, смотрящим наружу
+        vector = color.astype(np.float32) / 127.5 - 1.0
+        length = np.sqrt((vector * vector).sum(axis=-1))
+        self.normal_pixels += int(np.count_nonzero((np.abs(length - 1.0) < 0.1) & (vector[..., 2] > 0.0)))
+
+    def traits(self):
+        traits = ["opaque" if self.opaque else "binary_alpha" if self.binary_alpha else "smooth_alpha"]
+        total = max(1, self.color_pixels)
+        # Светло-серые пиксели (около 201, 201, 201) тоже выглядят единичными векторами
+        grayscale = self.gray_pixels / total >= GRAYSCALE_SHARE
+        if not grayscale and self.normal_pixels / total >= NORMAL_MAP_SHARE:
+            traits.append("normal_map")
+        return traits
+
+    def choose(self):
+        """Самый дешёвый формат, пробное сжатие которого даёт PSNR не ниже MIN_PSNR."""
+        traits = self.traits()
+        if "normal_map" in traits:
+            # BC1/BC3 искажают направление нормалей заметнее, чем показывает PSNR
+            return CompressionChoice("bc7", traits)
+        # BC1 хранит 1-битную альфу, плавной нужен BC3; BC7 - если их качества не хватает
+        cheap = "dxt1" if self.opaque or self.binary_alpha else "dxt5"
+        samples = np.concatenate(self._samples) if self._samples else np.zeros((0, 16, 4), dtype=np.uint8)
+        psnr = trial_psnr(samples, cheap)
+        return CompressionChoice(cheap if psnr >= MIN_PSNR else "bc7", traits, cheap, psnr)
+
+
+def trial_psnr(blocks, compression_format):
+    """PSNR блоков (N, 16, 4) после сжатия и распаковки; цвет прозрачных пикселей не учитывается."""
+    if not blocks.shape[0]:
+        return float("inf")
+    fmt = dds_encoder.COMPRESSION_FORMATS[compression_format]
+    encoded = dds_encoder.encode_blocks(blocks, fmt, quality="fast", threads=1)
+    decoded = dds_decoder.BLOCK_DECODERS[fmt](encoded).astype(np.float32)
+    source = blocks.astype(np.float32)
+    error = (decoded - source) ** 2
+    error[..., :3] *= (blocks[..., 3:] > 0)
+    mse = error.mean()
+    if mse == 0:
+        return float("inf")
+    return float(10.0 * np.log10(255.0 ** 2 / mse))
+
+
+def choose_compression(rgba):
+    """Формат для изображения целиком (см. ``CompressionAnalysis``)."""
+    analysis = CompressionAnalysis(rgba.shape[1], rgba.shape[0])
+    analysis.add(rgba)
+    return analysis.choose()
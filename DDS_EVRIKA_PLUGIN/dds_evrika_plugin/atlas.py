@@ -0,0 +1,198 @@
+import json
+import os
+
+from .endpoints import np
+
+# Атлас текстур: спрайты (слои документа или открытые документы) укладываются
+# упаковщиком skyline (нижний левый угол) в одно изображение, которое затем
+# сжимается как обычный экспорт, а рядом с .dds пишется JSON с координатами и UV.
+# Ячейка каждого спрайта - спрайт плюс отступ, округлённые до блока 4x4; все
+# ячейки начинаются на границе блока, поэтому ни один блок BCn не смешивает
+# пиксели двух спрайтов. Отступ заполняется повтором краевых пикселей спрайта.
+
+BLOCK = 4
+MAX_ATLAS_SIZE = 16384
+DEFAULT_PADDING = 4
+UV_MAP_VERSION = 1
+
+
+class AtlasError(ValueError):
+    """Спрайты не помещаются в атлас максимального размера."""
+
+
+def _align(value):
+    return (value + BLOCK - 1) // BLOCK * BLOCK
+
+
+class SkylinePacker:
+    """Skyline bottom-left packer for a fixed ``width`` x ``height`` area.
+
+    The skyline is a list of ``[x, y, width]`` segments covering the atlas
+    width; a rectangle is placed where its top edge ends up lowest.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.skyline = [[0, 0, width]]
+
+    def insert(self, width, height):
+        """Место (x, y) для прямоугольника или None, если он не помещается."""
+        best = None
+        for index, (x, _, _) in enumerate(self.skyline):
+            y = self._fit(index, width, height)
+            if y is not None and (best is None or (y + height, x) < best[0]):
+                best = ((y + height, x), index, x, y)
+        if best is None:
+            return None
+        _, index, x, y = best
+        self._add(index, x, y, width, height)
+        return x, y
+
+    def _fit(self, index, width, height):
+        x = self.skyline[index][0]
+        if x + width > self.width:
+            return None
+        y = 0
+        remaining = width
+        while remaining > 0:
+            y = max(y, self.skyline[index][1])
+            if y + height > self.height:
+                return None
+            remaining -= self.skyline[index][2]
+            index += 1
+        return y
+
+    def _add(self, index, x, y, width, height):
+        self.skyline.insert(index, [x, y + height, width])
+        # Сегменты под новым прямоугольником укорачиваются или удаляются
+        end = x + width
+        following = index + 1
+        while following < len(self.skyline) and self.skyline[following][0] < end:
+            segment = self.skyline[following]
+            overlap = end - segment[0]
+            if overlap >= segment[2]:
+                del self.skyline[following]
+                continue
+            segment[0] += overlap
+            segment[2] -= overlap
+            break
+        # Соседние сегменты одной высоты сливаются
+        merged = [self.skyline[0]]
+        for segment in self.skyline[1:]:
+            if segment[1] == merged[-1][1]:
+                merged[-1][2] += segment[2]
+            else:
+                merged.append(segment)
+        self.skyline = merged
+
+
+class AtlasLayout:
+    """Размер атласа и прямоугольники спрайтов ``rects`` (x, y, w, h) в порядке входа."""
+
+    def __init__(self, width, height, rects, padding):
+        self.width = width
+        self.height = height
+        self.rects = rects
+        self.padding = padding
+
+
+def _cell(size, padding):
+    return _align(size[0] + 2 * padding), _align(size[1] + 2 * padding)
+
+
+def _try_pack(cells, order, width, height):
+    packer = SkylinePacker(width, height)
+    positions = [None] * len(cells)
+    for index in order:
+        position = packer.insert(*cells[index])
+        if position is None:
+            return None
+        positions[index] = position
+    return positions
+
+
+def _candidate_sizes(cells, power_of_two, max_size):
+    """Размеры атласа по возрастанию площади, начиная с суммарной площади ячеек."""
+    area = sum(w * h for w, h in cells)
+    min_width = max(w for w, _ in cells)
+    min_height = max(h for _, h in cells)
+    sides = []
+    side = BLOCK
+    while side <= max_size:
+        sides.append(side)
+        # Без степеней двойки стороны растут примерно на 1/16, оставаясь кратными блоку
+        side = side * 2 if power_of_two else max(side + BLOCK, _align(side * 17 // 16))
+    candidates = [(w * h, max(w, h), w, h) for w in sides for h in sides
+                  if w >= min_width and h >= min_height and w * h >= area]
+    return [(w, h) for _, _, w, h in sorted(candidates)]
+
+
+def pack(sizes, padding=DEFAULT_PADDING, power_of_two=True, max_size=MAX_ATLAS_SIZE):
+    """Разместить спрайты размеров ``sizes`` [(w, h)] в наименьшем подходящем атласе.
+
+    With ``power_of_two`` both atlas sides are powers of two, which the mip
+    chain needs; otherwise they are multiples of 4. Raises ``AtlasError`` if
+    the sprites do not fit into ``max_size`` x ``max_size``.
+    """
+    if not sizes:
+        raise AtlasError("No sprites to pack")
+    cells = [_cell(size, padding) for size in sizes]
+    # Высокие спрайты первыми: skyline остаётся ровнее
+    order = sorted(range(len(cells)), key=lambda index: (cells[index][1], cells[index][0]), reverse=True)
+    for width, height in _candidate_sizes(cells, power_of_two, max_size):
+        positions = _try_pack(cells, order, width, height)
+        if positions is not None:
+            rects = [(x + padding, y + padding, w, h) for (x, y), (w, h) in zip(positions, sizes)]
+            return AtlasLayout(width, height, rects, padding)
+    raise AtlasError(f"The sprites do not fit into a {max_size}x{max_size} atlas")
+
+
+def compose(images, layout):
+    """Собрать атлас RGBA (h, w, 4) из ``images`` по ``layout``; отступы - повтор краёв."""
+    atlas = np.zeros((layout.height, layout.width, 4), dtype=np.uint8)
+    padding = layout.padding
+    for image, (x, y, w, h) in zip(images, layout.rects):
+        cell_width, cell_height = _cell((w, h), padding)
+        rows = np.clip(np.arange(cell_height) - padding, 0, h - 1)
+        columns = np.clip(np.arange(cell_width) - padding, 0, w - 1)
+        atlas[y - padding:y - padding + cell_height, x - padding:x - padding + cell_width] = image[rows][:, columns]
+    return atlas
+
+
+def unique_names(names):
+    """Имена спрайтов без повторов: "name", "name (2)", ..."""
+    used = set()
+    result = []
+    for name in names:
+        candidate = name or "sprite"
+        counter = 1
+        while candidate in used:
+            counter += 1
+            candidate = f"{name or 'sprite'} ({counter})"
+        used.add(candidate)
+        result.append(candidate)
+    return result
+
+
+def uv_map(image_name, layout, names):
+    """Описание атласа для JSON: пиксельные прямоугольники и UV (0..1, начало сверху слева)."""
+    sprites = {}
+    for name, (x, y, w, h) in zip(unique_names(names), layout.rects):
+        sprites[name] = {
+            "x": x, "y": y, "w": w, "h": h,
+            "uv": [x / layout.width, y / layout.height, (x + w) / layout.width, (y + h) / layout.height],
+        }
+    return {"version": UV_MAP_VERSION, "image": image_name, "width": layout.width, "height": layout.height,
+            "padding": layout.padding, "sprites": sprites}
+
+
+def uv_map_path(save_file):
+    return os.path.splitext(save_file)[0] + ".json"
+
+
+def write_uv_map(path, data):
+    temp_path = path + ".part"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1, ensure_ascii=False)
+    os.replace(temp_path, path)
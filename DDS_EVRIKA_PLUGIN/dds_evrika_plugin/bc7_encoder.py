@@ -0,0 +1,377 @@
+from .bc_tables import PARTITIONS_2, ANCHORS_2, WEIGHTS
+from .endpoints import np, principal_endpoints, least_squares_endpoints
+
+# Встроенный кодировщик BC7 на NumPy. Уровни качества ограничивают перебор режимов:
+#   fast      - режим 6 (одно подмножество RGBA), конечные точки по PCA, и режим 5
+#               (цвет и альфа с отдельными индексами) для блоков с прозрачностью;
+#   balanced  - режим 6 с уточнением конечных точек методом наименьших квадратов,
+#               режим 1 (два подмножества) для непрозрачных блоков по лучшему из 64 разбиений
+#               и режимы 5 и 4 (оба варианта индексов) для блоков с прозрачностью;
+#   thorough  - больше итераций уточнения и четыре лучших разбиения режима 1.
+# Для каждого блока остаётся вариант с меньшей ошибкой.
+
+QUALITY_LEVELS = ("fast", "balanced", "thorough")
+
+# Итерации уточнения и число проверяемых разбиений режима 1 для каждого уровня
+REFINE_ITERATIONS = {"fast": 0, "balanced": 1, "thorough": 2}
+PARTITION_CANDIDATES = {"fast": 0, "balanced": 1, "thorough": 4}
+
+# Режимы с раздельной альфой для блоков с прозрачностью: (режим, бит выбора индексов)
+SEPARATE_ALPHA_MODES = {
+    "fast": ((5, 0),),
+    "balanced": ((5, 0), (4, 0), (4, 1)),
+    "thorough": ((5, 0), (4, 0), (4, 1)),
+}
+# Параметры режимов 4 и 5: биты цвета, биты альфы, биты основного и второго индекса
+_SEPARATE_ALPHA_BITS = {4: (5, 6, 2, 3), 5: (7, 8, 2, 2)}
+# Вес ошибки альфы при выборе режима: ошибки прозрачности заметнее (края, смешивание),
+# а цвет полностью прозрачных пикселей не учитывается вовсе
+ALPHA_WEIGHT = 4.0
+
+# Размер пачки блоков: при поиске разбиений для каждого блока оцениваются 128 подмножеств
+CHUNK_BLOCKS = {"fast": 1 << 14, "balanced": 1 << 13, "thorough": 1 << 11}
+
+_TABLES = None
+
+
+def _tables():
+    global _TABLES
+    if _TABLES is None:
+        weights3 = np.array(WEIGHTS[3], dtype=np.int64)
+        weights4 = np.array(WEIGHTS[4], dtype=np.int64)
+        partitions = np.array(PARTITIONS_2, dtype=np.int64)
+        # Маски обоих подмножеств всех разбиений: строка 2*p+s - пиксели подмножества s разбиения p
+        subset_masks = np.stack([1 - partitions, partitions], axis=1).reshape(128, 16).astype(np.float32)
+        _TABLES = {
+            "weights3": weights3,
+            "weights4": weights4,
+            "midpoints3": (weights3[1:] + weights3[:-1]) / 2.0,
+            "midpoints4": (weights4[1:] + weights4[:-1]) / 2.0,
+            "partitions": partitions,
+            "anchors": np.array(ANCHORS_2, dtype=np.int64),
+            "subset_masks": subset_masks,
+        }
+    return _TABLES
+
+
+class _BitWriter:
+    """Сборка 128-битных блоков из полей, общих для всех блоков пачки."""
+
+    def __init__(self, count):
+        self.bits = np.zeros((count, 128), dtype=np.uint8)
+        self.rows = np.arange(count)[:, None]
+        self.position = 0
+
+    def write(self, values, width):
+        values = np.asarray(values, dtype=np.int64)
+        for bit in range(width):
+            self.bits[:, self.position + bit] = (values >> bit) & 1
+        self.position += width
+
+    def write_indices(self, indices, lengths):
+        """Индексы пикселей переменной длины (у якорных пикселей на бит меньше)."""
+        starts = self.position + np.cumsum(lengths, axis=1) - lengths
+        rows = np.broadcast_to(self.rows, lengths.shape)
+        for bit in range(int(lengths.max())):
+            valid = bit < lengths
+            self.bits[rows[valid], (starts + bit)[valid]] = ((indices >> bit) & 1)[valid]
+        self.position += int(lengths[0].sum())
+
+    def pack(self):
+        return np.packbits(self.bits, axis=1, bitorder="little")
+
+
+def _interpolate(e0, e1, weights):
+    """Точные значения палитры BC7: ((64 - w) * e0 + w * e1 + 32) >> 6."""
+    return ((64 - weights)[..., None] * e0 + weights[..., None] * e1 + 32) >> 6
+
+
+def _nearest_indices(colors, e0, e1, weights, midpoints):
+    """Индексы по проекции пикселя на отрезок e0-e1 (веса BC7 почти равномерны)."""
+    direction = (e1 - e0).astype(np.float32)
+    length = (direction * direction).sum(axis=-1)
+    t = ((colors - e0) * direction).sum(axis=-1) / np.maximum(length, 1e-6) * 64.0
+    indices = np.searchsorted(midpoints, t.ravel()).reshape(t.shape)
+    return np.where(length > 0, indices, 0), weights[indices] / 64.0
+
+
+def _block_error(decoded, colors):
+    """Ошибка блоков RGBA для выбора варианта: цвет - только у видимых пикселей, альфа - с весом."""
+    visible = colors[..., 3] > 0
+    color = ((decoded[..., :3] - colors[..., :3]) ** 2).sum(axis=-1) * visible
+    return (color + ALPHA_WEIGHT * (decoded[..., 3] - colors[..., 3]) ** 2).sum(axis=1)
+
+
+def _quantize_mode6(endpoint, opaque):
+    """Конечная точка RGBA -> 7 бит на канал + собственный p-бит (итого 8 бит).
+
+    У непрозрачных блоков (``opaque``) p-бит всегда 1: только он даёт альфу ровно 255.
+    """
+    best_error = None
+    for pbit in (0, 1):
+        quantized = np.clip(np.rint((endpoint - pbit) / 2.0), 0, 127).astype(np.int64)
+        error = ((2 * quantized + pbit - endpoint) ** 2).sum(axis=-1)
+        if pbit == 0:
+            error = np.where(opaque, np.inf, error)
+        if best_error is None:
+            best_error, best_q, best_p = error, quantized, np.zeros(error.shape, dtype=np.int64)
+        else:
+            better = error < best_error
+            best_error = np.where(better, error, best_error)
+            best_q = np.where(better[..., None], quantized, best_q)
+            best_p = np.where(better, 1, best_p)
+    return best_q, best_p, 2 * best_q + best_p[..., None]
+
+
+def _quantize_mode1(start, end):
+    """Пара конечных точек RGB -> 6 бит на канал + общий p-бит подмножества (итого 7 бит)."""
+    best_error = None
+    for pbit in (0, 1):
+        pair = []
+        error = 0
+        for endpoint in (start, end):
+            quantized = np.clip(np.rint((endpoint * (127 / 255) - pbit) / 2.0), 0, 63).astype(np.int64)
+            value = 2 * quantized + pbit
+            expanded = (value << 1) | (value >> 6)
+            error = error + ((expanded - endpoint) ** 2).sum(axis=-1)
+            pair.append((quantized, expanded))
+        if best_error is None:
+            best_error, best_pair, best_p = error, pair, np.zeros(error.shape, dtype=np.int64)
+        else:
+            better = error < best_error
+            best_error = np.where(better, error, best_error)
+            best_pair = [tuple(np.where(better[..., None], new, old) for new, old in zip(new_pair, old_pair))
+                         for new_pair, old_pair in zip(pair, best_pair)]
+            best_p = np.where(better, 1, best_p)
+    (q0, v0), (q1, v1) = best_pair
+    return q0, q1, best_p, v0, v1
+
+
+def _encode_mode6(colors, refine_iterations):
+    tables = _tables()
+    weights = np.ones(colors.shape[:2], dtype=np.float32)
+    opaque = (colors[:, :, 3] == 255).all(axis=1)
+
+    def evaluate(start, end):
+        q0, p0, v0 = _quantize_mode6(start, opaque)
+        q1, p1, v1 = _quantize_mode6(end, opaque)
+        indices, fractions = _nearest_indices(colors, v0[:, None, :], v1[:, None, :], tables["weights4"], tables["midpoints4"])
+        decoded = _interpolate(v0[:, None, :], v1[:, None, :], tables["weights4"][indices])
+        return [q0, p0, q1, p1, v0, v1, indices, fractions, _block_error(decoded, colors)]
+
+    start, end = principal_endpoints(colors, weights)
+    best = evaluate(start, end)
+    for _ in range(refine_iterations):
+        start, end = least_squares_endpoints(colors, weights, best[7], best[4].astype(np.float32), best[5].astype(np.float32))
+        candidate = evaluate(start, end)
+        best = _select(candidate[8] < best[8], candidate, best)
+
+    q0, p0, q1, p1, _, _, indices, _, error = best
+    # Старший бит индекса якорного пикселя 0 не хранится: при необходимости меняем точки местами
+    swap = indices[:, 0] >= 8
+    q0, q1 = np.where(swap[:, None], q1, q0), np.where(swap[:, None], q0, q1)
+    p0, p1 = np.where(swap, p1, p0), np.where(swap, p0, p1)
+    indices = np.where(swap[:, None], 15 - indices, indices)
+
+    writer = _BitWriter(colors.shape[0])
+    writer.write(1 << 6, 7)
+    for channel in range(4):
+        writer.write(q0[:, channel], 7)
+        writer.write(q1[:, channel], 7)
+    writer.write(p0, 1)
+    writer.write(p1, 1)
+    lengths = np.full(indices.shape, 4, dtype=np.int64)
+    lengths[:, 0] = 3
+    writer.write_indices(indices, lengths)
+    return writer.pack(), error
+
+
+def _quantize_bits(endpoint, bits):
+    """Значения 0..255 -> коды ``bits`` бит и их точное раскрытие обратно в 8 бит."""
+    top = (1 << bits) - 1
+    quantized = np.clip(np.rint(endpoint * (top / 255.0)), 0, top).astype(np.int64)
+    expanded = quantized << (8 - bits)
+    return quantized, expanded | (expanded >> bits)
+
+
+def _encode_separate_alpha(colors, mode, selector, refine_iterations):
+    """Режимы 4 и 5: одно подмножество, цвет и альфа со своими конечными точками и индексами.
+
+    ``selector`` режима 4: 0 - цвету 2-битные индексы, альфе 3-битные; 1 - наоборот.
+    Поворот каналов не используется.
+    """
+    tables = _tables()
+    color_bits, alpha_bits, index_bits, index2_bits = _SEPARATE_ALPHA_BITS[mode]
+    color_index_bits, alpha_index_bits = (index2_bits, index_bits) if selector else (index_bits, index2_bits)
+    color_weights = np.array(WEIGHTS[color_index_bits], dtype=np.int64)
+    alpha_weights = np.array(WEIGHTS[alpha_index_bits], dtype=np.int64)
+    rgb = colors[:, :, :3]
+    alpha = colors[:, :, 3:]
+    weights = np.ones(colors.shape[:2], dtype=np.float32)
+
+    def fit(values, e0, e1, bits, palette_weights, error_weights):
+        q0, v0 = _quantize_bits(e0, bits)
+        q1, v1 = _quantize_bits(e1, bits)
+        midpoints = (palette_weights[1:] + palette_weights[:-1]) / 2.0
+        indices, fractions = _nearest_indices(values, v0[:, None, :], v1[:, None, :], palette_weights, midpoints)
+        decoded = _interpolate(v0[:, None, :], v1[:, None, :], palette_weights[indices])
+        return [q0, q1, v0, v1, indices, fractions, (((decoded - values) ** 2).sum(axis=-1) * error_weights).sum(axis=1)]
+
+    def refine(values, bits, palette_weights, error_weights, start, end):
+        best = fit(values, start, end, bits, palette_weights, error_weights)
+        for _ in range(refine_iterations):
+            start, end = least_squares_endpoints(values, weights, best[5], best[2].astype(np.float32),
+                                                 best[3].astype(np.float32))
+            candidate = fit(values, start, end, bits, palette_weights, error_weights)
+            best = _select(candidate[6] < best[6], candidate, best)
+        return best
+
+    # Ошибки считаются так же, как в _block_error
+    visible = (colors[:, :, 3] > 0).astype(np.float32)
+    color = refine(rgb, color_bits, color_weights, visible, *principal_endpoints(rgb, weights))
+    alpha_fit = refine(alpha, alpha_bits, alpha_weights, ALPHA_WEIGHT, alpha.max(axis=1), alpha.min(axis=1))
+
+    # Старший бит индекса пикселя 0 не хранится: при необходимости меняем точки местами
+    fields = []
+    for (q0, q1, _, _, indices, _, _), bits in ((color, color_index_bits), (alpha_fit, alpha_index_bits)):
+        levels = 1 << bits
+        swap = indices[:, 0] >= levels // 2
+        fields.append((np.where(swap[:, None], q1, q0), np.where(swap[:, None], q0, q1),
+                       np.where(swap[:, None], levels - 1 - indices, indices)))
+    (c0, c1, color_indices), (a0, a1, alpha_indices) = fields
+
+    writer = _BitWriter(colors.shape[0])
+    writer.write(1 << mode, mode + 1)
+    writer.write(0, 2)
+    if mode == 4:
+        writer.write(selector, 1)
+    for channel in range(3):
+        writer.write(c0[:, channel], color_bits)
+        writer.write(c1[:, channel], color_bits)
+    writer.write(a0[:, 0], alpha_bits)
+    writer.write(a1[:, 0], alpha_bits)
+    primary, secondary = (alpha_indices, color_indices) if selector else (color_indices, alpha_indices)
+    for indices, bits in ((primary, index_bits), (secondary, index2_bits)):
+        lengths = np.full(indices.shape, bits, dtype=np.int64)
+        lengths[:, 0] = bits - 1
+        writer.write_indices(indices, lengths)
+    return writer.pack(), color[6] + alpha_fit[6]
+
+
+def _partition_candidates(colors, count):
+    """Лучшие разбиения на 2 подмножества по остаточной ошибке приближения каждого подмножества прямой."""
+    masks = _tables()["subset_masks"]
+    pixels = masks.sum(axis=1)[None, :, None]
+    sums = np.einsum("kp,npc->nkc", masks, colors)
+    outer = np.einsum("npc,npd->npcd", colors, colors).reshape(colors.shape[0], 16, 9)
+    squares = np.einsum("kp,npe->nke", masks, outer).reshape(colors.shape[0], 128, 3, 3)
+    mean = sums / pixels
+    covariance = squares / pixels[..., None] - mean[..., :, None] * mean[..., None, :]
+
+    axis = np.ones(mean.shape, dtype=np.float32)
+    for _ in range(4):
+        axis = np.einsum("nkij,nkj->nki", covariance, axis)
+        axis /= np.maximum(np.linalg.norm(axis, axis=-1, keepdims=True), 1e-6)
+    along_axis = np.einsum("nki,nkij,nkj->nk", axis, covariance, axis)
+    trace = np.trace(covariance, axis1=2, axis2=3)
+    residual = ((trace - along_axis) * pixels[..., 0]).reshape(colors.shape[0], 64, 2).sum(axis=2)
+    return np.argsort(residual, axis=1)[:, :count]
+
+
+def _encode_mode1(colors, partition, refine_iterations):
+    tables = _tables()
+    count = colors.shape[0]
+    rgb = colors[:, :, :3]
+    subsets = tables["partitions"][partition]
+    rows = np.arange(count)[:, None]
+
+    def evaluate(starts, ends):
+        result = [[], [], [], None, None]
+        v0 = np.zeros((count, 16, 3), dtype=np.int64)
+        v1 = np.zeros((count, 16, 3), dtype=np.int64)
+        for subset in (0, 1):
+            q0, q1, pbit, e0, e1 = _quantize_mode1(starts[subset], ends[subset])
+            result[0].append((q0, q1))
+            result[1].append(pbit)
+            result[2].append((e0, e1))
+            mask = (subsets == subset)[..., None]
+            v0 = np.where(mask, e0[:, None, :], v0)
+            v1 = np.where(mask, e1[:, None, :], v1)
+        indices, fractions = _nearest_indices(rgb, v0, v1, tables["weights3"], tables["midpoints3"])
+        decoded = _interpolate(v0, v1, tables["weights3"][indices])
+        result[3] = (indices, fractions)
+        result[4] = ((decoded - rgb) ** 2).sum(axis=(1, 2)) + ((255 - colors[:, :, 3]) ** 2).sum(axis=1)
+        return result
+
+    masks = [(subsets == subset).astype(np.float32) for subset in (0, 1)]
+    starts, ends = zip(*(principal_endpoints(rgb, mask) for mask in masks))
+    best = evaluate(starts, ends)
+    for _ in range(refine_iterations):
+        fractions = best[3][1]
+        refined = [least_squares_endpoints(rgb, masks[subset], fractions,
+                                            best[2][subset][0].astype(np.float32), best[2][subset][1].astype(np.float32))
+                   for subset in (0, 1)]
+        candidate = evaluate([pair[0] for pair in refined], [pair[1] for pair in refined])
+        better = candidate[4] < best[4]
+        best = _select(better, candidate, best)
+
+    quantized, pbits, _, (indices, _), error = best
+    anchors = np.stack([np.zeros(count, dtype=np.int64), tables["anchors"][partition]], axis=1)
+    for subset in (0, 1):
+        swap = indices[np.arange(count), anchors[:, subset]] >= 4
+        q0, q1 = quantized[subset]
+        quantized[subset] = (np.where(swap[:, None], q1, q0), np.where(swap[:, None], q0, q1))
+        indices = np.where(swap[:, None] & (subsets == subset), 7 - indices, indices)
+
+    writer = _BitWriter(count)
+    writer.write(1 << 1, 2)
+    writer.write(partition, 6)
+    for channel in range(3):
+        for subset in (0, 1):
+            writer.write(quantized[subset][0][:, channel], 6)
+            writer.write(quantized[subset][1][:, channel], 6)
+    writer.write(pbits[0], 1)
+    writer.write(pbits[1], 1)
+    lengths = np.full(indices.shape, 3, dtype=np.int64)
+    lengths[:, 0] = 2
+    lengths[rows[:, 0], anchors[:, 1]] = 2
+    writer.write_indices(indices, lengths)
+    return writer.pack(), error
+
+
+def _select(mask, candidate, current):
+    """Поэлементный выбор между двумя вложенными наборами массивов по маске блоков."""
+    if isinstance(candidate, (list, tuple)):
+        return type(candidate)(_select(mask, new, old) for new, old in zip(candidate, current))
+    return np.where(mask.reshape((-1,) + (1,) * (candidate.ndim - 1)), candidate, current)
+
+
+def encode_blocks(blocks, quality="balanced"):
+    """(N, 16, 4) RGBA пиксели блоков -> (N, 16) байт блоков BC7."""
+    colors = blocks.astype(np.float32)
+    encoded, error = _encode_mode6(colors, REFINE_ITERATIONS[quality])
+
+    candidates = PARTITION_CANDIDATES[quality]
+    opaque = np.nonzero((blocks[:, :, 3] == 255).all(axis=1))[0]
+    if candidates and opaque.size:
+        opaque_colors = colors[opaque]
+        best_encoded, best_error = encoded[opaque], error[opaque]
+        for partition in _partition_candidates(opaque_colors[:, :, :3], candidates).T:
+            candidate, candidate_error = _encode_mode1(opaque_colors, partition, REFINE_ITERATIONS[quality])
+            better = candidate_error < best_error
+            best_encoded = np.where(better[:, None], candidate, best_encoded)
+            best_error = np.where(better, candidate_error, best_error)
+        encoded[opaque] = best_encoded
+
+    translucent = np.nonzero((blocks[:, :, 3] != 255).any(axis=1))[0]
+    if translucent.size:
+        translucent_colors = colors[translucent]
+        best_encoded, best_error = encoded[translucent], error[translucent]
+        for mode, selector in SEPARATE_ALPHA_MODES[quality]:
+            candidate, candidate_error = _encode_separate_alpha(translucent_colors, mode, selector,
+                                                                REFINE_ITERATIONS[quality])
+            better = candidate_error < best_error
+            best_encoded = np.where(better[:, None], candidate, best_encoded)
+            best_error = np.where(better, candidate_error, best_error)
+        encoded[translucent] = best_encoded
+    return encoded
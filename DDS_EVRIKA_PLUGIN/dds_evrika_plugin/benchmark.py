@@ -0,0 +1,499 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from .cache import default_cache_dir
+from .document_io import create_document
+from .endpoints import np
+from .export_jobs import ExportSettings, init_compression, prepare_export_job
+from .jobs import Job, JobEngine
+from .magick import build_import_args, magick_path
+from .magick_worker import MagickWorkerPool
+from .presets import DEFAULTS
+from . import dds_encoder, dds_decoder
+
+# Бенчмарк конвейера импорта/экспорта без Krita:
+#
+#     python -m dds_evrika_plugin.benchmark --sizes 256,1024 --formats dxt1,bc7
+#
+# Документы Krita заменены заглушками (StubKrita / StubDocument) с тем же API,
+# которым пользуется плагин, поэтому пиксели читаются и документы создаются теми
+# же функциями document_io. Задачи экспорта собирает тот же модуль export_jobs,
+# что и в плагине, и выполняет JobEngine. Набор
+# текстур генерируется детерминированно. Для каждого случая измеряются задержка
+# (медиана повторов), пропускная способность и пиковая память; результаты можно
+# сохранить как базовые и сравнивать с ними с порогами регрессии.
+# Кэш конвертаций не используется: измеряется сама конвертация.
+
+EXPORT_BACKENDS = ("native", "streaming", "magick", "magick-worker")
+IMPORT_BACKENDS = ("native", "magick")
+SIZES = (256, 512, 1024, 2048, 4096, 8192)
+VARIANTS = ("opaque", "alpha")
+MIPMAPS = ("Auto", "0")
+
+# 2: задержка экспорта включает чтение документа, память - отдельный запуск после прогрева
+BASELINE_VERSION = 2
+# Допустимый рост задержки и памяти относительно базовых результатов
+LATENCY_THRESHOLD = 0.15
+MEMORY_THRESHOLD = 0.20
+# Меньшие абсолютные изменения - шум измерения, а не регрессия
+MIN_LATENCY_DELTA = 0.005
+MIN_MEMORY_DELTA_MB = 1.0
+# Строк текстуры, генерируемых за один шаг (ограничивает временные массивы)
+CORPUS_CHUNK_ROWS = 512
+
+
+class StubPixels:
+    """Замена QByteArray из ``Document.pixelData``."""
+
+    def __init__(self, data):
+        self._data = data
+
+    def data(self):
+        return self._data
+
+
+class StubNode:
+    def __init__(self, document, name):
+        self.document = document
+        self._name = name
+        self.pixels = None
+
+    def name(self):
+        return self._name
+
+    def setName(self, name):
+        self._name = name
+
+    def setPixelData(self, data, x, y, width, height):
+        if (x, y, width, height) != (0, 0, self.document.width(), self.document.height()):
+            raise NotImplementedError("StubNode only stores whole-canvas pixel data")
+        self.pixels = bytes(data)
+
+    def addChildNode(self, child, above):
+        self.document.nodes.append(child)
+        return True
+
+
+class StubDocument:
+    """8-битный RGBA-документ в памяти с той частью API ``Document``, которой пользуется плагин.
+
+    Проекция совпадает с верхним слоем: у документов бенчмарка один слой.
+    """
+
+    def __init__(self, width, height, name=""):
+        self._width = width
+        self._height = height
+        self._name = name
+        self.nodes = [StubNode(self, "Background")]
+        self._root = StubNode(self, "root")
+
+    def name(self):
+        return self._name
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+    def colorModel(self):
+        return "RGBA"
+
+    def colorDepth(self):
+        return "U8"
+
+    def waitForDone(self):
+        pass
+
+    def refreshProjection(self):
+        pass
+
+    def close(self):
+        return True
+
+    def topLevelNodes(self):
+        return list(self.nodes)
+
+    def rootNode(self):
+        return self._root
+
+    def createNode(self, name, node_type):
+        return StubNode(self, name)
+
+    def resizeImage(self, x, y, width, height):
+        raise NotImplementedError("StubDocument cannot be resized")
+
+    def pixelData(self, x, y, width, height):
+        data = self.nodes[-1].pixels
+        if data is None:
+            return StubPixels(bytes(width * height * 4))
+        pixels = np.frombuffer(data, dtype=np.uint8).reshape(self._height, self._width, 4)
+        return StubPixels(pixels[y:y + height, x:x + width].tobytes())
+
+
+class StubKrita:
+    """``Krita.instance()`` для бенчмарка: создаёт документы-заглушки."""
+
+    def createDocument(self, width, height, name, color_model, color_depth, profile, resolution):
+        return StubDocument(width, height, name)
+
+
+def make_texture(size, variant, seed=0):
+    """Детерминированная текстура size x size: плавные градиенты, шум и резкие края.
+
+    Вариант "alpha" добавляет плавное радиальное затухание альфы и полностью прозрачные вырезы.
+    """
+    rng = np.random.default_rng(seed + size)
+    image = np.empty((size, size, 4), dtype=np.uint8)
+    x = (np.arange(size, dtype=np.float32) / size)[None, :]
+    for start in range(0, size, CORPUS_CHUNK_ROWS):
+        y = (np.arange(start, min(size, start + CORPUS_CHUNK_ROWS), dtype=np.float32) / size)[:, None]
+        checker = ((x * 16).astype(np.int32) + (y * 16).astype(np.int32)) % 2
+        noise = rng.integers(-8, 9, (y.shape[0], size, 3))
+        image[start:start + y.shape[0], :, 0] = np.clip(128 + 100 * np.sin(x * 12 + y * 3) + noise[..., 0], 0, 255)
+        image[start:start + y.shape[0], :, 1] = np.clip(128 + 100 * np.sin(y * 9) * np.cos(x * 5) + noise[..., 1], 0, 255)
+        image[start:start + y.shape[0], :, 2] = np.clip(200 * x * y + 40 * checker + noise[..., 2], 0, 255)
+        if variant == "alpha":
+            distance = np.sqrt((x - 0.5) ** 2 + (y - 0.5) ** 2)
+            alpha = np.clip(255 * (1.4 - 2 * distance), 0, 255)
+            cut = ((x * 8).astype(np.int32) + (y * 8).astype(np.int32)) % 5 == 0
+            image[start:start + y.shape[0], :, 3] = np.where(cut, 0, alpha)
+        else:
+            image[start:start + y.shape[0], :, 3] = 255
+    return image
+
+
+def case_key(direction, backend, size, variant, compression, mipmap=None):
+    key = f"{direction}/{backend}/{size}/{variant}/{compression}"
+    return key if mipmap is None else f"{key}/mips={mipmap}"
+
+
+class Benchmark:
+    """Выполняет случаи бенчмарка как задачи в ``JobEngine`` с одним потоком."""
+
+    def __init__(self, workdir, repeat=3, mip_filter=DEFAULTS["filter"], quality=DEFAULTS["bc7_quality"],
+                 threads=None, linear=False):
+        self.workdir = workdir
+        self.repeat = max(1, repeat)
+        self.mip_filter = mip_filter
+        self.quality = quality
+        self.threads = threads
+        self.linear = linear
+        self.krita = StubKrita()
+        self.magick_workers = MagickWorkerPool(1)
+        self.engine = JobEngine(max_workers=1, listener=self._on_event)
+
+    def shutdown(self):
+        self.engine.shutdown(wait=True)
+        self.magick_workers.shutdown()
+
+    def _on_event(self, event, job):
+        if event == "finished":
+            job.context["finished"].set()
+
+    def run_job(self, make_job):
+        """Создать задачу вызовом ``make_job()``, выполнить её в движке и вернуть (задача, время).
+
+        Время считается с создания задачи: плагин читает документ при создании задачи экспорта.
+        """
+        start = time.perf_counter()
+        job = make_job()
+        job.context["finished"] = threading.Event()
+        self.engine.submit(job)
+        job.context["finished"].wait()
+        latency = time.perf_counter() - start
+        self.engine.forget_finished()
+        if job.state == Job.FAILED:
+            raise job.error
+        return job, latency
+
+    def measure(self, make_job, pixels, memory="python"):
+        """Медиана задержки по ``repeat`` запускам и пиковая память отдельного запуска.
+
+        Первый запуск - прогрев без измерений. Затем один запуск измеряет память
+        (вне замеров времени: tracemalloc замедляет выполнение), и только потом
+        идут запуски с замером времени. ``memory`` - "python" (пик выделений,
+        отслеженных tracemalloc, включая NumPy), "child" (пиковый RSS завершённых
+        дочерних процессов, верхняя оценка за весь прогон) или None, если память
+        измерить нельзя.
+        """
+        self.run_job(make_job)
+        tracemalloc.start()
+        try:
+            self.run_job(make_job)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        if memory == "child":
+            peak = _children_peak_rss()
+        elif memory is None:
+            peak = None
+
+        latencies = []
+        stages = {}
+        for _ in range(self.repeat):
+            job, latency = self.run_job(make_job)
+            latencies.append(latency)
+            for stage, seconds in job.timings:
+                stages.setdefault(stage, []).append(seconds)
+        latency = statistics.median(latencies)
+        return {
+            "latency": latency,
+            "latency_min": min(latencies),
+            "throughput": pixels / latency / 1e6,
+            "peak_mb": None if peak is None else peak / (1 << 20),
+            "stages": {stage: statistics.median(values) for stage, values in stages.items()},
+        }
+
+    def export_job(self, backend, doc, save_file, compression, mipmap):
+        """Задача экспорта ``doc``, собранная export_jobs, как в плагине, но без кэша конвертаций.
+
+        "streaming" - встроенный кодировщик полосами при любом размере документа,
+        "magick-worker" - magick с пулом постоянных процессов, "magick" - без него.
+        """
+        preset = dict(DEFAULTS, compression=compression, mipmap=mipmap, filter=self.mip_filter,
+                      backend="native" if backend in ("native", "streaming") else "magick",
+                      bc7_quality=self.quality, linear=self.linear)
+        settings = ExportSettings(magick_workers=self.magick_workers if backend == "magick-worker" else None,
+                                  streaming_min_pixels=0 if backend == "streaming" else None)
+        job = init_compression(Job(f"export {os.path.basename(save_file)}"), preset)
+        return prepare_export_job(job, doc, save_file, preset, settings, self.threads)
+
+    def import_job(self, backend, input_file):
+        """Задача импорта; для magick измеряется только конвертация (документ открыла бы Krita)."""
+        name = os.path.basename(input_file)
+        job = Job(f"import {name}")
+        if backend == "native":
+            def decode(job):
+                job.context["image"] = dds_decoder.decode_file(input_file, 0, job.step)[1]
+
+            job.add_stage("decode", decode)
+            job.add_stage("open", lambda job: create_document(self.krita, job.context.pop("image"), name), weight=0.1)
+        else:
+            output_file = os.path.join(self.workdir, os.path.splitext(name)[0] + ".png")
+            job.add_stage("convert", lambda job: job.run_process(build_import_args(input_file, output_file)))
+        return job
+
+    def export_case(self, backend, doc, compression, mipmap):
+        save_file = os.path.join(self.workdir, f"export_{backend}.dds")
+        memory = {"magick": "child", "magick-worker": None}.get(backend, "python")
+        result = self.measure(lambda: self.export_job(backend, doc, save_file, compression, mipmap),
+                              doc.width() * doc.height(), memory)
+        result["bytes_written"] = os.path.getsize(save_file)
+        os.remove(save_file)
+        return result
+
+    def import_case(self, backend, input_file, pixels):
+        result = self.measure(lambda: self.import_job(backend, input_file), pixels,
+                              "child" if backend == "magick" else "python")
+        result["bytes_read"] = os.path.getsize(input_file)
+        return result
+
+
+def _children_peak_rss():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def magick_available():
+    return shutil.which(magick_path()) is not None
+
+
+def run(options, log=print):
+    """Прогнать все случаи из ``options`` и вернуть {ключ случая: результат}."""
+    available = {"native": dds_encoder.available(), "streaming": dds_encoder.available(),
+                 "magick": magick_available(), "magick-worker": magick_available()}
+    export_backends = [backend for backend in options.backends if available[backend]]
+    import_backends = [backend for backend in options.import_backends
+                       if (dds_decoder.available() if backend == "native" else magick_available())]
+    for backend in sorted(set(options.backends) - set(export_backends)):
+        log(f"skip export backend {backend}: not available")
+    for backend in sorted(set(options.import_backends) - set(import_backends)):
+        log(f"skip import backend {backend}: not available")
+
+    results = {}
+    workdir = tempfile.mkdtemp(prefix="evrika-benchmark-")
+    bench = Benchmark(workdir, options.repeat, options.filter, options.quality, options.threads, options.linear)
+    try:
+        for size in options.sizes:
+            for variant in options.variants:
+                rgba = make_texture(size, variant)
+                doc = create_document(bench.krita, rgba, f"{size}_{variant}")
+                for compression in options.formats:
+                    for mipmap in options.mipmaps:
+                        for backend in export_backends:
+                            if backend in ("native", "streaming") and not dds_encoder.supports(compression):
+                                continue
+                            key = case_key("export", backend, size, variant, compression, mipmap)
+                            results[key] = bench.export_case(backend, doc, compression, mipmap)
+                            log(format_result(key, results[key]))
+
+                    if import_backends:
+                        # Импортируется файл с полной цепочкой mip, как после обычного экспорта
+                        input_file = os.path.join(workdir, f"{size}_{variant}_{compression}.dds")
+                        dds_encoder.write_dds(input_file, rgba, compression, "Auto", quality="fast")
+                        for backend in import_backends:
+                            key = case_key("import", backend, size, variant, compression)
+                            results[key] = bench.import_case(backend, input_file, size * size)
+                            log(format_result(key, results[key]))
+                        os.remove(input_file)
+                del doc, rgba
+    finally:
+        bench.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def format_result(key, result):
+    peak = "-" if result["peak_mb"] is None else f"{result['peak_mb']:.1f} MB"
+    stages = ", ".join(f"{stage} {seconds * 1000:.0f}" for stage, seconds in result["stages"].items())
+    return (f"{key:<48} {result['latency'] * 1000:9.1f} ms {result['throughput']:8.2f} MP/s {peak:>10}"
+            f"  [{stages}]")
+
+
+def machine_info():
+    return {"platform": platform.platform(), "python": platform.python_version(),
+            "numpy": getattr(np, "__version__", None), "cpus": os.cpu_count(),
+            "encoder": dds_encoder.ENCODER_VERSION}
+
+
+def default_baseline_path():
+    return os.path.join(default_cache_dir("benchmark"), "baseline.json")
+
+
+def save_baseline(path, results, options):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    data = {"version": BASELINE_VERSION, "time": time.time(), "machine": machine_info(),
+            "options": {"filter": options.filter, "quality": options.quality, "threads": options.threads,
+                        "linear": options.linear, "repeat": options.repeat},
+            "results": results}
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+    os.replace(temp_path, path)
+
+
+def load_baseline(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != BASELINE_VERSION:
+        raise ValueError(f"{path}: unsupported baseline version {data.get('version')}")
+    return data
+
+
+def compare(results, baseline, latency_threshold=LATENCY_THRESHOLD, memory_threshold=MEMORY_THRESHOLD):
+    """Случаи, где задержка или память выросли больше порога относительно базовых результатов."""
+    regressions = []
+    for key, result in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        latency, old_latency = result["latency"], old["latency"]
+        if latency - old_latency > MIN_LATENCY_DELTA and latency > old_latency * (1 + latency_threshold):
+            regressions.append(f"{key}: latency {old_latency * 1000:.1f} -> {latency * 1000:.1f} ms "
+                               f"(+{(latency / old_latency - 1) * 100:.0f}%)")
+        peak, old_peak = result.get("peak_mb"), old.get("peak_mb")
+        if (peak is not None and old_peak is not None and peak - old_peak > MIN_MEMORY_DELTA_MB
+                and peak > old_peak * (1 + memory_threshold)):
+            regressions.append(f"{key}: peak memory {old_peak:.1f} -> {peak:.1f} MB "
+                               f"(+{(peak / old_peak - 1) * 100:.0f}%)")
+    return regressions
+
+
+def _list(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _choices(allowed):
+    def parse(value):
+        items = _list(value)
+        unknown = [item for item in items if item not in allowed]
+        if unknown:
+            raise argparse.ArgumentTypeError(f"unknown value(s) {', '.join(unknown)}; choose from {', '.join(allowed)}")
+        return items
+    return parse
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m dds_evrika_plugin.benchmark",
+                                     description="Benchmark DDS import/export backends outside Krita.")
+    parser.add_argument("--sizes", type=lambda value: [int(item) for item in _list(value)], default=list(SIZES),
+                        help="texture sizes (default: %(default)s)")
+    parser.add_argument("--variants", type=_choices(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--formats", type=_choices(tuple(dds_encoder.COMPRESSION_FORMATS)),
+                        default=list(dds_encoder.COMPRESSION_FORMATS))
+    parser.add_argument("--mipmaps", type=_list, default=list(MIPMAPS), help="mipmap settings (default: Auto,0)")
+    parser.add_argument("--backends", type=_choices(EXPORT_BACKENDS), default=list(EXPORT_BACKENDS),
+                        help="export backends")
+    parser.add_argument("--import-backends", type=_choices(IMPORT_BACKENDS), default=list(IMPORT_BACKENDS))
+    parser.add_argument("--filter", default=DEFAULTS["filter"], help="mip filter")
+    parser.add_argument("--quality", default=DEFAULTS["bc7_quality"], choices=("fast", "balanced", "thorough"),
+                        help="built-in BC7 quality")
+    parser.add_argument("--linear", action="store_true", help="build mips in linear light")
+    parser.add_argument("--threads", type=int, default=None, help="built-in encoder threads")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case; the median is reported")
+    parser.add_argument("--baseline", nargs="?", const=default_baseline_path(), default=None,
+                        help="compare with a saved baseline (default file if no path is given)")
+    parser.add_argument("--save-baseline", nargs="?", const=default_baseline_path(), default=None,
+                        help="save the results as a baseline (default file if no path is given)")
+    parser.add_argument("--latency-threshold", type=float, default=LATENCY_THRESHOLD,
+                        help="allowed relative latency growth (default: %(default)s)")
+    parser.add_argument("--memory-threshold", type=float, default=MEMORY_THRESHOLD,
+                        help="allowed relative peak memory growth (default: %(default)s)")
+    parser.add_argument("--json", help="write the results to this file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Точка входа; код возврата 1 - есть регрессии относительно базовых результатов."""
+    options = parse_args(argv)
+    if np is None:
+        print("The benchmark needs NumPy", file=sys.stderr)
+        return 2
+    baseline = None
+    if options.baseline:
+        baseline = load_baseline(options.baseline)
+        if baseline["machine"] != machine_info():
+            print(f"warning: the baseline was recorded on {baseline['machine']}", file=sys.stderr)
+
+    results = run(options)
+
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine_info(), "results": results}, f, indent=1)
+    if options.save_baseline:
+        save_baseline(options.save_baseline, results, options)
+        print(f"baseline saved to {options.save_baseline}")
+    if baseline is not None:
+        regressions = compare(results, baseline["results"], options.latency_threshold, options.memory_threshold)
+        missing = len(set(results) - set(baseline["results"]))
+        if missing:
+            print(f"{missing} case(s) are not in the baseline")
+        if regressions:
+            print(f"{len(regressions)} regression(s):")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print("no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import hashlib
+import os
+import shutil
+import sys
+import threading
+
+# Постоянный кэш результатов конвертации с адресацией по содержимому: ключ - sha256
+# от пикселей (или байтов DDS) и всех параметров кодирования, включая версию
+# кодировщика. Хранится вне папки плагина, размер ограничен, вытесняются давно
+# не использованные записи (время доступа - mtime файла записи).
+
+DEFAULT_MAX_MB = 512
+
+
+def default_cache_dir(name="conversions"):
+    """Каталог кэша пользователя: %LOCALAPPDATA% в Windows, XDG_CACHE_HOME или ~/.cache иначе."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "dds_evrika", name)
+
+
+def cache_key(data, *settings):
+    """sha256 от содержимого и параметров; параметры входят в ключ в виде строк."""
+    digest = hashlib.sha256()
+    for part in settings:
+        digest.update(repr(part).encode("utf-8"))
+        digest.update(b"\0")
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def run_cached(cache, key_func, suffix, target, convert):
+    """Взять ``target`` из кэша или создать его вызовом ``convert()`` и сохранить в кэш.
+
+    ``key_func()`` вызывается только при включённом кэше (``cache`` не None).
+    Возвращает True при попадании.
+    """
+    if cache is None:
+        convert()
+        return False
+    key = key_func()
+    if cache.fetch(key, suffix, target):
+        return True
+    convert()
+    cache.put(key, suffix, target)
+    return False
+
+
+class ConversionCache:
+    """Directory of cached conversion results named ``<key><suffix>``.
+
+    ``get`` and ``put`` may be called from worker threads. Entries are written to
+    a temporary name and renamed, so readers never see a partial file.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_MB << 20):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key, suffix):
+        """Путь к записи или None; попадание обновляет время использования записи."""
+        path = self.path(key, suffix)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def fetch(self, key, suffix, target):
+        """Скопировать запись в ``target``; True при попадании."""
+        path = self.get(key, suffix)
+        if path is None:
+            return False
+        try:
+            shutil.copyfile(path, target)
+        except OSError:
+            return False
+        return True
+
+    def put(self, key, suffix, source):
+        """Сохранить копию файла ``source`` под ключом и вытеснить лишнее."""
+        self._store(key, suffix, lambda temp: shutil.copyfile(source, temp))
+
+    def put_with(self, key, suffix, write):
+        """Сохранить запись, которую ``write(path)`` создаёт сама."""
+        self._store(key, suffix, write)
+
+    def clear(self):
+        with self._lock:
+            for entry in self._entries():
+                _remove(entry[2])
+
+    def size(self):
+        with self._lock:
+            return sum(entry[1] for entry in self._entries())
+
+    def _store(self, key, suffix, write):
+        if self.max_bytes <= 0:
+            return
+        path = self.path(key, suffix)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            write(temp_path)
+            os.replace(temp_path, path)
+        except OSError:
+            # Кэш - только ускорение: ошибка записи не должна ломать конвертацию
+            _remove(temp_path)
+            return
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return entries
+        for name in names:
+            if name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(entry[1] for entry in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                if _remove(path):
+                    total -= size
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
@@ -0,0 +1,332 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .analysis import AUTO_COMPRESSION
+from .bc7_encoder import QUALITY_LEVELS
+from .endpoints import np
+from .jobs import Job, default_worker_count
+from .magick import build_convert_args, build_read_args, partial_output, remove_partial
+from .presets import BUILTIN_PRESETS, DEFAULTS, PRESET_KEYS
+from . import analysis
+from . import dds_decoder
+from . import dds_encoder
+
+# Пакетная конвертация без Krita (сборочные машины):
+#
+#     python -m dds_evrika_plugin textures.json --jobs 8 --report report.json
+#
+# Манифест - JSON со списком исходных изображений и настройками экспорта:
+#
+#     {
+#         "output_dir": "build/textures",
+#         "defaults": {"preset": "albedo"},
+#         "files": [
+#             "art/*.png",
+#             {"source": "art/ui/button.png", "preset": "ui"},
+#             {"source": "art/rock_n.tga", "output": "build/rock_normal.dds", "preset": "normal"}
+#         ]
+#     }
+#
+# Настройки файла - ключи пресета (compression, mipmap, filter, backend,
+# bc7_quality, linear) и "preset" с именем встроенного пресета; они перекрывают
+# "defaults", а те - настройки по умолчанию плагина. Пути считаются от папки
+# манифеста. Файл пропускается, если DDS новее исходника и собран с теми же
+# настройками: их хэш хранится рядом с DDS в файле с суффиксом SETTINGS_SUFFIX.
+# Файлы конвертируются в пуле процессов (вне Krita sys.executable - обычный Python).
+
+MANIFEST_KEYS = frozenset(PRESET_KEYS) | {"preset"}
+ENTRY_KEYS = MANIFEST_KEYS | {"source", "output"}
+BACKENDS = ("native", "magick")
+# Файл рядом с DDS с хэшем настроек, с которыми он собран
+SETTINGS_SUFFIX = ".evrika.json"
+
+CONVERTED = "converted"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class ManifestError(ValueError):
+    """Манифест не читается или содержит неизвестные настройки."""
+
+
+class Task:
+    """Одна конвертация манифеста: исходное изображение, DDS-файл и разрешённый пресет."""
+
+    def __init__(self, source, output, preset):
+        self.source = source
+        self.output = output
+        self.preset = preset
+
+    @property
+    def settings_file(self):
+        return self.output + SETTINGS_SUFFIX
+
+    def settings_hash(self):
+        """Хэш настроек пресета; для встроенного кодировщика - и его версии."""
+        settings = {key: self.preset[key] for key in PRESET_KEYS}
+        if self.preset["backend"] == "native":
+            settings["encoder_version"] = dds_encoder.ENCODER_VERSION
+        return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+
+def resolve_preset(*layers):
+    """Пресет экспорта из настроек по умолчанию, перекрытых по очереди словарями ``layers``."""
+    preset = dict(DEFAULTS)
+    for layer in layers:
+        name = layer.get("preset")
+        if name is not None:
+            if name not in BUILTIN_PRESETS:
+                raise ManifestError(f"Unknown preset {name!r}; choose from {', '.join(BUILTIN_PRESETS)}")
+            preset.update(BUILTIN_PRESETS[name])
+        preset.update((key, layer[key]) for key in PRESET_KEYS if key in layer)
+
+    preset["compression"] = str(preset["compression"]).lower()
+    preset["mipmap"] = str(preset["mipmap"])
+    if preset["compression"] != AUTO_COMPRESSION and preset["compression"] not in dds_encoder.COMPRESSION_FORMATS:
+        raise ManifestError(f"Unknown compression {preset['compression']!r}")
+    if preset["backend"] not in BACKENDS:
+        raise ManifestError(f"Unknown backend {preset['backend']!r}; choose from {', '.join(BACKENDS)}")
+    if preset["bc7_quality"] not in QUALITY_LEVELS:
+        raise ManifestError(f"Unknown BC7 quality {preset['bc7_quality']!r}")
+    return preset
+
+
+def load_manifest(path):
+    """Задачи манифеста ``path`` в порядке записей; шаблоны в "source" раскрываются."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ManifestError(f"Cannot read manifest {path}: {e}")
+    if isinstance(data, list):
+        data = {"files": data}
+
+    base = os.path.dirname(os.path.abspath(path))
+    defaults = data.get("defaults", {})
+    unknown = set(defaults) - MANIFEST_KEYS
+    if unknown:
+        raise ManifestError(f"Unknown default setting(s): {', '.join(sorted(unknown))}")
+    output_dir = data.get("output_dir")
+
+    tasks = []
+    outputs = set()
+    for entry in data.get("files", []):
+        if isinstance(entry, str):
+            entry = {"source": entry}
+        if "source" not in entry:
+            raise ManifestError(f"Manifest entry without a source: {entry}")
+        unknown = set(entry) - ENTRY_KEYS
+        if unknown:
+            raise ManifestError(f"{entry['source']}: unknown setting(s) {', '.join(sorted(unknown))}")
+        preset = resolve_preset(defaults, entry)
+
+        pattern = os.path.join(base, entry["source"])
+        if any(char in pattern for char in "*?["):
+            if "output" in entry:
+                raise ManifestError(f"{entry['source']}: a pattern cannot have a single output file")
+            sources = sorted(glob.glob(pattern))
+        else:
+            sources = [pattern]
+
+        for source in sources:
+            if "output" in entry:
+                output = os.path.join(base, entry["output"])
+            else:
+                directory = os.path.join(base, output_dir) if output_dir else os.path.dirname(source)
+                output = os.path.join(directory, os.path.splitext(os.path.basename(source))[0] + ".dds")
+            output = os.path.normpath(output)
+            if os.path.normcase(output) == os.path.normcase(os.path.normpath(source)):
+                if pattern != source:
+                    # Шаблон "*.dds" без output_dir совпал с уже готовыми DDS
+                    continue
+                raise ManifestError(f"{source}: the output would overwrite the source")
+            if os.path.normcase(output) in outputs:
+                raise ManifestError(f"{output} is written by more than one manifest entry")
+            outputs.add(os.path.normcase(output))
+            tasks.append(Task(os.path.normpath(source), output, preset))
+    return tasks
+
+
+def up_to_date(task):
+    """DDS уже есть, не старше исходного изображения и собран с теми же настройками."""
+    try:
+        if os.stat(task.output).st_mtime_ns < os.stat(task.source).st_mtime_ns:
+            return False
+        with open(task.settings_file, encoding="utf-8") as f:
+            return json.load(f).get("settings") == task.settings_hash()
+    except (OSError, ValueError, AttributeError):
+        return False
+
+
+def write_settings(task):
+    with open(task.settings_file, "w", encoding="utf-8") as f:
+        json.dump({"settings": task.settings_hash(), "preset": task.preset}, f, sort_keys=True)
+
+
+def read_image(path):
+    """Изображение как массив (h, w, 4) uint8 RGBA: DDS - встроенным декодером, остальное - через magick."""
+    if path.lower().endswith(".dds") and dds_decoder.available():
+        return dds_decoder.decode_file(path)[1]
+    process = subprocess.run(build_read_args(path), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, process.args, stderr=process.stderr)
+    return parse_pam(process.stdout)
+
+
+def parse_pam(data):
+    """8-битный PAM (P7) -> массив RGBA; серые и RGB изображения дополняются до RGBA."""
+    end = data.find(b"ENDHDR\n")
+    if not data.startswith(b"P7") or end < 0:
+        raise ValueError("ImageMagick did not return a PAM image")
+    fields = {}
+    for line in data[:end].decode("ascii").splitlines()[1:]:
+        if line and not line.startswith("#"):
+            name, _, value = line.partition(" ")
+            fields[name] = value.strip()
+    width, height, depth = int(fields["WIDTH"]), int(fields["HEIGHT"]), int(fields["DEPTH"])
+    if int(fields.get("MAXVAL", 255)) != 255 or depth not in (1, 2, 3, 4):
+        raise ValueError(f"Unsupported PAM image: {fields}")
+
+    pixels = np.frombuffer(data, dtype=np.uint8, count=width * height * depth, offset=end + 7)
+    pixels = pixels.reshape(height, width, depth)
+    if depth == 4:
+        return pixels
+    rgba = np.empty((height, width, 4), dtype=np.uint8)
+    rgba[..., :3] = pixels[..., :3] if depth == 3 else pixels[..., :1]
+    rgba[..., 3] = pixels[..., 1] if depth == 2 else 255
+    return rgba
+
+
+def convert_task(task, threads=None):
+    """Конвертировать одну задачу и вернуть строку отчёта (словарь); ошибки не выбрасываются."""
+    start = time.perf_counter()
+    preset = task.preset
+    result = {"source": task.source, "output": task.output, "status": CONVERTED,
+              "compression": preset["compression"], "backend": preset["backend"]}
+    temp_output, target = partial_output(task.output)
+    try:
+        if not os.path.isfile(task.source):
+            raise FileNotFoundError(f"Source image not found: {task.source}")
+        os.makedirs(os.path.dirname(task.output) or ".", exist_ok=True)
+        compression = analysis.known_compression(preset["compression"])
+        native = preset["backend"] == "native" and dds_encoder.available()
+        rgba = None
+        if compression is None:
+            rgba = read_image(task.source)
+            choice = analysis.choose_compression(rgba)
+            compression = choice.format
+            result["traits"] = choice.traits
+        result["compression"] = compression
+
+        # Результат пишется во временный файл и подменяет .dds только целиком: иначе
+        # обрезанный после ошибки файл оказался бы новее исходника и больше не пересобирался
+        if native and dds_encoder.supports(compression):
+            if rgba is None:
+                rgba = read_image(task.source)
+            dds_encoder.write_dds(temp_output, rgba, compression, preset["mipmap"], quality=preset["bc7_quality"],
+                                  threads=threads, mip_filter=preset["filter"], linear=bool(preset["linear"]))
+        else:
+            result["backend"] = "magick"
+            args = build_convert_args(task.source, target, compression, preset["mipmap"], preset["filter"])
+            Job(os.path.basename(task.output)).run_process(args)
+        os.replace(temp_output, task.output)
+        result["bytes_written"] = os.path.getsize(task.output)
+        write_settings(task)
+    except Exception as e:
+        remove_partial(temp_output)
+        result["status"] = FAILED
+        stderr = getattr(e, "stderr", None)
+        result["error"] = stderr.decode("utf-8", "replace").strip() if isinstance(stderr, bytes) and stderr else str(e)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def run(tasks, workers=None, force=False, log=None):
+    """Выполнить задачи в ``workers`` процессах; результат - отчёт в порядке манифеста."""
+    workers = max(1, workers or default_worker_count())
+    start = time.perf_counter()
+    results = [None] * len(tasks)
+    pending = []
+    for index, task in enumerate(tasks):
+        if not force and up_to_date(task):
+            results[index] = {"source": task.source, "output": task.output, "status": SKIPPED}
+        else:
+            pending.append(index)
+
+    done = len(tasks) - len(pending)
+
+    def finished(index, result):
+        nonlocal done
+        done += 1
+        results[index] = result
+        if log is not None:
+            line = f"[{done}/{len(tasks)}] {result['status']} {result['output']} ({result['seconds']:.2f} s)"
+            log(line if "error" not in result else f"{line}: {result['error']}")
+
+    # Потоки кодировщика делятся между процессами, чтобы не перегружать ядра
+    threads = max(1, dds_encoder.default_threads() // min(workers, max(1, len(pending))))
+    if workers == 1 or len(pending) <= 1:
+        for index in pending:
+            finished(index, convert_task(tasks[index], threads))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+            futures = {pool.submit(convert_task, tasks[index], threads): index for index in pending}
+            for future in as_completed(futures):
+                finished(futures[future], future.result())
+
+    return {
+        "workers": workers,
+        "seconds": time.perf_counter() - start,
+        "converted": sum(result["status"] == CONVERTED for result in results),
+        "skipped": sum(result["status"] == SKIPPED for result in results),
+        "failed": sum(result["status"] == FAILED for result in results),
+        "files": results,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m dds_evrika_plugin",
+                                     description="Convert the images listed in a manifest to DDS without Krita.")
+    parser.add_argument("manifest", help="JSON manifest of source images and export settings")
+    parser.add_argument("-j", "--jobs", type=int, default=default_worker_count(),
+                        help="worker processes (default: %(default)s)")
+    parser.add_argument("-f", "--force", action="store_true", help="convert even if the DDS is up to date")
+    parser.add_argument("--report", default="-", help="write the JSON report to this file (default: stdout)")
+    parser.add_argument("--dry-run", action="store_true", help="list what would be converted and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Точка входа: код возврата 1 - часть файлов не сконвертирована, 2 - ошибка манифеста."""
+    options = parse_args(argv)
+    log = lambda line: print(line, file=sys.stderr)
+    try:
+        tasks = load_manifest(options.manifest)
+    except ManifestError as e:
+        log(str(e))
+        return 2
+
+    if options.dry_run:
+        for task in tasks:
+            state = "up to date" if not options.force and up_to_date(task) else "convert"
+            print(f"{state}: {task.source} -> {task.output} ({task.preset['compression']}, {task.preset['backend']})")
+        return 0
+
+    report = run(tasks, options.jobs, options.force, log)
+    report["manifest"] = os.path.abspath(options.manifest)
+    text = json.dumps(report, indent=1, ensure_ascii=False)
+    if options.report == "-":
+        print(text)
+    else:
+        with open(options.report, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    log(f"{report['converted']} converted, {report['skipped']} up to date, {report['failed']} failed "
+        f"in {report['seconds']:.1f} s")
+    return 1 if report["failed"] else 0
@@ -0,0 +1,466 @@
+import mmap
+
+from .dds_format import (
+    BLOCK_FORMATS,
+    HEADER_SIZE,
+    DX10_HEADER_SIZE,
+    DDPF_ALPHAPIXELS,
+    DDPF_ALPHA,
+    DDPF_LUMINANCE,
+    DDSFormatError,
+    read_header,
+    parse_header
+)
+from .bc_tables import (
+    PARTITIONS_2,
+    PARTITIONS_3,
+    ANCHORS_2,
+    ANCHORS_3_SECOND,
+    ANCHORS_3_THIRD,
+    WEIGHTS,
+    BC7_MODES
+)
+
+# Встроенный декодер DDS на NumPy: импорт без запуска ImageMagick и без временных файлов.
+# NumPy необязателен - без него плагин продолжает работать через magick.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Версия декодера входит в ключи кэша конвертаций: увеличивать при изменении результата
+DECODER_VERSION = 1
+
+SUPPORTED_FORMATS = ("BC1", "BC2", "BC3", "BC4", "BC5", "BC7", "RGBA8", "BGRA8", "BGRX8", "RG8", "R8", "A8", "MASKED")
+
+# Количество блоков 4x4, декодируемых за один проход (ограничивает временную память)
+CHUNK_BLOCKS = 1 << 16
+
+
+def available():
+    return np is not None
+
+
+def is_supported(header):
+    return np is not None and header.format in SUPPORTED_FORMATS and not header.is_volume
+
+
+class MappedDDS:
+    """DDS file mapped into memory: only the pages of decoded levels are read from disk.
+
+    Use as a context manager; arrays returned by ``decode`` do not reference
+    the mapping and stay valid after ``close``.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Пустой файл нельзя отобразить в память
+                raise DDSFormatError("Not a DDS file")
+        try:
+            self.header = parse_header(self._map[:4 + HEADER_SIZE + DX10_HEADER_SIZE])
+        except DDSFormatError:
+            self._map.close()
+            raise
+
+    @property
+    def level_count(self):
+        return self.header.mipmap_count
+
+    def header_bytes(self):
+        return self._map[:self.header.data_offset]
+
+    def level_bytes(self, level):
+        """Байты уровня ``level`` (копия только этого участка файла)."""
+        offset = self.header.level_offset(level)
+        return self._map[offset:offset + self.header.level_bytes(level)]
+
+    def decode(self, level=0, progress=None):
+        offset = self.header.level_offset(level)
+        with memoryview(self._map) as view:
+            return decode_level(self.header, view[offset:offset + self.header.level_bytes(level)], level, progress)
+
+    def close(self):
+        try:
+            self._map.close()
+        except BufferError:
+            # Прерванное декодирование (ошибка, отмена) ещё держит участок отображения
+            # в кадрах исключения: отображение закроется, когда они будут освобождены
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def decode_file(path, level=0, progress=None):
+    """Прочитать уровень DDS-файла и вернуть ``(header, rgba)``, где rgba - массив (h, w, 4) uint8."""
+    with MappedDDS(path) as dds:
+        return dds.header, dds.decode(level, progress)
+
+
+def decode_bytes(data, level=0, progress=None):
+    header = parse_header(data[:4 + HEADER_SIZE + DX10_HEADER_SIZE])
+    offset = header.level_offset(level)
+    return header, decode_level(header, data[offset:offset + header.level_bytes(level)], level, progress)
+
+
+def decode_level(header, data, level=0, progress=None):
+    """Decode one mip level of the first surface into an (h, w, 4) RGBA array.
+
+    ``data`` must start at the level and hold at least ``header.level_bytes(level)``
+    bytes. ``progress(fraction)`` is called between chunks and may raise to abort.
+    """
+    if not is_supported(header):
+        raise DDSFormatError(f"Unsupported DDS format: {header.format_name}")
+    width, height = header.level_size(level)
+    size = header.level_bytes(level)
+    if len(data) < size:
+        raise DDSFormatError("DDS file is truncated")
+    buffer = np.frombuffer(data, dtype=np.uint8, count=size)
+
+    if header.compressed:
+        return _decode_blocks(header.format, buffer, width, height, progress)
+    return _decode_pixels(header, buffer, width, height)
+
+
+def _decode_blocks(fmt, buffer, width, height, progress):
+    blocks_x = (width + 3) // 4
+    blocks_y = (height + 3) // 4
+    blocks = buffer.reshape(-1, BLOCK_FORMATS[fmt])
+    decoder = BLOCK_DECODERS[fmt]
+
+    pixels = np.empty((blocks.shape[0], 16, 4), dtype=np.uint8)
+    for start in range(0, blocks.shape[0], CHUNK_BLOCKS):
+        end = start + CHUNK_BLOCKS
+        pixels[start:end] = decoder(blocks[start:end])
+        if progress is not None:
+            progress(min(end, blocks.shape[0]) / blocks.shape[0])
+
+    return blocks_to_image(pixels, blocks_x, blocks_y)[:height, :width]
+
+
+def blocks_to_image(pixels, blocks_x, blocks_y):
+    """(N, 16, C) пиксели блоков в порядке строк -> изображение (4*by, 4*bx, C)."""
+    channels = pixels.shape[-1]
+    image = pixels.reshape(blocks_y, blocks_x, 4, 4, channels).transpose(0, 2, 1, 3, 4)
+    return image.reshape(blocks_y * 4, blocks_x * 4, channels)
+
+
+def _expand_565(color):
+    r = (color >> 11) & 31
+    g = (color >> 5) & 63
+    b = color & 31
+    return np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], axis=-1)
+
+
+def _decode_color_block(blocks, four_color_only=False):
+    """BC1-блок цвета (8 байт) -> (N, 16, 4)."""
+    words = blocks[:, :4].copy().view("<u2").astype(np.int32)
+    c0, c1 = words[:, 0], words[:, 1]
+    indices = blocks[:, 4:8].copy().view("<u4").astype(np.int64)[:, 0]
+
+    p0 = _expand_565(c0)
+    p1 = _expand_565(c1)
+    palette = np.empty((blocks.shape[0], 4, 4), dtype=np.int32)
+    palette[:, 0, :3] = p0
+    palette[:, 1, :3] = p1
+    palette[:, :, 3] = 255
+
+    four_color = (c0 > c1) | four_color_only
+    palette[:, 2, :3] = np.where(four_color[:, None], (2 * p0 + p1) // 3, (p0 + p1) // 2)
+    palette[:, 3, :3] = np.where(four_color[:, None], (p0 + 2 * p1) // 3, 0)
+    palette[:, 3, 3] = np.where(four_color, 255, 0)
+
+    selectors = (indices[:, None] >> (2 * np.arange(16))) & 3
+    return np.take_along_axis(palette, selectors[:, :, None], axis=1).astype(np.uint8)
+
+
+def _decode_alpha_block(blocks):
+    """Блок альфы BC3/BC4/BC5 (8 байт) -> (N, 16) значений."""
+    a0 = blocks[:, 0].astype(np.int32)
+    a1 = blocks[:, 1].astype(np.int32)
+    bits = np.zeros(blocks.shape[0], dtype=np.int64)
+    for i in range(6):
+        bits |= blocks[:, 2 + i].astype(np.int64) << (8 * i)
+
+    steps = np.arange(1, 7)
+    eight = ((7 - steps[None, :]) * a0[:, None] + steps[None, :] * a1[:, None]) // 7
+    six = ((5 - steps[None, :4]) * a0[:, None] + steps[None, :4] * a1[:, None]) // 5
+    palette = np.empty((blocks.shape[0], 8), dtype=np.int32)
+    palette[:, 0] = a0
+    palette[:, 1] = a1
+    mode8 = (a0 > a1)[:, None]
+    palette[:, 2:6] = np.where(mode8, eight[:, :4], six)
+    palette[:, 6] = np.where(mode8[:, 0], eight[:, 4], 0)
+    palette[:, 7] = np.where(mode8[:, 0], eight[:, 5], 255)
+
+    selectors = (bits[:, None] >> (3 * np.arange(16))) & 7
+    return np.take_along_axis(palette, selectors, axis=1).astype(np.uint8)
+
+
+def _decode_bc1(blocks):
+    return _decode_color_block(blocks)
+
+
+def _decode_bc2(blocks):
+    pixels = _decode_color_block(blocks[:, 8:], four_color_only=True)
+    alpha = np.empty((blocks.shape[0], 16), dtype=np.uint8)
+    alpha[:, 0::2] = blocks[:, :8] & 0x0F
+    alpha[:, 1::2] = blocks[:, :8] >> 4
+    pixels[:, :, 3] = alpha * 17
+    return pixels
+
+
+def _decode_bc3(blocks):
+    pixels = _decode_color_block(blocks[:, 8:], four_color_only=True)
+    pixels[:, :, 3] = _decode_alpha_block(blocks[:, :8])
+    return pixels
+
+
+def _decode_bc4(blocks):
+    red = _decode_alpha_block(blocks)
+    pixels = np.empty((blocks.shape[0], 16, 4), dtype=np.uint8)
+    pixels[:, :, 0] = red
+    pixels[:, :, 1] = red
+    pixels[:, :, 2] = red
+    pixels[:, :, 3] = 255
+    return pixels
+
+
+def _decode_bc5(blocks):
+    # BC5 обычно хранит X/Y карты нормалей: Z восстанавливаем из единичной длины
+    red = _decode_alpha_block(blocks[:, :8])
+    green = _decode_alpha_block(blocks[:, 8:])
+    x = red / 127.5 - 1.0
+    y = green / 127.5 - 1.0
+    z = np.sqrt(np.clip(1.0 - x * x - y * y, 0.0, 1.0))
+    pixels = np.empty((blocks.shape[0], 16, 4), dtype=np.uint8)
+    pixels[:, :, 0] = red
+    pixels[:, :, 1] = green
+    pixels[:, :, 2] = np.round((z + 1.0) * 127.5).astype(np.uint8)
+    pixels[:, :, 3] = 255
+    return pixels
+
+
+def _subset_tables():
+    partitions = {
+        1: np.zeros((1, 16), dtype=np.int64),
+        2: np.array(PARTITIONS_2, dtype=np.int64),
+        3: np.array(PARTITIONS_3, dtype=np.int64),
+    }
+    anchors = {
+        1: np.zeros((1, 16), dtype=bool),
+        2: np.zeros((64, 16), dtype=bool),
+        3: np.zeros((64, 16), dtype=bool),
+    }
+    for subsets in (1, 2, 3):
+        anchors[subsets][:, 0] = True
+    anchors[2][np.arange(64), ANCHORS_2] = True
+    anchors[3][np.arange(64), ANCHORS_3_SECOND] = True
+    anchors[3][np.arange(64), ANCHORS_3_THIRD] = True
+    return partitions, anchors
+
+
+_BC7_TABLES = None
+
+
+def _bc7_tables():
+    global _BC7_TABLES
+    if _BC7_TABLES is None:
+        weights = {bits: np.array(values, dtype=np.int32) for bits, values in WEIGHTS.items()}
+        _BC7_TABLES = _subset_tables() + (weights,)
+    return _BC7_TABLES
+
+
+class _BitReader:
+    """Чтение полей переменной длины из 128-битных блоков (вектор по блокам)."""
+
+    def __init__(self, blocks):
+        self.bits = np.unpackbits(blocks, axis=1, bitorder="little").astype(np.int64)
+        self.rows = np.arange(blocks.shape[0])[:, None]
+        self.position = 0
+
+    def read(self, count):
+        if count == 0:
+            return np.zeros(self.bits.shape[0], dtype=np.int64)
+        value = self.bits[:, self.position:self.position + count] @ (1 << np.arange(count))
+        self.position += count
+        return value
+
+    def read_at(self, starts, count, lengths):
+        """Прочитать ``lengths`` (<= count) бит с позиций ``starts`` для каждого блока и пикселя."""
+        offsets = np.arange(count)
+        positions = np.minimum(starts[..., None] + offsets, 127)
+        values = self.bits[self.rows[..., None], positions]
+        values = np.where(offsets < lengths[..., None], values, 0)
+        return values @ (1 << offsets)
+
+
+def _unquantize(values, bits):
+    values = values << (8 - bits)
+    return values | (values >> bits)
+
+
+def _decode_bc7(blocks):
+    partitions, anchors, weights = _bc7_tables()
+    count = blocks.shape[0]
+    pixels = np.zeros((count, 16, 4), dtype=np.uint8)
+
+    first = blocks[:, 0].astype(np.int64)
+    lowest_bit = first & -first
+    modes = np.where(first == 0, -1, np.log2(np.maximum(lowest_bit, 1)).astype(np.int64))
+
+    for mode, (subsets, partition_bits, rotation_bits, selector_bits, color_bits,
+               alpha_bits, endpoint_pbits, shared_pbits, index_bits, index2_bits) in enumerate(BC7_MODES):
+        selected = np.nonzero(modes == mode)[0]
+        if selected.size == 0:
+            continue
+        reader = _BitReader(blocks[selected])
+        reader.position = mode + 1
+        partition = reader.read(partition_bits)
+        rotation = reader.read(rotation_bits)
+        index_selector = reader.read(selector_bits)
+
+        endpoint_count = subsets * 2
+        endpoints = np.empty((selected.size, endpoint_count, 4), dtype=np.int64)
+        for channel in range(3):
+            for endpoint in range(endpoint_count):
+                endpoints[:, endpoint, channel] = reader.read(color_bits)
+        for endpoint in range(endpoint_count):
+            endpoints[:, endpoint, 3] = reader.read(alpha_bits) if alpha_bits else 255
+
+        color_precision = color_bits
+        alpha_precision = alpha_bits
+        if endpoint_pbits or shared_pbits:
+            if endpoint_pbits:
+                pbits = np.stack([reader.read(1) for _ in range(endpoint_count)], axis=1)
+            else:
+                pbits = np.repeat(np.stack([reader.read(1) for _ in range(subsets)], axis=1), 2, axis=1)
+            endpoints[:, :, :3] = (endpoints[:, :, :3] << 1) | pbits[:, :, None]
+            color_precision += 1
+            if alpha_bits:
+                endpoints[:, :, 3] = (endpoints[:, :, 3] << 1) | pbits
+                alpha_precision += 1
+        endpoints[:, :, :3] = _unquantize(endpoints[:, :, :3], color_precision)
+        if alpha_bits:
+            endpoints[:, :, 3] = _unquantize(endpoints[:, :, 3], alpha_precision)
+
+        partition_table = partitions[subsets][partition]
+        anchor_table = anchors[subsets][partition]
+
+        lengths = index_bits - anchor_table.astype(np.int64)
+        starts = reader.position + np.cumsum(lengths, axis=1) - lengths
+        primary = reader.read_at(starts, index_bits, lengths)
+        reader.position += 16 * index_bits - subsets
+
+        if index2_bits:
+            lengths2 = np.full((selected.size, 16), index2_bits, dtype=np.int64)
+            lengths2[:, 0] -= 1
+            starts2 = reader.position + np.cumsum(lengths2, axis=1) - lengths2
+            secondary = reader.read_at(starts2, index2_bits, lengths2)
+            swap = (index_selector == 1)[:, None]
+            color_weights = np.where(swap, weights[index2_bits][secondary], weights[index_bits][primary])
+            alpha_weights = np.where(swap, weights[index_bits][primary], weights[index2_bits][secondary])
+        else:
+            color_weights = weights[index_bits][primary]
+            alpha_weights = color_weights
+
+        rows = np.arange(selected.size)[:, None]
+        e0 = endpoints[rows, 2 * partition_table]
+        e1 = endpoints[rows, 2 * partition_table + 1]
+        result = np.empty((selected.size, 16, 4), dtype=np.int64)
+        result[:, :, :3] = ((64 - color_weights[..., None]) * e0[:, :, :3] + color_weights[..., None] * e1[:, :, :3] + 32) >> 6
+        result[:, :, 3] = ((64 - alpha_weights) * e0[:, :, 3] + alpha_weights * e1[:, :, 3] + 32) >> 6
+
+        if rotation_bits:
+            for value in (1, 2, 3):
+                rotated = rotation == value
+                if rotated.any():
+                    channel = value - 1
+                    swapped = result[rotated].copy()
+                    swapped[:, :, [channel, 3]] = swapped[:, :, [3, channel]]
+                    result[rotated] = swapped
+
+        pixels[selected] = result.astype(np.uint8)
+    return pixels
+
+
+BLOCK_DECODERS = {
+    "BC1": _decode_bc1,
+    "BC2": _decode_bc2,
+    "BC3": _decode_bc3,
+    "BC4": _decode_bc4,
+    "BC5": _decode_bc5,
+    "BC7": _decode_bc7,
+}
+
+
+def _decode_pixels(header, buffer, width, height):
+    fmt = header.format
+    if fmt in ("RGBA8", "BGRA8", "BGRX8"):
+        image = buffer.reshape(height, width, 4).copy()
+        if fmt != "RGBA8":
+            image[:, :, [0, 2]] = image[:, :, [2, 0]]
+        if fmt == "BGRX8":
+            image[:, :, 3] = 255
+        return image
+
+    image = np.zeros((height, width, 4), dtype=np.uint8)
+    image[:, :, 3] = 255
+    if fmt == "R8":
+        image[:, :, 0] = buffer.reshape(height, width)
+    elif fmt == "RG8":
+        image[:, :, :2] = buffer.reshape(height, width, 2)
+    elif fmt == "A8":
+        image[:, :, 3] = buffer.reshape(height, width)
+    else:
+        image = _decode_masked(header, buffer, width, height)
+    return image
+
+
+def _decode_masked(header, buffer, width, height):
+    """Несжатые форматы DX9, описанные битовыми масками (RGB, luminance, alpha)."""
+    bytes_per_pixel = header.bytes_per_pixel
+    raw = buffer.reshape(height * width, bytes_per_pixel).astype(np.uint32)
+    values = np.zeros(height * width, dtype=np.uint32)
+    for i in range(bytes_per_pixel):
+        values |= raw[:, i] << (8 * i)
+
+    def channel(mask):
+        if not mask:
+            return None
+        shift = (mask & -mask).bit_length() - 1
+        bits = bin(mask).count("1")
+        value = ((values & mask) >> shift).astype(np.uint32)
+        return (value * 255 + ((1 << bits) - 1) // 2) // ((1 << bits) - 1)
+
+    # Маски за пределами разрядности пикселя встречаются у некоторых кодировщиков:
+    # для яркости в таком случае берём младший байт, для альфы - следующий за ним
+    limit = (1 << (8 * bytes_per_pixel)) - 1
+    r_mask, g_mask, b_mask, a_mask = (mask if mask <= limit else 0 for mask in header.masks)
+    if header.pf_flags & DDPF_LUMINANCE:
+        r_mask = r_mask or 0xFF
+        if header.pf_flags & DDPF_ALPHAPIXELS and bytes_per_pixel == 2:
+            a_mask = a_mask or 0xFF00
+    image = np.zeros((height * width, 4), dtype=np.uint8)
+    image[:, 3] = 255
+    if header.pf_flags & DDPF_LUMINANCE:
+        luminance = channel(r_mask)
+        image[:, 0] = luminance
+        image[:, 1] = luminance
+        image[:, 2] = luminance
+    elif header.pf_flags & DDPF_ALPHA and not r_mask:
+        pass
+    else:
+        for index, mask in enumerate((r_mask, g_mask, b_mask)):
+            value = channel(mask)
+            if value is not None:
+                image[:, index] = value
+    if a_mask and header.pf_flags & (DDPF_ALPHAPIXELS | DDPF_ALPHA):
+        image[:, 3] = channel(a_mask)
+    return image.reshape(height, width, 4)
@@ -0,0 +1,288 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+
+from .dds_format import BLOCK_FORMATS, build_header, mipmap_count
+from .endpoints import np, principal_endpoints, least_squares_endpoints
+from .mipmaps import mip_chain
+from . import bc7_encoder
+
+# Встроенный кодировщик DDS на NumPy (BC1/BC2/BC3/BC7 и несжатый BGRA): блоки 4x4
+# кодируются пачками (горизонтальными полосами) без запуска внешнего процесса.
+# NumPy необязателен.
+
+# Версия кодировщика входит в ключи кэша конвертаций: увеличивать при изменении результата
+ENCODER_VERSION = 3
+
+# Значения export_compression -> формат DDS
+COMPRESSION_FORMATS = {"dxt1": "BC1", "dxt3": "BC2", "dxt5": "BC3", "bc7": "BC7", "none": "BGRA8"}
+
+# Количество блоков, кодируемых за один проход (ограничивает временную память)
+CHUNK_BLOCKS = 1 << 15
+
+# Итерации уточнения конечных точек методом наименьших квадратов
+REFINE_ITERATIONS = 2
+
+
+def default_threads():
+    """Полосы блоков кодируются на всех ядрах: NumPy отпускает GIL на больших массивах.
+
+    Пул процессов здесь не подходит - внутри Krita sys.executable указывает на саму Krita.
+    """
+    return max(1, os.cpu_count() or 1)
+
+
+def available():
+    return np is not None
+
+
+def supports(compression_format):
+    return np is not None and compression_format.lower() in COMPRESSION_FORMATS
+
+
+def pixels_to_rgba(width, height, pixel_format, data):
+    """Сырые 8-битные пиксели ("BGRA" или "RGBA") -> массив (h, w, 4) в порядке RGBA."""
+    image = np.frombuffer(data, dtype=np.uint8, count=width * height * 4).reshape(height, width, 4)
+    if pixel_format == "BGRA":
+        image = image[:, :, [2, 1, 0, 3]]
+    return image
+
+
+def image_to_blocks(image):
+    """(h, w, C) -> (N, 16, C) блоки 4x4 в порядке строк; края дополняются повтором пикселей."""
+    height, width, channels = image.shape
+    pad_y, pad_x = -height % 4, -width % 4
+    if pad_y or pad_x:
+        image = np.pad(image, ((0, pad_y), (0, pad_x), (0, 0)), mode="edge")
+    blocks_y, blocks_x = image.shape[0] // 4, image.shape[1] // 4
+    blocks = image.reshape(blocks_y, 4, blocks_x, 4, channels).transpose(0, 2, 1, 3, 4)
+    return blocks.reshape(blocks_y * blocks_x, 16, channels)
+
+
+def _quantize_565(colors):
+    """float RGB -> (упакованный 565, развёрнутый обратно в 8 бит цвет)."""
+    r = np.clip(np.rint(colors[..., 0] * (31 / 255)), 0, 31).astype(np.int32)
+    g = np.clip(np.rint(colors[..., 1] * (63 / 255)), 0, 63).astype(np.int32)
+    b = np.clip(np.rint(colors[..., 2] * (31 / 255)), 0, 31).astype(np.int32)
+    packed = (r << 11) | (g << 5) | b
+    expanded = np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], axis=-1)
+    return packed, expanded.astype(np.float32)
+
+
+# Индекс палитры BC1 для шага вдоль отрезка e0-e1 (четырёх- и трёхцветный режимы)
+FOUR_COLOR_INDICES = (0, 2, 3, 1)
+THREE_COLOR_INDICES = (0, 2, 1)
+
+
+def _assign_indices(colors, e0, e1, three_color, transparent):
+    """Ближайший цвет палитры для каждого пикселя; возвращает индексы, доли t и ошибку блока.
+
+    Цвета палитры лежат на отрезке e0-e1 с равным шагом, поэтому ближайший из них
+    определяется проекцией пикселя на этот отрезок без перебора палитры.
+    """
+    direction = e1 - e0
+    length = np.einsum("ni,ni->n", direction, direction)
+    t = np.einsum("npi,ni->np", colors - e0[:, None, :], direction) / np.maximum(length, 1e-6)[:, None]
+    steps = np.where(three_color, 2, 3)[:, None]
+    step = np.clip(np.rint(t * steps), 0, steps).astype(np.int64)
+    step = np.where((length > 0)[:, None], step, 0)
+    fractions = (step / steps).astype(np.float32)
+
+    index_table = np.array([FOUR_COLOR_INDICES, THREE_COLOR_INDICES + (3,)])
+    indices = index_table[three_color.astype(np.int64)[:, None], step]
+    residual = colors - e0[:, None, :] - fractions[..., None] * direction[:, None, :]
+    error = np.einsum("npi,npi->np", residual, residual)
+    if transparent is not None:
+        # Индекс 3 в трёхцветном режиме - прозрачный чёрный
+        indices = np.where(transparent, 3, indices)
+        fractions = np.where(transparent, 0.0, fractions)
+        error = np.where(transparent, 0.0, error)
+    return indices, fractions, error.sum(axis=1)
+
+
+def _encode_color_blocks(colors, transparent=None):
+    """(N, 16, 3) цвета -> (N, 8) байт цветовых блоков BC1.
+
+    ``transparent`` (N, 16) включает трёхцветный режим BC1 с прозрачным индексом 3
+    для блоков, где есть прозрачные пиксели (однобитная альфа DXT1).
+    """
+    count = colors.shape[0]
+    colors = colors.astype(np.float32)
+    if transparent is not None and transparent.any():
+        three_color = transparent.any(axis=1)
+        weights = (~transparent).astype(np.float32)
+    else:
+        transparent = None
+        three_color = np.zeros(count, dtype=bool)
+        weights = np.ones(colors.shape[:2], dtype=np.float32)
+
+    start, end = principal_endpoints(colors, weights)
+    packed0, e0 = _quantize_565(start)
+    packed1, e1 = _quantize_565(end)
+    indices, fractions, error = _assign_indices(colors, e0, e1, three_color, transparent)
+
+    for _ in range(REFINE_ITERATIONS):
+        refined0, refined1 = least_squares_endpoints(colors, weights, fractions, e0, e1)
+        new_packed0, new_e0 = _quantize_565(refined0)
+        new_packed1, new_e1 = _quantize_565(refined1)
+        new_indices, new_fractions, new_error = _assign_indices(colors, new_e0, new_e1, three_color, transparent)
+        better = new_error < error
+        packed0 = np.where(better, new_packed0, packed0)
+        packed1 = np.where(better, new_packed1, packed1)
+        e0 = np.where(better[:, None], new_e0, e0)
+        e1 = np.where(better[:, None], new_e1, e1)
+        indices = np.where(better[:, None], new_indices, indices)
+        fractions = np.where(better[:, None], new_fractions, fractions)
+        error = np.where(better, new_error, error)
+
+    # Порядок конечных точек задаёт режим блока: c0 > c1 - четыре цвета, иначе три + прозрачный
+    swap = np.where(three_color, packed0 > packed1, packed0 < packed1)
+    packed0, packed1 = np.where(swap, packed1, packed0), np.where(swap, packed0, packed1)
+    indices = np.where(swap[:, None], _swap_indices(indices, three_color), indices)
+    # Одинаковые конечные точки в четырёхцветном режиме превратили бы индекс 3 в прозрачный
+    indices = np.where(((packed0 == packed1) & ~three_color)[:, None], 0, indices)
+
+    block = np.empty((count, 8), dtype=np.uint8)
+    block[:, 0:2] = packed0.astype("<u2").view(np.uint8).reshape(count, 2)
+    block[:, 2:4] = packed1.astype("<u2").view(np.uint8).reshape(count, 2)
+    bits = (indices.astype(np.uint32) << (2 * np.arange(16, dtype=np.uint32))).sum(axis=1, dtype=np.uint32)
+    block[:, 4:8] = bits.astype("<u4").view(np.uint8).reshape(count, 4)
+    return block
+
+
+def _swap_indices(indices, three_color):
+    """Индексы после перестановки конечных точек: 0<->1, в четырёхцветном режиме ещё 2<->3."""
+    four_color_swap = indices ^ 1
+    three_color_swap = np.where(indices < 2, indices ^ 1, indices)
+    return np.where(three_color[:, None], three_color_swap, four_color_swap)
+
+
+def _encode_alpha_blocks(values):
+    """(N, 16) значения канала -> (N, 8) байт блоков альфы BC3/BC4 (восьмиуровневый режим)."""
+    count = values.shape[0]
+    values = values.astype(np.int32)
+    a0 = values.max(axis=1)
+    a1 = values.min(axis=1)
+
+    steps = np.arange(1, 7)
+    palette = np.empty((count, 8), dtype=np.int32)
+    palette[:, 0] = a0
+    palette[:, 1] = a1
+    palette[:, 2:] = ((7 - steps) * a0[:, None] + steps * a1[:, None]) // 7
+    indices = np.abs(values[:, :, None] - palette[:, None, :]).argmin(axis=-1)
+    indices = np.where((a0 == a1)[:, None], 0, indices)
+
+    block = np.empty((count, 8), dtype=np.uint8)
+    block[:, 0] = a0
+    block[:, 1] = a1
+    bits = (indices.astype(np.uint64) << (3 * np.arange(16, dtype=np.uint64))).sum(axis=1, dtype=np.uint64)
+    block[:, 2:8] = bits.astype("<u8").view(np.uint8).reshape(count, 8)[:, :6]
+    return block
+
+
+def _encode_bc1(blocks):
+    return _encode_color_blocks(blocks[:, :, :3], blocks[:, :, 3] < 128)
+
+
+def _encode_bc2(blocks):
+    alpha = (blocks[:, :, 3].astype(np.uint16) * 15 + 127) // 255
+    encoded = np.empty((blocks.shape[0], 16), dtype=np.uint8)
+    encoded[:, :8] = alpha[:, 0::2] | (alpha[:, 1::2] << 4)
+    encoded[:, 8:] = _encode_color_blocks(blocks[:, :, :3])
+    return encoded
+
+
+def _encode_bc3(blocks):
+    encoded = np.empty((blocks.shape[0], 16), dtype=np.uint8)
+    encoded[:, :8] = _encode_alpha_blocks(blocks[:, :, 3])
+    encoded[:, 8:] = _encode_color_blocks(blocks[:, :, :3])
+    return encoded
+
+
+BLOCK_ENCODERS = {
+    "BC1": _encode_bc1,
+    "BC2": _encode_bc2,
+    "BC3": _encode_bc3,
+}
+
+
+def encode_surface(image, fmt, progress=None, quality="balanced", threads=None):
+    """Закодировать один уровень (h, w, 4) RGBA в байты формата ``fmt``.
+
+    Полосы блоков распределяются по ``threads`` потокам; ``quality`` задаёт уровень BC7.
+    """
+    if fmt == "BGRA8":
+        return image[:, :, [2, 1, 0, 3]].tobytes()
+    return encode_blocks(image_to_blocks(image), fmt, progress, quality, threads).tobytes()
+
+
+def encode_blocks(blocks, fmt, progress=None, quality="balanced", threads=None):
+    """(N, 16, 4) RGBA пиксели блоков -> (N, размер блока) байт формата ``fmt``."""
+    if fmt == "BC7":
+        encoder = partial(bc7_encoder.encode_blocks, quality=quality)
+        chunk = bc7_encoder.CHUNK_BLOCKS[quality]
+    else:
+        encoder = BLOCK_ENCODERS[fmt]
+        chunk = CHUNK_BLOCKS
+    encoded = np.empty((blocks.shape[0], BLOCK_FORMATS[fmt]), dtype=np.uint8)
+    spans = [(start, min(start + chunk, blocks.shape[0])) for start in range(0, blocks.shape[0], chunk)]
+
+    def encode_span(span):
+        start, end = span
+        encoded[start:end] = encoder(blocks[start:end])
+
+    threads = min(threads or default_threads(), len(spans))
+    if threads <= 1:
+        for done, span in enumerate(spans, 1):
+            encode_span(span)
+            if progress is not None:
+                progress(done / len(spans))
+    else:
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="evrika-encode") as pool:
+            futures = [pool.submit(encode_span, span) for span in spans]
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    future.result()
+                    if progress is not None:
+                        progress(done / len(spans))
+            except BaseException:
+                # Отмена задачи или ошибка: оставшиеся полосы не запускаем
+                for future in futures:
+                    future.cancel()
+                raise
+    return encoded
+
+
+def write_dds(path, rgba, compression_format, mipmap_levels, progress=None, quality="balanced", threads=None,
+              mip_filter="Box", linear=False):
+    """Write ``rgba`` (h, w, 4) with its mip chain to ``path`` as a DDS file.
+
+    The file is written next to the target and renamed on success, so a failed
+    or cancelled export never leaves a truncated texture behind. ``quality`` is
+    one of ``bc7_encoder.QUALITY_LEVELS`` and only affects BC7; ``threads``
+    limits the encoding threads (by default one per CPU core). Mip levels are
+    filtered with ``mip_filter`` (an ImageMagick filter name), in linear light
+    when ``linear`` is set.
+    """
+    fmt = COMPRESSION_FORMATS[compression_format.lower()]
+    height, width = rgba.shape[:2]
+    count = mipmap_count(width, height, mipmap_levels)
+    total = float(sum(max(1, width >> level) * max(1, height >> level) for level in range(count)))
+
+    temp_path = path + ".part"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(build_header(width, height, fmt, count))
+            done = 0.0
+            for level in mip_chain(rgba, count, mip_filter, linear):
+                share = level.shape[0] * level.shape[1] / total
+                level_progress = None
+                if progress is not None:
+                    level_progress = lambda fraction, done=done, share=share: progress(done + share * fraction)
+                f.write(encode_surface(level, fmt, level_progress, quality, threads))
+                done += share
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -1,8 +1,9 @@
 import os
 import json
 import hashlib
-import shutil
-import subprocess
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
 from krita import *
 from PyQt5.QtWidgets import (
     QDialog,
@@ -15,10 +16,33 @@ from PyQt5.QtWidgets import (
     QWidget,
     QMessageBox,
     QHBoxLayout,
-    QFileDialog
+    QFileDialog,
+    QProgressBar,
+    QSpinBox,
+    QInputDialog,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QAbstractItemView,
+    QApplication
 )
-from PyQt5.QtCore import QLocale
-from sys import platform
+from PyQt5.QtGui import QIcon, QImage, QPixmap
+from PyQt5.QtCore import QLocale, QObject, QSize, Qt, pyqtSignal
+from .jobs import Job, JobBatch, JobEngine
+from .magick import build_import_args, magick_version
+from .magick_worker import MagickWorkerPool, run_magick
+from .presets import PRESET_KEYS, SETTINGS_KEYS, active_preset, get_preset, preset_names, save_preset
+from .cache import ConversionCache, DEFAULT_MAX_MB, cache_key, run_cached
+from .document_io import (read_document_pixels, read_document_bgra, read_layer_pixels, create_document, add_layer,
+                          rgba_to_bgra)
+from .dds_format import DDSFormatError, read_header
+from . import dds_decoder
+from . import dds_encoder
+from . import streaming
+from . import thumbnails
+from . import atlas
+from . import export_jobs
+from .timing import TraceLog, job_record, stage_statistics
+from .workspace import WorkspacePool
 
 # Version 1.1
 
@@ -29,8 +53,18 @@ CONFIG_FILE = os.path.join(PLUGIN_DIR, "settings.json")
 
 # Чтение и запись в JSON файл
 class SettingsManager:
+    """Настройки в памяти с записью в JSON.
+
+    Внутри ``transaction()`` изменения только копятся и записываются один раз в конце;
+    файл пишется во временный и атомарно переименовывается. Если файл изменили
+    извне (другой экземпляр Krita), он перечитывается по mtime при следующем чтении.
+    """
+
     def __init__(self):
         self._settings = {}
+        self._mtime = None
+        self._dirty = False
+        self._depth = 0
         if not os.path.exists(PLUGIN_DIR):
             os.makedirs(PLUGIN_DIR)
         self._load_settings()
@@ -40,22 +74,57 @@ class SettingsManager:
         if os.path.exists(CONFIG_FILE):
             with open(CONFIG_FILE, 'r') as f:
                 self._settings = json.load(f)
+            self._mtime = os.stat(CONFIG_FILE).st_mtime_ns
         else:
             self._settings = {}
+            self._mtime = None
+
+    def reload_if_changed(self):
+        """Перечитать файл, если его mtime изменился; несохранённые изменения важнее."""
+        if self._dirty:
+            return
+        try:
+            mtime = os.stat(CONFIG_FILE).st_mtime_ns
+        except OSError:
+            return
+        if mtime != self._mtime:
+            try:
+                self._load_settings()
+            except (OSError, ValueError):
+                # Файл пишется прямо сейчас или повреждён - остаёмся на прежних значениях
+                pass
 
     def save_settings(self):
-        """Сохранение настроек в JSON файл."""
-        with open(CONFIG_FILE, 'w') as f:
+        """Сохранение настроек в JSON файл (через временный файл и переименование)."""
+        temp_file = CONFIG_FILE + ".tmp"
+        with open(temp_file, 'w') as f:
             json.dump(self._settings, f, indent=4)
+        os.replace(temp_file, CONFIG_FILE)
+        self._mtime = os.stat(CONFIG_FILE).st_mtime_ns
+        self._dirty = False
+
+    @contextmanager
+    def transaction(self):
+        """Несколько изменений - одна запись файла."""
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if not self._depth and self._dirty:
+                self.save_settings()
 
     def get(self, key, default=None):
         """Получить значение настройки по ключу."""
+        self.reload_if_changed()
         return self._settings.get(key, default)
 
     def set(self, key, value):
         """Установить или изменить значение настройки."""
         self._settings[key] = value
-        self.save_settings()
+        self._dirty = True
+        if not self._depth:
+            self.save_settings()
 
 
 class EvrikaSettingsWidget(QWidget):
@@ -80,6 +149,9 @@ class EvrikaSettingsWidget(QWidget):
         self.temp_export_check.setChecked(self.settings.get("use_original_export_name", False))
         self.temp_import_check.setChecked(self.settings.get("use_original_import_name", False))
         self.export_name_input.setText(self.settings.get("export_custom_name", ""))
+        self.batch_name_input = QLineEdit()
+        self.batch_name_input.setPlaceholderText("{name}")
+        self.batch_name_input.setText(self.settings.get("batch_export_name", "{name}"))
 
         form_layout = QFormLayout()
         self.import_format_combo = QComboBox()
@@ -87,21 +159,87 @@ class EvrikaSettingsWidget(QWidget):
         self.import_format_combo.setCurrentText(self.settings.get("import_format", "png"))
 
         self.export_compression_combo = QComboBox()
-        self.export_compression_combo.addItems(["dxt1", "dxt3", "dxt5", "bc7", "none"])
+        self.export_compression_combo.addItems(["dxt1", "dxt3", "dxt5", "bc7", "none", "auto"])
         self.export_compression_combo.setCurrentText(self.settings.get("export_compression", "dxt1"))
 
+        self.export_backend_combo = QComboBox()
+        self.export_backend_combo.addItem(self.translations["backend_magick"], "magick")
+        self.export_backend_combo.addItem(self.translations["backend_native"], "native")
+        self.export_backend_combo.setCurrentIndex(max(0, self.export_backend_combo.findData(self.settings.get("export_backend", "magick"))))
+
+        self.export_bc7_quality_combo = QComboBox()
+        for quality in ("fast", "balanced", "thorough"):
+            self.export_bc7_quality_combo.addItem(self.translations[f"bc7_{quality}"], quality)
+        self.export_bc7_quality_combo.setCurrentIndex(max(0, self.export_bc7_quality_combo.findData(self.settings.get("export_bc7_quality", "balanced"))))
+
         self.export_mipmap_combo = QComboBox()
-        self.export_mipmap_combo.addItems(["1", "2", "3", "4", "5", "Auto"])
+        self.export_mipmap_combo.addItems(["0", "1", "2", "3", "4", "5", "Auto"])
         self.export_mipmap_combo.setCurrentText(self.settings.get("export_mipmap", "Auto"))
 
         self.export_filter_combo = QComboBox()
         self.export_filter_combo.addItems(["Undefined", "Point", "Box", "Triangle", "Hermite", "Hanning", "Hamming", "Blackman", "Gaussian", "Quadratic", "Cubic", "Catrom", "Mitchell", "Jinc", "Sinc", "SincFast", "Kaiser", "Welch", "Parzen", "Bohman", "Bartlett", "Lagrange", "Lanczos", "LanczosSharp", "Lanczos2", "Lanczos2Sharp", "Robidoux", "RobidouxSharp", "Cosine", "Spline", "Sentinel"])
         self.export_filter_combo.setCurrentText(self.settings.get("export_filter", "Lanczos"))
 
+        self.export_linear_check = QCheckBox(self.translations["export_linear_mips"])
+        self.export_linear_check.setChecked(self.settings.get("export_linear_mips", False))
+
+        self.preset_combo = QComboBox()
+        self.preset_combo.addItem(self.translations["preset_custom"], "")
+        for name in preset_names(self.settings):
+            self.preset_combo.addItem(name, name)
+        self.preset_combo.setCurrentIndex(max(0, self.preset_combo.findData(self.settings.get("active_preset", ""))))
+        self.preset_combo.currentIndexChanged.connect(self.load_preset)
+        save_preset_button = QPushButton(self.translations["save_preset"])
+        save_preset_button.clicked.connect(self.save_as_preset)
+        preset_layout = QHBoxLayout()
+        preset_layout.addWidget(self.preset_combo, 1)
+        preset_layout.addWidget(save_preset_button)
+        self.load_preset()
+
+        form_layout.addRow(self.translations["preset"], preset_layout)
         form_layout.addRow(self.translations["import_format"], self.import_format_combo)
         form_layout.addRow(self.translations["export_compression"], self.export_compression_combo)
+        form_layout.addRow(self.translations["export_backend"], self.export_backend_combo)
+        form_layout.addRow(self.translations["export_bc7_quality"], self.export_bc7_quality_combo)
         form_layout.addRow(self.translations["export_mipmap"], self.export_mipmap_combo)
         form_layout.addRow(self.translations["export_filter"], self.export_filter_combo)
+        form_layout.addRow(self.export_linear_check)
+        form_layout.addRow(self.translations["batch_export_name"], self.batch_name_input)
+
+        self.magick_worker_check = QCheckBox(self.translations["magick_worker"])
+        self.magick_worker_check.setChecked(self.settings.get("magick_worker", True))
+        form_layout.addRow(self.magick_worker_check)
+
+        self.incremental_check = QCheckBox(self.translations["export_incremental"])
+        self.incremental_check.setChecked(self.settings.get("export_incremental", False))
+        form_layout.addRow(self.incremental_check)
+
+        self.streaming_check = QCheckBox(self.translations["export_streaming"])
+        self.streaming_check.setChecked(self.settings.get("export_streaming", True))
+        form_layout.addRow(self.streaming_check)
+
+        self.trace_check = QCheckBox(self.translations["trace_enabled"])
+        self.trace_check.setChecked(self.settings.get("trace_enabled", True))
+        statistics_button = QPushButton(self.translations["statistics"])
+        statistics_button.clicked.connect(self.show_statistics)
+        trace_layout = QHBoxLayout()
+        trace_layout.addWidget(self.trace_check, 1)
+        trace_layout.addWidget(statistics_button)
+        form_layout.addRow(trace_layout)
+
+        self.cache_check = QCheckBox(self.translations["cache_enabled"])
+        self.cache_check.setChecked(self.settings.get("cache_enabled", True))
+        self.cache_size_spin = QSpinBox()
+        self.cache_size_spin.setRange(0, 1 << 20)
+        self.cache_size_spin.setSuffix(" MB")
+        self.cache_size_spin.setValue(int(self.settings.get("cache_size_mb", DEFAULT_MAX_MB)))
+        clear_cache_button = QPushButton(self.translations["clear_cache"])
+        clear_cache_button.clicked.connect(self.clear_cache)
+        cache_layout = QHBoxLayout()
+        cache_layout.addWidget(self.cache_size_spin)
+        cache_layout.addWidget(clear_cache_button)
+        form_layout.addRow(self.cache_check)
+        form_layout.addRow(self.translations["cache_size"], cache_layout)
 
         save_button = QPushButton(self.translations["save_settings"])
         save_button.clicked.connect(self.save_settings)
@@ -126,6 +264,53 @@ class EvrikaSettingsWidget(QWidget):
             "save_settings": "Сохранить настройки",
             "temporary_file_settings": "Настройки временных файлов",
             "custom_export_name": "Кастомное имя файла для экспорта",
+            "export_backend": "Кодировщик (экспорт)",
+            "backend_magick": "ImageMagick",
+            "backend_native": "Встроенный (NumPy)",
+            "export_bc7_quality": "Качество BC7 (встроенный)",
+            "batch_export_name": "Шаблон имени ({name}, {index}, {compression})",
+            "magick_worker": "Держать процесс ImageMagick запущенным между конвертациями",
+            "export_incremental": "Повторный экспорт только изменённых блоков (встроенный)",
+            "export_linear_mips": "Строить mip в линейном свете (встроенный)",
+            "export_streaming": "Экспортировать очень большие текстуры полосами (встроенный)",
+            "trace_enabled": "Записывать время этапов импорта и экспорта",
+            "statistics": "Статистика...",
+            "stats_recent": "Последние задачи",
+            "stats_stages": "Длительность этапов",
+            "stats_job": "Задача",
+            "stats_state": "Состояние",
+            "stats_total": "Всего",
+            "stats_read": "Прочитано",
+            "stats_written": "Записано",
+            "stats_peak_memory": "Прирост памяти",
+            "stats_stage": "Этап",
+            "stats_count": "Задач",
+            "stats_max": "Макс.",
+            "stats_stage_dialog": "выбор файла",
+            "stats_stage_queue": "ожидание в очереди",
+            "stats_stage_read": "чтение документа",
+            "stats_stage_analyse": "анализ изображения",
+            "stats_stage_encode": "кодирование",
+            "stats_stage_convert": "конвертация",
+            "stats_stage_decode": "декодирование",
+            "stats_stage_open": "открытие результата",
+            "stats_stage_cleanup": "очистка",
+            "stats_stage_pack": "упаковка атласа",
+            "stats_stage_uv_map": "запись карты UV",
+            "stats_stage_total": "всего",
+            "stats_clear": "Очистить журнал",
+            "stats_close": "Закрыть",
+            "cache_enabled": "Кэшировать результаты конвертации",
+            "cache_size": "Размер кэша",
+            "clear_cache": "Очистить кэш",
+            "cache_cleared": "Кэш конвертаций очищен",
+            "bc7_fast": "Быстро",
+            "bc7_balanced": "Сбалансированно",
+            "bc7_thorough": "Тщательно",
+            "preset": "Пресет (экспорт)",
+            "preset_custom": "Свои настройки",
+            "save_preset": "Сохранить как пресет...",
+            "preset_name": "Имя пресета",
             "saved_seccess_settings": "Настройки успешно сохранены"
         }
 
@@ -141,20 +326,431 @@ class EvrikaSettingsWidget(QWidget):
             "save_settings": "Save settings",
             "temporary_file_settings": "Temporary file settings",
             "custom_export_name": "Custom export file name",
+            "export_backend": "Encoder (export)",
+            "backend_magick": "ImageMagick",
+            "backend_native": "Built-in (NumPy)",
+            "export_bc7_quality": "BC7 quality (built-in)",
+            "batch_export_name": "Name pattern ({name}, {index}, {compression})",
+            "magick_worker": "Keep ImageMagick running between conversions",
+            "export_incremental": "Re-export only changed blocks (built-in)",
+            "export_linear_mips": "Build mipmaps in linear light (built-in)",
+            "export_streaming": "Export very large textures in strips (built-in)",
+            "trace_enabled": "Record import and export stage timings",
+            "statistics": "Statistics...",
+            "stats_recent": "Recent jobs",
+            "stats_stages": "Stage durations",
+            "stats_job": "Job",
+            "stats_state": "State",
+            "stats_total": "Total",
+            "stats_read": "Read",
+            "stats_written": "Written",
+            "stats_peak_memory": "Memory growth",
+            "stats_stage": "Stage",
+            "stats_count": "Jobs",
+            "stats_max": "Max",
+            "stats_stage_dialog": "file dialog",
+            "stats_stage_queue": "waiting in queue",
+            "stats_stage_read": "reading document",
+            "stats_stage_analyse": "analysing image",
+            "stats_stage_encode": "encoding",
+            "stats_stage_convert": "converting",
+            "stats_stage_decode": "decoding",
+            "stats_stage_open": "opening result",
+            "stats_stage_cleanup": "cleanup",
+            "stats_stage_pack": "packing atlas",
+            "stats_stage_uv_map": "writing UV map",
+            "stats_stage_total": "total",
+            "stats_clear": "Clear trace",
+            "stats_close": "Close",
+            "cache_enabled": "Cache conversion results",
+            "cache_size": "Cache size",
+            "clear_cache": "Clear cache",
+            "cache_cleared": "Conversion cache cleared",
+            "bc7_fast": "Fast",
+            "bc7_balanced": "Balanced",
+            "bc7_thorough": "Thorough",
+            "preset": "Preset (export)",
+            "preset_custom": "Custom settings",
+            "save_preset": "Save as preset...",
+            "preset_name": "Preset name",
             "saved_seccess_settings": "Settings saved successfully"
         }
 
+    def current_preset(self):
+        """Параметры экспорта, выбранные в виджете, в виде пресета."""
+        return {
+            "compression": self.export_compression_combo.currentText(),
+            "mipmap": self.export_mipmap_combo.currentText(),
+            "filter": self.export_filter_combo.currentText(),
+            "backend": self.export_backend_combo.currentData(),
+            "bc7_quality": self.export_bc7_quality_combo.currentData(),
+            "linear": self.export_linear_check.isChecked(),
+        }
+
+    def load_preset(self):
+        """Показать в полях экспорта значения выбранного пресета."""
+        name = self.preset_combo.currentData()
+        if not name:
+            return
+        preset = get_preset(self.settings, name)
+        self.export_compression_combo.setCurrentText(preset["compression"])
+        self.export_mipmap_combo.setCurrentText(preset["mipmap"])
+        self.export_filter_combo.setCurrentText(preset["filter"])
+        self.export_backend_combo.setCurrentIndex(max(0, self.export_backend_combo.findData(preset["backend"])))
+        self.export_bc7_quality_combo.setCurrentIndex(max(0, self.export_bc7_quality_combo.findData(preset["bc7_quality"])))
+        self.export_linear_check.setChecked(bool(preset["linear"]))
+
+    def save_as_preset(self):
+        name, ok = QInputDialog.getText(self, self.translations["save_preset"], self.translations["preset_name"])
+        name = name.strip()
+        if not ok or not name:
+            return
+        save_preset(self.settings, name, self.current_preset())
+        if self.preset_combo.findData(name) < 0:
+            self.preset_combo.addItem(name, name)
+        self.preset_combo.setCurrentIndex(self.preset_combo.findData(name))
+
     def save_settings(self):
-        """Save current settings through the SettingsManager."""
-        self.settings.set("use_original_export_name", self.temp_export_check.isChecked())
-        self.settings.set("use_original_import_name", self.temp_import_check.isChecked())
-        self.settings.set("export_custom_name", self.export_name_input.text())
-        self.settings.set("import_format", self.import_format_combo.currentText())
-        self.settings.set("export_compression", self.export_compression_combo.currentText())
-        self.settings.set("export_mipmap", self.export_mipmap_combo.currentText())
-        self.settings.set("export_filter", self.export_filter_combo.currentText())
+        """Save current settings through the SettingsManager (one file write)."""
+        with self.settings.transaction():
+            self.settings.set("use_original_export_name", self.temp_export_check.isChecked())
+            self.settings.set("use_original_import_name", self.temp_import_check.isChecked())
+            self.settings.set("export_custom_name", self.export_name_input.text())
+            self.settings.set("import_format", self.import_format_combo.currentText())
+            preset_name = self.preset_combo.currentData()
+            self.settings.set("active_preset", preset_name)
+            if preset_name:
+                # Правки полей при выбранном пресете сохраняются в сам пресет
+                save_preset(self.settings, preset_name, self.current_preset())
+            else:
+                for key, value in self.current_preset().items():
+                    self.settings.set(SETTINGS_KEYS[key], value)
+            self.settings.set("batch_export_name", self.batch_name_input.text())
+            self.settings.set("magick_worker", self.magick_worker_check.isChecked())
+            self.settings.set("export_incremental", self.incremental_check.isChecked())
+            self.settings.set("export_streaming", self.streaming_check.isChecked())
+            self.settings.set("trace_enabled", self.trace_check.isChecked())
+            self.settings.set("cache_enabled", self.cache_check.isChecked())
+            self.settings.set("cache_size_mb", self.cache_size_spin.value())
         QMessageBox.information(self, "Evrika Settings", self.translations["saved_seccess_settings"])
 
+    def show_statistics(self):
+        StatsPanel(TraceLog(), self.translations).exec_()
+
+    def clear_cache(self):
+        ConversionCache().clear()
+        QMessageBox.information(self, "Evrika Settings", self.translations["cache_cleared"])
+
+
+class StatsPanel(QDialog):
+    """Последние задачи из журнала времени и перцентили длительности этапов."""
+
+    RECENT_JOBS = 50
+
+    def __init__(self, trace, translations):
+        super().__init__()
+        self.trace = trace
+        self.translations = translations
+        self.setWindowTitle(translations["statistics"])
+        self.resize(760, 560)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(translations["stats_recent"]))
+        self.jobs_tree = QTreeWidget()
+        self.jobs_tree.setRootIsDecorated(False)
+        self.jobs_tree.setHeaderLabels([translations["stats_job"], translations["stats_state"], translations["stats_total"],
+                                        translations["stats_read"], translations["stats_written"], translations["stats_peak_memory"]])
+        layout.addWidget(self.jobs_tree, 2)
+
+        layout.addWidget(QLabel(translations["stats_stages"]))
+        self.stages_tree = QTreeWidget()
+        self.stages_tree.setRootIsDecorated(False)
+        self.stages_tree.setHeaderLabels([translations["stats_stage"], translations["stats_count"],
+                                          "p50", "p90", translations["stats_max"]])
+        layout.addWidget(self.stages_tree, 1)
+
+        buttons_layout = QHBoxLayout()
+        clear_button = QPushButton(translations["stats_clear"])
+        clear_button.clicked.connect(self.clear)
+        close_button = QPushButton(translations["stats_close"])
+        close_button.clicked.connect(self.accept)
+        buttons_layout.addWidget(clear_button)
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(close_button)
+        layout.addLayout(buttons_layout)
+        self.refresh()
+
+    def stage_name(self, stage):
+        """Название этапа на языке интерфейса (в журнале этапы хранятся идентификаторами)."""
+        return self.translations.get("stats_stage_" + stage, stage)
+
+    def refresh(self):
+        records = self.trace.records()
+        self.jobs_tree.clear()
+        for record in reversed(records[-self.RECENT_JOBS:]):
+            item = QTreeWidgetItem([record.get("title", ""), record.get("state", ""), _seconds(record.get("total")),
+                                    _megabytes(record.get("bytes_read")), _megabytes(record.get("bytes_written")),
+                                    _megabytes(record.get("peak_memory"))])
+            stages = ", ".join(f"{self.stage_name(stage)}: {_seconds(seconds)}" for stage, seconds in record.get("stages", []))
+            memory = ", ".join(f"{self.stage_name(stage)}: {_megabytes(size)}" for stage, size in record.get("memory", []))
+            item.setToolTip(0, record.get("error") or stages)
+            for column in range(1, 5):
+                item.setToolTip(column, stages)
+            item.setToolTip(5, memory)
+            self.jobs_tree.addTopLevelItem(item)
+
+        self.stages_tree.clear()
+        for (kind, stage), (count, p50, p90, longest) in sorted(stage_statistics(records).items()):
+            name = self.stage_name(stage)
+            item = QTreeWidgetItem([f"{kind}: {name}" if kind else name, str(count),
+                                    _seconds(p50), _seconds(p90), _seconds(longest)])
+            self.stages_tree.addTopLevelItem(item)
+        for tree in (self.jobs_tree, self.stages_tree):
+            tree.resizeColumnToContents(0)
+
+    def clear(self):
+        self.trace.clear()
+        self.refresh()
+
+
+def _seconds(value):
+    return "" if value is None else f"{value:.3f} s"
+
+
+def _megabytes(value):
+    return "" if value is None else f"{value / (1 << 20):.1f} MB"
+
+
+def _save_array(path, image):
+    # np.save с путём дописывает ".npy" к имени - пишем в открытый файл
+    with open(path, "wb") as f:
+        dds_decoder.np.save(f, image)
+
+
+class JobSignals(QObject):
+    """Переносит события JobEngine из рабочих потоков в главный поток Qt."""
+    event = pyqtSignal(str, object)
+
+
+class MainThreadCalls(QObject):
+    """Вызовы API Krita из фоновых задач.
+
+    ``submit`` можно вызывать из любого потока: функция выполняется в главном
+    потоке (через очередь событий Qt), результат возвращается через Future.
+    """
+    requested = pyqtSignal(object)
+
+    def __init__(self):
+        super().__init__()
+        self.requested.connect(self._run)
+
+    def submit(self, func, *args):
+        future = Future()
+        self.requested.emit((future, func, args))
+        return future
+
+    def _run(self, request):
+        future, func, args = request
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+
+
+class JobsPanel(QDialog):
+    """Немодальное окно со списком фоновых задач, их прогрессом и отменой."""
+
+    def __init__(self, engine, translations):
+        super().__init__()
+        self.engine = engine
+        self.translations = translations
+        self._rows = {}
+        self.setModal(False)
+        self.setWindowTitle(translations["jobs"])
+        self.setMinimumWidth(480)
+
+        layout = QVBoxLayout(self)
+        self.rows_layout = QVBoxLayout()
+        layout.addLayout(self.rows_layout)
+        layout.addStretch()
+
+        buttons_layout = QHBoxLayout()
+        clear_button = QPushButton(translations["clear_finished"])
+        clear_button.clicked.connect(self.clear_finished)
+        cancel_all_button = QPushButton(translations["cancel_all"])
+        cancel_all_button.clicked.connect(self.engine.cancel_all)
+        buttons_layout.addWidget(clear_button)
+        buttons_layout.addWidget(cancel_all_button)
+        layout.addLayout(buttons_layout)
+
+        for job in self.engine.jobs():
+            self.update_job(job)
+
+    def update_job(self, job):
+        row = self._rows.get(id(job))
+        if row is None:
+            row = self._add_row(job)
+        label, progress_bar, cancel_button = row[1:]
+        status = self.translations["job_" + job.state]
+        if job.state == Job.RUNNING and job.stage:
+            status = f"{status}: {self.translations.get('stage_' + job.stage, job.stage)}"
+        label.setText(f"{job.title} - {status}")
+        progress_bar.setValue(int(job.progress * 100))
+        cancel_button.setEnabled(not job.finished)
+
+    def clear_finished(self):
+        for key, row in list(self._rows.items()):
+            if row[0].finished:
+                row[4].deleteLater()
+                del self._rows[key]
+        self.engine.forget_finished()
+
+    def _add_row(self, job):
+        row_widget = QWidget()
+        row_layout = QHBoxLayout(row_widget)
+        row_layout.setContentsMargins(0, 0, 0, 0)
+        label = QLabel(job.title)
+        progress_bar = QProgressBar()
+        progress_bar.setRange(0, 100)
+        cancel_button = QPushButton(self.translations["cancel"])
+        cancel_button.clicked.connect(job.cancel)
+        row_layout.addWidget(label, 2)
+        row_layout.addWidget(progress_bar, 1)
+        row_layout.addWidget(cancel_button)
+        self.rows_layout.addWidget(row_widget)
+        row = (job, label, progress_bar, cancel_button, row_widget)
+        self._rows[id(job)] = row
+        return row
+
+
+class TextureBrowser(QDialog):
+    """Выбор DDS из папки со списком размеров, форматов и миниатюрами.
+
+    Метаданные читаются из заголовков сразу, миниатюры декодируются в фоне
+    собственным пулом задач (не попадают в панель задач конвертации).
+    """
+
+    THUMBNAIL_WORKERS = 2
+
+    def __init__(self, translations, folder=""):
+        super().__init__()
+        self.translations = translations
+        self.folder = ""
+        self.cache = thumbnails.thumbnail_cache()
+        self._items = {}
+        self.signals = JobSignals()
+        self.signals.event.connect(self.on_thumbnail_event)
+        self.engine = JobEngine(max_workers=self.THUMBNAIL_WORKERS, listener=self.signals.event.emit)
+        self.setWindowTitle(translations["browse_dds"])
+        self.resize(720, 560)
+
+        layout = QVBoxLayout(self)
+        folder_layout = QHBoxLayout()
+        self.folder_label = QLabel()
+        folder_button = QPushButton(translations["select_folder"])
+        folder_button.clicked.connect(self.choose_folder)
+        folder_layout.addWidget(self.folder_label, 1)
+        folder_layout.addWidget(folder_button)
+        layout.addLayout(folder_layout)
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels([translations["browser_name"], translations["browser_size"],
+                                   translations["browser_format"], translations["browser_mips"]])
+        self.tree.setIconSize(QSize(96, 96))
+        self.tree.setRootIsDecorated(False)
+        self.tree.setSortingEnabled(True)
+        self.tree.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.tree.itemDoubleClicked.connect(self.accept)
+        layout.addWidget(self.tree)
+
+        buttons_layout = QHBoxLayout()
+        import_button = QPushButton(translations["import_dds"])
+        cancel_button = QPushButton(translations["cancel"])
+        import_button.clicked.connect(self.accept)
+        cancel_button.clicked.connect(self.reject)
+        buttons_layout.addWidget(cancel_button)
+        buttons_layout.addWidget(import_button)
+        layout.addLayout(buttons_layout)
+
+        if folder and os.path.isdir(folder):
+            self.show_folder(folder)
+
+    def choose_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, self.translations["browse_dds"], self.folder)
+        if folder:
+            self.show_folder(folder)
+
+    def show_folder(self, folder):
+        self.engine.cancel_all()
+        self.engine.forget_finished()
+        self.tree.clear()
+        self._items = {}
+        self.folder = folder
+        self.folder_label.setText(folder)
+
+        for texture in thumbnails.list_textures(folder):
+            header = texture.header
+            if header is None:
+                columns = [texture.name, "", self.translations["browser_not_dds"], ""]
+            else:
+                columns = [texture.name, f"{header.width}x{header.height}", header.format_name, str(header.mipmap_count)]
+            item = QTreeWidgetItem(columns)
+            item.setData(0, Qt.UserRole, texture.path)
+            self.tree.addTopLevelItem(item)
+
+            job = Job(texture.name)
+            job.add_stage("", lambda job, texture=texture: job.context.update(
+                thumbnail=thumbnails.make_thumbnail(texture, self.cache)))
+            self._items[job] = item
+            self.engine.submit(job)
+        self.tree.resizeColumnToContents(0)
+
+    def on_thumbnail_event(self, event, job):
+        item = self._items.pop(job, None) if event == "finished" else None
+        image = job.context.get("thumbnail")
+        if item is None or job.state != Job.DONE or image is None:
+            return
+        height, width = image.shape[:2]
+        qimage = QImage(image.tobytes(), width, height, width * 4, QImage.Format_RGBA8888).copy()
+        item.setIcon(0, QIcon(QPixmap.fromImage(qimage)))
+
+    def selected_files(self):
+        return [item.data(0, Qt.UserRole) for item in self.tree.selectedItems()]
+
+    def done(self, result):
+        # Закрытие окна прекращает декодирование оставшихся миниатюр; уже
+        # отправленные события больше не находят своих строк
+        self._items = {}
+        self.engine.shutdown()
+        super().done(result)
+
+
+class LayerImportTarget:
+    """Документ, в который пакетный импорт добавляет слои по мере готовности файлов.
+
+    Документ создаётся при первом готовом файле; его пустой начальный слой
+    занимает первое изображение. Все методы вызываются в главном потоке.
+    """
+
+    def __init__(self, name, width, height):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.doc = None
+        self._empty_layer = None
+
+    def add(self, name, bgra, width, height):
+        if self.doc is None:
+            self.doc = Krita.instance().createDocument(max(self.width, width), max(self.height, height),
+                                                       self.name, "RGBA", "U8", "", 72.0)
+            nodes = self.doc.topLevelNodes()
+            self._empty_layer = nodes[0] if nodes else None
+            Krita.instance().activeWindow().addView(self.doc)
+        add_layer(self.doc, name, bgra, width, height, self._empty_layer)
+        self._empty_layer = None
+
 
 class DDSEvrikaPlugin(Extension):
 
@@ -162,10 +758,26 @@ class DDSEvrikaPlugin(Extension):
         super().__init__(parent)
         self.settings = SettingsManager()
         self.init_translations()
-        
+        self.job_signals = JobSignals()
+        self.job_signals.event.connect(self.onJobEvent)
+        self.jobs = JobEngine(listener=self.job_signals.event.emit)
+        self.main_thread = MainThreadCalls()
+        # Журнал времени этапов задач (панель статистики в настройках)
+        self.trace = TraceLog()
+        # Процессы magick запускаются при первой конвертации и остаются в памяти
+        self.magick_workers = MagickWorkerPool()
+        self.workspaces = WorkspacePool()
+        self.jobs_panel = None
+        QApplication.instance().aboutToQuit.connect(self.shutdown)
+
     def setup(self):
         pass
 
+    def shutdown(self):
+        """При выходе из Krita: отменить задачи и остановить процессы magick."""
+        self.jobs.shutdown()
+        self.magick_workers.shutdown()
+
     def init_translations(self):
         locale = QLocale.system()
         lang = locale.name()
@@ -174,12 +786,37 @@ class DDSEvrikaPlugin(Extension):
             self.translations = {
                 "import_dds": "Импортировать DDS",
                 "import_dds_as": "Импортировать DDS как...",
+                "import_dds_batch": "Пакетный импорт DDS",
+                "batch_import_mode": "Открыть файлы",
+                "batch_as_documents": "Отдельными документами",
+                "batch_as_layers": "Слоями одного документа",
+                "select_files": "Выбрать файлы...",
+                "select_folder": "Выбрать папку...",
+                "no_dds_files": "В папке нет файлов DDS.",
+                "browse_dds": "Браузер текстур DDS",
+                "browser_name": "Файл",
+                "browser_size": "Размер",
+                "browser_format": "Формат",
+                "browser_mips": "Уровни mip",
+                "browser_not_dds": "не DDS",
                 "export_dds": "Экспортировать DDS",
                 "export_dds_as": "Экспортировать DDS как...",
+                "export_all_dds": "Экспортировать все открытые документы в DDS",
+                "export_atlas": "Экспортировать атлас DDS...",
+                "atlas_source": "Спрайты атласа",
+                "atlas_from_layers": "Видимые слои активного документа",
+                "atlas_from_documents": "Все открытые документы",
+                "atlas_padding": "Отступ вокруг спрайтов (пиксели)",
+                "atlas_power_of_two": "Размер атласа - степень двойки (нужно для mipmap)",
+                "atlas_no_sprites": "Нет непустых слоёв или документов для атласа.",
+                "atlas_needs_numpy": "Для экспорта атласа нужен NumPy.",
                 "compression_format": "Выберите формат сжатия",
                 "use_saved_settings": "Использовать мои настройки",
                 "overwrite_settings": "Перезаписать текущие настройки",
                 "mipmap_levels": "Уровни Mipmap",
+                "import_mip_level": "Уровень mip (встроенный декодер)",
+                "mip_full_size": "0 (полный размер)",
+                "mip_all_layers": "Все уровни слоями",
                 "export_filter": "Фильтр (экспорт)",
                 "ok": "ОК",
                 "cancel": "Отмена",
@@ -188,18 +825,66 @@ class DDSEvrikaPlugin(Extension):
                 "file_saved": "Файл успешно сохранён в формате DDS: ",
                 "no_document": "Нет активного документа для экспорта.",
                 "settings": "Настройки Evrika",
-                "import_format": "Выберите формат изображения"
+                "import_format": "Выберите формат изображения",
+                "jobs": "Задачи конвертации",
+                "clear_finished": "Убрать завершённые",
+                "cancel_all": "Отменить все",
+                "job_pending": "в очереди",
+                "job_running": "выполняется",
+                "job_done": "готово",
+                "job_failed": "ошибка",
+                "job_cancelled": "отменено",
+                "stage_convert": "конвертация",
+                "stage_decode": "декодирование",
+                "stage_encode": "кодирование",
+                "stage_analyse": "анализ изображения",
+                "stage_read": "чтение документа",
+                "stage_open": "открытие результата",
+                "stage_cleanup": "очистка",
+                "stage_dialog": "выбор файла",
+                "stage_pack": "упаковка атласа",
+                "stage_uv_map": "запись карты UV",
+                "auto_compression": "Автовыбор сжатия",
+                "trait_opaque": "непрозрачное",
+                "trait_binary_alpha": "альфа 1 бит",
+                "trait_smooth_alpha": "плавная альфа",
+                "trait_normal_map": "карта нормалей"
             }
         else:
             self.translations = {
                 "import_dds": "Import DDS",
                 "import_dds_as": "Import DDS as...",
+                "import_dds_batch": "Batch import DDS",
+                "batch_import_mode": "Open files",
+                "batch_as_documents": "As separate documents",
+                "batch_as_layers": "As layers of one document",
+                "select_files": "Select files...",
+                "select_folder": "Select folder...",
+                "no_dds_files": "The folder contains no DDS files.",
+                "browse_dds": "DDS texture browser",
+                "browser_name": "File",
+                "browser_size": "Size",
+                "browser_format": "Format",
+                "browser_mips": "Mip levels",
+                "browser_not_dds": "not DDS",
                 "export_dds": "Export DDS",
                 "export_dds_as": "Export DDS as...",
+                "export_all_dds": "Export all open documents to DDS",
+                "export_atlas": "Export DDS atlas...",
+                "atlas_source": "Atlas sprites",
+                "atlas_from_layers": "Visible layers of the active document",
+                "atlas_from_documents": "All open documents",
+                "atlas_padding": "Padding around sprites (pixels)",
+                "atlas_power_of_two": "Power-of-two atlas size (needed for mipmaps)",
+                "atlas_no_sprites": "There are no non-empty layers or documents for the atlas.",
+                "atlas_needs_numpy": "Exporting an atlas requires NumPy.",
                 "compression_format": "Select compression format",
                 "use_saved_settings": "Use my settings",
                 "overwrite_settings": "Overwrite current settings",
                 "mipmap_levels": "Mipmap levels",
+                "import_mip_level": "Mip level (built-in decoder)",
+                "mip_full_size": "0 (full size)",
+                "mip_all_layers": "All levels as layers",
                 "export_filter": "Filter (export)",
                 "ok": "OK",
                 "cancel": "Cancel",
@@ -208,13 +893,42 @@ class DDSEvrikaPlugin(Extension):
                 "file_saved": "File successfully saved as DDS: ",
                 "no_document": "No active document to export.",
                 "settings": "Evrika Settings",
-                "import_format": "Select image format"
+                "import_format": "Select image format",
+                "jobs": "Conversion jobs",
+                "clear_finished": "Clear finished",
+                "cancel_all": "Cancel all",
+                "job_pending": "queued",
+                "job_running": "running",
+                "job_done": "done",
+                "job_failed": "failed",
+                "job_cancelled": "cancelled",
+                "stage_convert": "converting",
+                "stage_decode": "decoding",
+                "stage_encode": "encoding",
+                "stage_analyse": "analysing image",
+                "stage_read": "reading document",
+                "stage_open": "opening result",
+                "stage_cleanup": "cleanup",
+                "stage_dialog": "file dialog",
+                "stage_pack": "packing atlas",
+                "stage_uv_map": "writing UV map",
+                "auto_compression": "Automatic compression",
+                "trait_opaque": "opaque",
+                "trait_binary_alpha": "1-bit alpha",
+                "trait_smooth_alpha": "smooth alpha",
+                "trait_normal_map": "normal map"
             }
 
     def createActions(self, window):
         action_import = window.createAction("ER_DDS_IMPORTER", self.translations["import_dds"], "tools/scripts")
         action_import.triggered.connect(self.importDDS)
         
+        action_browse = window.createAction("ER_DDS_BROWSER", self.translations["browse_dds"], "tools/scripts")
+        action_browse.triggered.connect(self.browseDDS)
+
+        action_import_batch = window.createAction("ER_DDS_IMPORTER_BATCH", self.translations["import_dds_batch"], "tools/scripts")
+        action_import_batch.triggered.connect(self.importDDSBatch)
+
         action_export = window.createAction("ER_DDS_EXPORTER", self.translations["export_dds"], "tools/scripts")
         action_export.triggered.connect(self.exportDDS)
 
@@ -224,9 +938,18 @@ class DDSEvrikaPlugin(Extension):
         action_export_as = window.createAction("ER_DDS_EXPORTER_AS", self.translations["export_dds_as"], "tools/scripts")
         action_export_as.triggered.connect(self.exportDDSAs)
 
+        action_export_all = window.createAction("ER_DDS_EXPORTER_ALL", self.translations["export_all_dds"], "tools/scripts")
+        action_export_all.triggered.connect(self.exportAllDDS)
+
+        action_export_atlas = window.createAction("ER_DDS_EXPORTER_ATLAS", self.translations["export_atlas"], "tools/scripts")
+        action_export_atlas.triggered.connect(self.exportAtlasDDS)
+
         action_settings = window.createAction("EVRIKA_SETTINGS", self.translations["settings"], "tools/scripts")
         action_settings.triggered.connect(self.showSettingsDialog)
 
+        action_jobs = window.createAction("EVRIKA_JOBS", self.translations["jobs"], "tools/scripts")
+        action_jobs.triggered.connect(self.showJobsPanel)
+
     def showSettingsDialog(self):
         dialog = QDialog()
         layout = QVBoxLayout(dialog)
@@ -235,6 +958,40 @@ class DDSEvrikaPlugin(Extension):
         dialog.setWindowTitle(self.translations["settings"])
         dialog.exec_()
 
+    def showJobsPanel(self):
+        if self.jobs_panel is None:
+            self.jobs_panel = JobsPanel(self.jobs, self.translations)
+        self.jobs_panel.show()
+        self.jobs_panel.raise_()
+        return self.jobs_panel
+
+    def submitJob(self, job):
+        """Поставить задачу в очередь фоновой конвертации и показать панель задач."""
+        self.showJobsPanel()
+        return self.jobs.submit(job)
+
+    def onJobEvent(self, event, job):
+        """Обработка событий задач в главном потоке (можно обращаться к API Krita)."""
+        if self.jobs_panel is not None:
+            self.jobs_panel.update_job(job)
+        if event != "finished":
+            return
+        try:
+            if job.state == Job.DONE and job.on_success is not None:
+                job.on_success(job)
+            elif job.state == Job.FAILED and job.batch is None:
+                self.showError(self.translations["error_processing"] + str(job.error))
+        except Exception as e:
+            self.showError(self.translations["error_processing"] + str(e))
+        finally:
+            if job.on_cleanup is not None:
+                with job.timed("cleanup"):
+                    job.on_cleanup(job)
+            if self.settings.get("trace_enabled", True):
+                self.trace.append(job_record(job, job.context.get("kind", "")))
+            if job.batch is not None and job.batch.job_finished(job):
+                self.showBatchSummary(job.batch)
+
     def generate_temp_filename(self, original_file_path, new_extension=".png", for_export=False):
         use_original_name = self.settings.get("use_original_export_name", False) if for_export else \
                             self.settings.get("use_original_import_name", False)
@@ -252,29 +1009,17 @@ class DDSEvrikaPlugin(Extension):
             return f"temp_{original_name}_{sha256_hash[:8]}{new_extension}"
 
     def importDDS(self):
+        dialog_start = time.perf_counter()
         input_file = QFileDialog().getOpenFileName(caption=self.translations["import_dds"], filter="DDS files (*.dds)")[0]
         if not input_file:
             return
+        dialog_seconds = time.perf_counter() - dialog_start
 
-        # Используем self.settings.get(), а не self.settings.get()
-        temp_filename = self.generate_temp_filename(input_file, f".{self.settings.get('import_format', 'png')}")
-        temp_directory_location = os.path.join(os.path.dirname(__file__), 'temp_dds_import')
-        if not os.path.isdir(temp_directory_location):
-            os.makedirs(temp_directory_location)
-
-        output_file = os.path.join(temp_directory_location, temp_filename)
-        imagick_path = os.path.join(os.path.dirname(__file__), 'resources', 'magick.exe') if platform == "win32" else 'magick'
-        args = [imagick_path, input_file, output_file]
-
-        try:
-            subprocess.run(args, check=True)
-            new_document = Krita.instance().openDocument(output_file)
-            Krita.instance().activeWindow().addView(new_document)
-            shutil.rmtree(temp_directory_location)
-        except subprocess.CalledProcessError as e:
-            self.showError(self.translations["error_processing"] + str(e))
+        job = self.start_import(input_file, self.settings.get('import_format', 'png'))
+        job.record("dialog", dialog_seconds)
 
     def importDDSAs(self):
+        dialog_start = time.perf_counter()
         dialog = QDialog()
         layout = QVBoxLayout(dialog)
 
@@ -285,6 +1030,14 @@ class DDSEvrikaPlugin(Extension):
         format_combo.addItems(["png", "tiff", "bmp", "jpeg", "tga"])
         layout.addWidget(format_combo)
 
+        layout.addWidget(QLabel(self.translations["import_mip_level"]))
+        mip_combo = QComboBox()
+        mip_combo.addItem(self.translations["mip_full_size"], 0)
+        for level in range(1, 8):
+            mip_combo.addItem(f"{level} (1/{1 << level})", level)
+        mip_combo.addItem(self.translations["mip_all_layers"], "all")
+        layout.addWidget(mip_combo)
+
         buttons_layout = QHBoxLayout()
         confirm_button = QPushButton(self.translations["ok"])
         cancel_button = QPushButton(self.translations["cancel"])
@@ -296,81 +1049,258 @@ class DDSEvrikaPlugin(Extension):
             input_file = QFileDialog().getOpenFileName(caption=self.translations["import_dds"], filter="DDS files (*.dds)")[0]
             if not input_file:
                 return
+            dialog_seconds = time.perf_counter() - dialog_start
 
-            temp_filename = self.generate_temp_filename(input_file, f".{format_combo.currentText()}")
-            temp_directory_location = os.path.join(os.path.dirname(__file__), 'temp_dds_import')
-            if not os.path.isdir(temp_directory_location):
-                os.makedirs(temp_directory_location)
-
-            output_file = os.path.join(temp_directory_location, temp_filename)
-            imagick_path = os.path.join(os.path.dirname(__file__), 'resources', 'magick.exe') if platform == "win32" else 'magick'
-            args = [imagick_path, input_file, output_file]
-
-            try:
-                subprocess.run(args, check=True)
-                new_document = Krita.instance().openDocument(output_file)
-                Krita.instance().activeWindow().addView(new_document)
-                shutil.rmtree(temp_directory_location)
-                dialog.accept()  # Закрываем диалог при успешной обработке
-            except subprocess.CalledProcessError as e:
-                self.showError(self.translations["error_processing"] + str(e))
-                dialog.reject()  # Закрываем диалог, если произошла ошибка
+            job = self.start_import(input_file, format_combo.currentText(), mip_level=mip_combo.currentData())
+            job.record("dialog", dialog_seconds)
+            dialog.accept()  # Закрываем диалог, конвертация продолжается в фоне
 
         confirm_button.clicked.connect(process_import_as)
         cancel_button.clicked.connect(dialog.reject)
         dialog.exec_()
 
-    def exportDDS(self):
-        """Обычный экспорт DDS с использованием сохранённых настроек."""
-        self.process_export(is_export_as=False)
+    def start_import(self, input_file, image_format, target=None, batch=None, mip_level=0):
+        """Импорт DDS в фоне: встроенным декодером, а для неподдерживаемых форматов - через magick.
+
+        ``target`` - ``LayerImportTarget`` для импорта слоем, иначе открывается новый документ.
+        ``mip_level`` - номер уровня mip или "all" (все уровни слоями); magick
+        читает только верхний уровень.
+        """
+        if self.can_decode_natively(input_file):
+            if mip_level == "all":
+                job = self.build_mip_layers_import_job(input_file)
+            else:
+                job = self.build_native_import_job(input_file, target, mip_level)
+        else:
+            job = self.build_magick_import_job(input_file, image_format, target)
+        if batch is not None:
+            batch.add(job)
+        return self.submitJob(job)
 
-    def exportDDSAs(self):
-        self.showImportExportDialog(is_import=False)
+    def can_decode_natively(self, input_file):
+        try:
+            return dds_decoder.is_supported(read_header(input_file))
+        except (OSError, DDSFormatError):
+            return False
+
+    def build_native_import_job(self, input_file, target=None, level=0):
+        """Декодировать DDS в памяти и создать документ напрямую, без magick и временных файлов.
+
+        Файл отображается в память, и декодируется только уровень mip ``level``
+        (если его нет - самый маленький из имеющихся).
+        """
+        name = os.path.basename(input_file)
+        cache = self.conversion_cache()
+
+        def decode(job):
+            with dds_decoder.MappedDDS(input_file) as dds:
+                selected = min(level, dds.level_count - 1)
+                job.context["level"] = selected
+                job.context["bytes_read"] = dds.header.data_offset + dds.header.level_bytes(selected)
+                job.context["image"] = self.decode_level_cached(cache, dds, selected, job.step)
+
+        def open_result(job):
+            image = job.context.pop("image")
+            title = name
+            if job.context["level"]:
+                title = f"{name} (mip {job.context['level']})"
+            if target is not None:
+                target.add(title, rgba_to_bgra(image), image.shape[1], image.shape[0])
+                return
+            new_document = create_document(Krita.instance(), image, title)
+            Krita.instance().activeWindow().addView(new_document)
 
-    def process_export(self, is_export_as):
-        doc = Krita.instance().activeDocument()
-        if not doc:
-            self.showError(self.translations["no_document"])
-            return
+        job = self.new_import_job(name, open_result)
+        job.add_stage("decode", decode)
+        return job
+
+    def build_mip_layers_import_job(self, input_file):
+        """Импорт всех уровней mip слоями одного документа размером с верхний уровень."""
+        name = os.path.basename(input_file)
+        cache = self.conversion_cache()
+
+        def decode(job):
+            images = []
+            with dds_decoder.MappedDDS(input_file) as dds:
+                count = dds.level_count
+                job.context["bytes_read"] = dds.header.level_offset(count)
+                for level in range(count):
+                    progress = lambda fraction, level=level: job.step((level + fraction) / count)
+                    images.append(self.decode_level_cached(cache, dds, level, progress))
+            job.context["images"] = images
+
+        def open_result(job):
+            images = job.context.pop("images")
+            target = LayerImportTarget(name, images[0].shape[1], images[0].shape[0])
+            for level, image in enumerate(images):
+                height, width = image.shape[:2]
+                target.add(f"mip {level} ({width}x{height})", rgba_to_bgra(image), width, height)
+
+        job = self.new_import_job(name, open_result)
+        job.add_stage("decode", decode)
+        return job
+
+    def new_import_job(self, name, open_result, on_cleanup=None):
+        """Задача импорта; открытие результата в главном потоке записывается отдельным этапом."""
+        def on_success(job):
+            with job.timed("open"):
+                open_result(job)
+
+        job = Job(f"{self.translations['import_dds']}: {name}", on_success=on_success, on_cleanup=on_cleanup)
+        job.context["kind"] = "import"
+        return job
+
+    def decode_level_cached(self, cache, dds, level, progress=None):
+        """Декодировать уровень ``dds`` (``MappedDDS``) с кэшем результатов по байтам уровня."""
+        if cache is None:
+            return dds.decode(level, progress)
+        key = cache_key(dds.level_bytes(level), "decode", dds_decoder.DECODER_VERSION, dds.header_bytes(), level)
+        cached = cache.get(key, ".npy")
+        if cached is not None:
+            try:
+                return dds_decoder.np.load(cached)
+            except (OSError, ValueError):
+                pass
+        image = dds.decode(level, progress)
+        cache.put_with(key, ".npy", lambda path: _save_array(path, image))
+        return image
+
+    def build_magick_import_job(self, input_file, image_format, target=None):
+        """Конвертировать DDS во временное изображение в фоне и открыть его по готовности."""
+        name = os.path.basename(input_file)
+        temp_filename = self.generate_temp_filename(input_file, f".{image_format}")
+        cache = self.conversion_cache()
+        magick_workers = self.magick_pool()
+
+        def convert(job):
+            # Своя рабочая папка задачи (в памяти, если изображение там поместится)
+            try:
+                header = read_header(input_file)
+                size_hint = header.width * header.height * 4
+            except (OSError, DDSFormatError):
+                size_hint = os.path.getsize(input_file) * 4
+            workspace = job.context["workspace"] = self.workspaces.acquire(size_hint)
+            output_file = job.context["output_file"] = workspace.file(temp_filename)
+            args = build_import_args(input_file, output_file)
+
+            def file_key():
+                with open(input_file, "rb") as f:
+                    return cache_key(f.read(), "import", image_format, magick_version())
+
+            run_cached(cache, file_key, f".{image_format}", output_file,
+                       lambda: run_magick(job, args, input_file, output_file, magick_workers))
+            job.context["bytes_read"] = os.path.getsize(input_file)
+            job.context["bytes_written"] = os.path.getsize(output_file)
+
+        def open_result(job):
+            new_document = Krita.instance().openDocument(job.context["output_file"])
+            if target is not None:
+                # Временный документ нужен только как источник пикселей слоя
+                width, height, pixels = read_document_bgra(new_document)
+                new_document.close()
+                target.add(name, pixels, width, height)
+                return
+            Krita.instance().activeWindow().addView(new_document)
 
-        save_file, _ = QFileDialog.getSaveFileName(caption=self.translations["export_dds"], filter="DDS files (*.dds)")
-        if not save_file:
+        job = self.new_import_job(name, open_result,
+                                  on_cleanup=lambda job: self.workspaces.release(job.context.get("workspace")))
+        job.add_stage("convert", convert)
+        return job
+
+    def browseDDS(self):
+        """Браузер текстур: выбранные файлы импортируются как обычно (несколько - пакетом)."""
+        browser = TextureBrowser(self.translations, self.settings.get("browser_folder", ""))
+        if not browser.exec_():
             return
-        if not save_file.lower().endswith(".dds"):
-            save_file += ".dds"
+        if browser.folder:
+            self.settings.set("browser_folder", browser.folder)
+        input_files = browser.selected_files()
+        if len(input_files) == 1:
+            self.start_import(input_files[0], self.settings.get("import_format", "png"))
+        elif input_files:
+            self.start_batch_import(input_files, as_layers=False)
+
+    def importDDSBatch(self):
+        """Импорт набора DDS (выбранные файлы или вся папка) документами или слоями одного документа."""
+        dialog_start = time.perf_counter()
+        dialog = QDialog()
+        dialog.setWindowTitle(self.translations["import_dds_batch"])
+        layout = QVBoxLayout(dialog)
 
-        temp_filename = self.generate_temp_filename(doc.fileName(), ".png", for_export=True)
-        temp_directory_location = os.path.join(os.path.dirname(__file__), "temp_dds_export")
-        if not os.path.isdir(temp_directory_location):
-            os.makedirs(temp_directory_location)
+        layout.addWidget(QLabel(self.translations["batch_import_mode"]))
+        mode_combo = QComboBox()
+        mode_combo.addItem(self.translations["batch_as_documents"], "documents")
+        mode_combo.addItem(self.translations["batch_as_layers"], "layers")
+        layout.addWidget(mode_combo)
 
-        temp_png_file = os.path.join(temp_directory_location, temp_filename)
-        doc.saveAs(temp_png_file)
+        buttons_layout = QHBoxLayout()
+        files_button = QPushButton(self.translations["select_files"])
+        folder_button = QPushButton(self.translations["select_folder"])
+        cancel_button = QPushButton(self.translations["cancel"])
+        buttons_layout.addWidget(cancel_button)
+        buttons_layout.addWidget(files_button)
+        buttons_layout.addWidget(folder_button)
+        layout.addLayout(buttons_layout)
 
-        imagick_path = os.path.join(os.path.dirname(__file__), "resources", "magick.exe") if platform == "win32" else "magick"
-        args = [imagick_path, temp_png_file]
+        def select_files():
+            input_files = QFileDialog.getOpenFileNames(caption=self.translations["import_dds_batch"], filter="DDS files (*.dds)")[0]
+            if input_files:
+                dialog_seconds = time.perf_counter() - dialog_start
+                dialog.accept()
+                self.start_batch_import(input_files, mode_combo.currentData() == "layers", dialog_seconds)
 
-        compression_format = self.settings.get("export_compression", "dxt1")
-        mipmap_levels = self.settings.get("export_mipmap", "Auto")
-        export_filter = self.settings.get("export_filter", "Lanczos")  # Get the export filter setting
+        def select_folder():
+            folder = QFileDialog.getExistingDirectory(caption=self.translations["import_dds_batch"])
+            if not folder:
+                return
+            input_files = [os.path.join(folder, entry) for entry in sorted(os.listdir(folder))
+                           if entry.lower().endswith(".dds") and os.path.isfile(os.path.join(folder, entry))]
+            if not input_files:
+                self.showError(self.translations["no_dds_files"])
+                return
+            dialog_seconds = time.perf_counter() - dialog_start
+            dialog.accept()
+            self.start_batch_import(input_files, mode_combo.currentData() == "layers", dialog_seconds)
 
-        args.extend(["-define", f"dds:compression={compression_format.lower()}"])
+        files_button.clicked.connect(select_files)
+        folder_button.clicked.connect(select_folder)
+        cancel_button.clicked.connect(dialog.reject)
+        dialog.exec_()
 
-        if mipmap_levels != "Auto":
-            args.extend(["-define", f"dds:mipmaps={mipmap_levels}"])
-        
-        # Add the filter option to the ImageMagick command
-        args.extend(["-filter", export_filter.lower()])
+    def start_batch_import(self, input_files, as_layers, dialog_seconds=None):
+        """Декодирование всех файлов параллельно в пуле задач; результаты открываются по мере готовности.
+
+        Время диалога (``dialog_seconds``) записывается в первую задачу: диалог у пакета один.
+        """
+        target = None
+        if as_layers:
+            width = height = 1
+            for input_file in input_files:
+                try:
+                    header = read_header(input_file)
+                except (OSError, DDSFormatError):
+                    continue
+                width, height = max(width, header.width), max(height, header.height)
+            name = os.path.basename(os.path.dirname(input_files[0])) or self.translations["import_dds_batch"]
+            target = LayerImportTarget(name, width, height)
+
+        batch = JobBatch(self.translations["import_dds_batch"])
+        image_format = self.settings.get("import_format", "png")
+        for input_file in input_files:
+            self.start_import(input_file, image_format, target, batch)
+        if dialog_seconds is not None and batch.jobs:
+            batch.jobs[0].record("dialog", dialog_seconds)
 
-        args.append(save_file)
+    def exportDDS(self):
+        """Обычный экспорт DDS с использованием сохранённых настроек."""
+        self.process_export(is_export_as=False)
 
-        try:
-            subprocess.run(args, check=True)
-            self.showMessage(self.translations["file_saved"] + save_file)
-        except subprocess.CalledProcessError as e:
-            self.showError(self.translations["error_processing"] + str(e))
-        finally:
-            shutil.rmtree(temp_directory_location)
+    def exportDDSAs(self):
+        self.showImportExportDialog(is_import=False)
+
+    def process_export(self, is_export_as):
+        # Выбранный пресет (или собственные настройки экспорта) разрешается один раз на экспорт
+        self.process_export_dialog(active_preset(self.settings))
 
     def showImportExportDialog(self, is_import=True):
         dialog = QDialog()
@@ -380,13 +1310,13 @@ class DDSEvrikaPlugin(Extension):
         layout.addWidget(compression_label)
 
         compression_format = QComboBox()
-        compression_format.addItems(["dxt1", "dxt3", "dxt5", "bc7", "none"])
+        compression_format.addItems(["dxt1", "dxt3", "dxt5", "bc7", "none", "auto"])
         layout.addWidget(compression_format)
 
         mipmaps_label = QLabel(self.translations["mipmap_levels"])
         layout.addWidget(mipmaps_label)
         mipmaps_combo = QComboBox()
-        mipmaps_combo.addItems(["Auto", "1", "2", "3", "4", "5"])
+        mipmaps_combo.addItems(["Auto", "0", "1", "2", "3", "4", "5"])
         layout.addWidget(mipmaps_combo)
 
         # Добавляем Label и ComboBox для выбора фильтра
@@ -413,13 +1343,14 @@ class DDSEvrikaPlugin(Extension):
             filter_option = filter_combo.currentText()  # Получаем значение фильтра
             overwrite = overwrite_checkbox.isChecked()
 
+            preset = dict(active_preset(self.settings), compression=compression, mipmap=mipmaps, filter=filter_option)
             if overwrite:
-                self.save_user_preferences(compression, mipmaps, filter_option)
+                self.save_user_preferences(preset)
 
             if is_import:  # Для импорта
                 self.process_import_dialog(compression, mipmaps)
             else:  # Для экспорта
-                self.process_export_dialog(compression, mipmaps, filter_option)
+                self.process_export_dialog(preset)
                 
             dialog.accept()
 
@@ -428,34 +1359,16 @@ class DDSEvrikaPlugin(Extension):
         dialog.exec_()
 
     def process_import_dialog(self, compression_format, mipmap_levels):
+        dialog_start = time.perf_counter()
         input_file = QFileDialog().getOpenFileName(caption=self.translations["import_dds"], filter="DDS files (*.dds)")[0]
         if not input_file:
             return
+        dialog_seconds = time.perf_counter() - dialog_start
 
-        temp_filename = self.generate_temp_filename(input_file, ".png")
-        temp_directory_location = os.path.join(os.path.dirname(__file__), 'temp_dds_import')
-        if not os.path.isdir(temp_directory_location):
-            os.makedirs(temp_directory_location)
-
-        output_file = os.path.join(temp_directory_location, temp_filename)
-        imagick_path = os.path.join(os.path.dirname(__file__), 'resources', 'magick.exe') if platform == "win32" else 'magick'
-        args = [imagick_path, input_file, output_file]
-
-        #if compression_format != "none":
-        #    args.extend(['-define', f'dds:compression={compression_format.lower()}'])
-        #if mipmap_levels != "Auto":
-        #    args.extend(['-define', f'dds:mipmaps={mipmap_levels}'])
+        job = self.start_import(input_file, "png")
+        job.record("dialog", dialog_seconds)
 
-        try:
-            subprocess.run(args, check=True)
-            new_document = Krita.instance().openDocument(output_file)
-            Krita.instance().activeWindow().addView(new_document)
-        except subprocess.CalledProcessError as e:
-            self.showError(self.translations["error_processing"] + str(e))
-        finally:
-            shutil.rmtree(temp_directory_location)
-
-    def process_export_dialog(self, compression_format, mipmap_levels, filter_option):
+    def process_export_dialog(self, preset):
         """Процесс экспорта с исправлением для обработки компрессии 'none'"""
         doc = Krita.instance().activeDocument()
         
@@ -464,58 +1377,247 @@ class DDSEvrikaPlugin(Extension):
             return
 
         # Сохранение файла DDS
+        dialog_start = time.perf_counter()
         save_file, _ = QFileDialog.getSaveFileName(caption=self.translations["export_dds"], filter="DDS files (*.dds)")
         if not save_file:
             return
+        dialog_seconds = time.perf_counter() - dialog_start
         if not save_file.lower().endswith(".dds"):
             save_file += ".dds"
 
-        # Генерация временного файла PNG
-        temp_filename = self.generate_temp_filename(doc.fileName(), ".png", for_export=True)
-        temp_directory_location = os.path.join(os.path.dirname(__file__), "temp_dds_export")
-        if not os.path.isdir(temp_directory_location):
-            os.makedirs(temp_directory_location)
+        job = self.build_export_job(doc, save_file, preset)
+        job.record("dialog", dialog_seconds)
+        self.submitJob(job)
+
+    def build_export_job(self, doc, save_file, preset, threads=None):
+        """Подготовить задачу экспорта документа в ``save_file`` с параметрами пресета.
+
+        Пиксели читаются сразу в главном потоке (API Krita), кодирование идёт в фоне.
+        ``threads`` ограничивает потоки встроенного кодировщика. Для сжатия "auto"
+        формат выбирается первым этапом задачи по анализу пикселей.
+        """
+        job = self.new_export_job(save_file, preset)
+        return export_jobs.prepare_export_job(job, doc, save_file, preset, self.export_settings(), threads)
+
+    def export_settings(self):
+        """Настройки для этапов экспорта; читаются здесь, в главном потоке, а не в фоновой задаче."""
+        return export_jobs.ExportSettings(
+            cache=self.conversion_cache(),
+            incremental=self.settings.get("export_incremental", False),
+            magick_workers=self.magick_pool(),
+            streaming_min_pixels=streaming.MIN_PIXELS if self.settings.get("export_streaming", True) else None,
+            main_thread=self.main_thread)
+
+    def magick_pool(self):
+        """Пул постоянных процессов magick или None, если они выключены в настройках."""
+        return self.magick_workers if self.settings.get("magick_worker", True) else None
+
+    def new_export_job(self, save_file, preset):
+        """Задача экспорта; формат сжатия задачи лежит в ``job.context["compression"]``."""
+        job = Job(f"{self.translations['export_dds']}: {os.path.basename(save_file)}",
+                  on_success=self.report_export)
+        job.context["kind"] = "export"
+        job.context["save_file"] = save_file
+        return export_jobs.init_compression(job, preset)
+
+    def describe_compression_choice(self, choice):
+        """Строка для отчёта: выбранный формат, признаки изображения и PSNR пробного сжатия."""
+        details = [self.translations["trait_" + trait] for trait in choice.traits]
+        if choice.psnr is not None and choice.psnr != float("inf"):
+            details.append(f"{choice.trial_format} PSNR {choice.psnr:.1f} dB")
+        return f"{self.translations['auto_compression']}: {choice.format} ({', '.join(details)})"
+
+    def report_export(self, job):
+        """После одиночного экспорта сообщить о сохранении и формате, выбранном для "auto".
+
+        Задачи пакета сообщаются в итоговом отчёте пакета.
+        """
+        if job.batch is not None:
+            return
+        message = self.translations["file_saved"] + job.context["save_file"]
+        choice = job.context.get("compression_choice")
+        if choice is not None:
+            message += "\n" + self.describe_compression_choice(choice)
+        self.showMessage(message)
+
+    def conversion_cache(self):
+        """Кэш конвертаций с текущими настройками или None, если он выключен."""
+        if not self.settings.get("cache_enabled", True):
+            return None
+        return ConversionCache(max_bytes=int(self.settings.get("cache_size_mb", DEFAULT_MAX_MB)) << 20)
+
+    def exportAllDDS(self):
+        """Экспорт всех открытых документов в выбранную папку с именами по шаблону."""
+        documents = Krita.instance().documents()
+        if not documents:
+            self.showError(self.translations["no_document"])
+            return
 
-        temp_png_file = os.path.join(temp_directory_location, temp_filename)
-        doc.saveAs(temp_png_file)
+        output_dir = QFileDialog.getExistingDirectory(caption=self.translations["export_all_dds"])
+        if not output_dir:
+            return
 
-        # Путь для работы с ImageMagick
-        imagick_path = os.path.join(os.path.dirname(__file__), "resources", "magick.exe") if platform == "win32" else "magick"
+        preset = active_preset(self.settings)
+        pattern = self.settings.get("batch_export_name", "{name}") or "{name}"
 
-        # Создаем список аргументов для команды
-        args = [imagick_path, temp_png_file]
+        batch = JobBatch(self.translations["export_all_dds"])
+        used_paths = set()
+        for index, doc in enumerate(documents, 1):
+            save_file = self.batch_export_path(output_dir, pattern, doc, index, preset["compression"], used_paths)
+            # Параллельность даёт пул задач (по числу ядер), поэтому каждая задача кодирует в один поток
+            batch.add(self.build_export_job(doc, save_file, preset, threads=1))
 
-        # Добавляем фильтр
-        if filter_option:
-            args.extend(["-filter", filter_option])
+        for job in batch.jobs:
+            self.submitJob(job)
 
-        # Указываем формат компрессии, включая "none"
-        args.extend(["-define", f"dds:compression={compression_format.lower()}"])
+    def exportAtlasDDS(self):
+        """Экспорт атласа: слои активного документа или все открытые документы в одном DDS и JSON с UV."""
+        if atlas.np is None:
+            self.showError(self.translations["atlas_needs_numpy"])
+            return
+        dialog = QDialog()
+        dialog.setWindowTitle(self.translations["export_atlas"])
+        layout = QVBoxLayout(dialog)
 
-        # Добавляем количество уровней Mipmap, если оно не "Auto"
-        if mipmap_levels != "Auto":
-            args.extend(["-define", f"dds:mipmaps={mipmap_levels}"])
+        layout.addWidget(QLabel(self.translations["atlas_source"]))
+        source_combo = QComboBox()
+        source_combo.addItem(self.translations["atlas_from_layers"], "layers")
+        source_combo.addItem(self.translations["atlas_from_documents"], "documents")
+        source_combo.setCurrentIndex(max(0, source_combo.findData(self.settings.get("atlas_source", "layers"))))
+        layout.addWidget(source_combo)
 
-        # Даем команду сохранить файл в формате DDS
-        args.append(save_file)
+        layout.addWidget(QLabel(self.translations["atlas_padding"]))
+        padding_spin = QSpinBox()
+        padding_spin.setRange(0, 64)
+        padding_spin.setValue(self.settings.get("atlas_padding", atlas.DEFAULT_PADDING))
+        layout.addWidget(padding_spin)
 
-        # Показываем финальную версию аргументов команды для ImageMagick
-        #QMessageBox.information(None, "Отладка", f"Сформированная команда для ImageMagick:\n{' '.join(args)}")
+        power_of_two_check = QCheckBox(self.translations["atlas_power_of_two"])
+        power_of_two_check.setChecked(self.settings.get("atlas_power_of_two", True))
+        layout.addWidget(power_of_two_check)
+
+        buttons_layout = QHBoxLayout()
+        confirm_button = QPushButton(self.translations["ok"])
+        cancel_button = QPushButton(self.translations["cancel"])
+        buttons_layout.addWidget(cancel_button)
+        buttons_layout.addWidget(confirm_button)
+        layout.addLayout(buttons_layout)
+        confirm_button.clicked.connect(dialog.accept)
+        cancel_button.clicked.connect(dialog.reject)
+        if not dialog.exec_():
+            return
+
+        source = source_combo.currentData()
+        padding = padding_spin.value()
+        power_of_two = power_of_two_check.isChecked()
+        with self.settings.transaction():
+            self.settings.set("atlas_source", source)
+            self.settings.set("atlas_padding", padding)
+            self.settings.set("atlas_power_of_two", power_of_two)
 
         try:
-            # Запускаем команду через subprocess
-            subprocess.run(args, check=True)
-            self.showMessage(self.translations["file_saved"] + save_file)  # Сообщаем об успешном сохранении
-        except subprocess.CalledProcessError as e:
-            self.showError(self.translations["error_processing"] + str(e))
-        finally:
-            shutil.rmtree(temp_directory_location)  # Удаляем временные файлы
+            sprites = self.read_atlas_sprites(source)
+        except ValueError as e:
+            self.showError(f"{self.translations['error_processing']}{e}")
+            return
+        if not sprites:
+            self.showError(self.translations["atlas_no_sprites"])
+            return
+
+        save_file, _ = QFileDialog.getSaveFileName(caption=self.translations["export_atlas"], filter="DDS files (*.dds)")
+        if not save_file:
+            return
+        if not save_file.lower().endswith(".dds"):
+            save_file += ".dds"
+        self.submitJob(self.build_atlas_job(sprites, save_file, active_preset(self.settings), padding, power_of_two))
+
+    def read_atlas_sprites(self, source):
+        """Спрайты атласа [(имя, (width, height, pixel_format, data))] в главном потоке."""
+        sprites = []
+        if source == "documents":
+            for doc in Krita.instance().documents():
+                name = os.path.splitext(os.path.basename(doc.fileName()))[0] or doc.name()
+                sprites.append((name, read_document_pixels(doc)))
+            return sprites
+
+        doc = Krita.instance().activeDocument()
+        if doc is None:
+            return sprites
+        for node in doc.topLevelNodes():
+            if not node.visible():
+                continue
+            pixels = read_layer_pixels(doc, node)
+            if pixels is not None:
+                sprites.append((node.name(), pixels))
+        return sprites
+
+    def build_atlas_job(self, sprites, save_file, preset, padding, power_of_two):
+        """Задача экспорта атласа: упаковка в фоне, затем обычные этапы экспорта и запись JSON с UV."""
+        job = self.new_export_job(save_file, preset)
+        job.context["bytes_read"] = sum(len(pixels[3]) for _, pixels in sprites)
+
+        def pack(job):
+            images = [dds_encoder.pixels_to_rgba(*pixels) for _, pixels in sprites]
+            layout = atlas.pack([(image.shape[1], image.shape[0]) for image in images], padding, power_of_two)
+            image = atlas.compose(images, layout)
+            job.context["pixels"] = (layout.width, layout.height, "RGBA", image.tobytes())
+            job.context["uv_map"] = atlas.uv_map(os.path.basename(save_file), layout, [name for name, _ in sprites])
+
+        def write_uv_map(job):
+            atlas.write_uv_map(atlas.uv_map_path(save_file), job.context.pop("uv_map"))
+
+        job.add_stage("pack", pack, weight=0.1)
+        export_jobs.add_export_stages(job, save_file, preset, self.export_settings())
+        job.add_stage("uv_map", write_uv_map, weight=0.01)
+        return job
+
+    def batch_export_path(self, output_dir, pattern, doc, index, compression_format, used_paths):
+        """Путь файла по шаблону имени: {name} - имя документа, {index} - номер, {compression} - формат."""
+        source = doc.fileName() or doc.name() or "untitled"
+        name = os.path.splitext(os.path.basename(source))[0]
+        try:
+            file_name = pattern.format(name=name, index=index, compression=compression_format)
+        except (KeyError, IndexError, ValueError):
+            file_name = name
+        if not file_name.lower().endswith(".dds"):
+            file_name += ".dds"
+
+        path = os.path.join(output_dir, file_name)
+        # Одинаковые имена документов не должны перезаписывать друг друга
+        if os.path.normcase(path) in used_paths:
+            root, extension = os.path.splitext(path)
+            path = f"{root}_{index}{extension}"
+        used_paths.add(os.path.normcase(path))
+        return path
+
+    def showBatchSummary(self, batch):
+        """Одно итоговое сообщение по всем задачам пакета."""
+        done = batch.jobs_in_state(Job.DONE)
+        failed = batch.jobs_in_state(Job.FAILED)
+        cancelled = batch.jobs_in_state(Job.CANCELLED)
+        lines = [
+            f"{self.translations['job_done']}: {len(done)}",
+            f"{self.translations['job_failed']}: {len(failed)}",
+            f"{self.translations['job_cancelled']}: {len(cancelled)}",
+        ]
+        lines += [f"{job.title}: {job.error}" for job in failed]
+        lines += [f"{job.title}: {self.describe_compression_choice(job.context['compression_choice'])}"
+                  for job in done if "compression_choice" in job.context]
+
+        messageBox = QMessageBox()
+        messageBox.setWindowTitle(batch.title)
+        messageBox.setIcon(QMessageBox.Warning if failed else QMessageBox.Information)
+        messageBox.setText("\n".join(lines))
+        messageBox.setStandardButtons(QMessageBox.Close)
+        messageBox.exec()
 
-    def save_user_preferences(self, compression, mipmaps, filter_option):
-        """Сохраняем пользовательские параметры экспорта, включая фильтр"""
-        self.settings.set("saved_compression", compression)
-        self.settings.set("saved_mipmap", mipmaps)
-        self.settings.set("saved_filter", filter_option)
+    def save_user_preferences(self, preset):
+        """Сохраняем параметры экспорта в те ключи, которые читает экспорт (одной записью файла)."""
+        with self.settings.transaction():
+            for key in PRESET_KEYS:
+                self.settings.set(SETTINGS_KEYS[key], preset[key])
+            # Явно заданные параметры важнее выбранного пресета
+            self.settings.set("active_preset", "")
 
     def showError(self, message):
         messageBox = QMessageBox()
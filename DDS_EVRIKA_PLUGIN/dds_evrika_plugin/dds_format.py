@@ -0,0 +1,249 @@
+import struct
+
+# Разбор заголовков DDS (DDS_HEADER + DDS_HEADER_DXT10) без сторонних зависимостей
+
+DDS_MAGIC = b"DDS "
+HEADER_SIZE = 124
+DX10_HEADER_SIZE = 20
+
+# DDS_HEADER.dwFlags
+DDSD_CAPS = 0x1
+DDSD_HEIGHT = 0x2
+DDSD_WIDTH = 0x4
+DDSD_PITCH = 0x8
+DDSD_PIXELFORMAT = 0x1000
+DDSD_MIPMAPCOUNT = 0x20000
+DDSD_LINEARSIZE = 0x80000
+DDSD_DEPTH = 0x800000
+
+# DDS_PIXELFORMAT.dwFlags
+DDPF_ALPHAPIXELS = 0x1
+DDPF_ALPHA = 0x2
+DDPF_FOURCC = 0x4
+DDPF_RGB = 0x40
+DDPF_LUMINANCE = 0x20000
+
+# DDS_HEADER.dwCaps / dwCaps2
+DDSCAPS_COMPLEX = 0x8
+DDSCAPS_TEXTURE = 0x1000
+DDSCAPS_MIPMAP = 0x400000
+DDSCAPS2_CUBEMAP = 0x200
+DDSCAPS2_VOLUME = 0x200000
+
+# Форматы, которые понимает встроенный декодер. Для BCn - размер блока 4x4 в байтах,
+# для несжатых - байт на пиксель.
+BLOCK_FORMATS = {"BC1": 8, "BC2": 16, "BC3": 16, "BC4": 8, "BC5": 16, "BC6H": 16, "BC7": 16}
+PIXEL_FORMATS = {"RGBA8": 4, "BGRA8": 4, "BGRX8": 4, "RG8": 2, "R8": 1, "A8": 1}
+
+FOURCC_FORMATS = {
+    b"DXT1": "BC1",
+    b"DXT2": "BC2",
+    b"DXT3": "BC2",
+    b"DXT4": "BC3",
+    b"DXT5": "BC3",
+    b"ATI1": "BC4",
+    b"BC4U": "BC4",
+    b"ATI2": "BC5",
+    b"BC5U": "BC5",
+}
+
+DXGI_FORMATS = {
+    28: "RGBA8",   # R8G8B8A8_UNORM
+    29: "RGBA8",   # R8G8B8A8_UNORM_SRGB
+    49: "RG8",     # R8G8_UNORM
+    61: "R8",      # R8_UNORM
+    65: "A8",      # A8_UNORM
+    71: "BC1",     # BC1_UNORM
+    72: "BC1",     # BC1_UNORM_SRGB
+    74: "BC2",     # BC2_UNORM
+    75: "BC2",     # BC2_UNORM_SRGB
+    77: "BC3",     # BC3_UNORM
+    78: "BC3",     # BC3_UNORM_SRGB
+    80: "BC4",     # BC4_UNORM
+    83: "BC5",     # BC5_UNORM
+    87: "BGRA8",   # B8G8R8A8_UNORM
+    88: "BGRX8",   # B8G8R8X8_UNORM
+    91: "BGRA8",   # B8G8R8A8_UNORM_SRGB
+    93: "BGRX8",   # B8G8R8X8_UNORM_SRGB
+    95: "BC6H",    # BC6H_UF16
+    96: "BC6H",    # BC6H_SF16
+    98: "BC7",     # BC7_UNORM
+    99: "BC7",     # BC7_UNORM_SRGB
+}
+
+
+class DDSFormatError(ValueError):
+    """Файл не является корректным DDS."""
+
+
+class DDSHeader:
+    """Parsed DDS header plus the layout of the top-level mip chain."""
+
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+        self.depth = 1
+        self.mipmap_count = 1
+        self.flags = 0
+        self.pf_flags = 0
+        self.fourcc = b""
+        self.rgb_bit_count = 0
+        self.masks = (0, 0, 0, 0)
+        self.caps = 0
+        self.caps2 = 0
+        self.dxgi_format = None
+        self.array_size = 1
+        self.data_offset = 4 + HEADER_SIZE
+        # Имя формата (см. BLOCK_FORMATS/PIXEL_FORMATS), "MASKED" для несжатых
+        # форматов с битовыми масками или None для неизвестных
+        self.format = None
+
+    @property
+    def compressed(self):
+        return self.format in BLOCK_FORMATS
+
+    @property
+    def is_cubemap(self):
+        return bool(self.caps2 & DDSCAPS2_CUBEMAP)
+
+    @property
+    def is_volume(self):
+        return bool(self.caps2 & DDSCAPS2_VOLUME) and self.depth > 1
+
+    @property
+    def bytes_per_pixel(self):
+        if self.format == "MASKED":
+            return self.rgb_bit_count // 8
+        return PIXEL_FORMATS.get(self.format, 0)
+
+    @property
+    def format_name(self):
+        """Человекочитаемое имя формата для сообщений и списков."""
+        if self.format == "MASKED":
+            return f"{self.rgb_bit_count}-bit uncompressed"
+        if self.format is not None:
+            return self.format
+        if self.dxgi_format is not None:
+            return f"DXGI {self.dxgi_format}"
+        return self.fourcc.decode("ascii", "replace") or "unknown"
+
+    def level_size(self, level):
+        return max(1, self.width >> level), max(1, self.height >> level)
+
+    def level_bytes(self, level):
+        width, height = self.level_size(level)
+        if self.compressed:
+            return ((width + 3) // 4) * ((height + 3) // 4) * BLOCK_FORMATS[self.format]
+        return width * height * self.bytes_per_pixel
+
+    def level_offset(self, level):
+        """Смещение уровня mip первой поверхности (грань куба/элемент массива 0) от начала файла."""
+        return self.data_offset + sum(self.level_bytes(i) for i in range(level))
+
+
+def parse_header(data):
+    """Разобрать первые байты файла (минимум 128, с DX10 - 148)."""
+    if len(data) < 4 + HEADER_SIZE or data[:4] != DDS_MAGIC:
+        raise DDSFormatError("Not a DDS file")
+
+    (size, flags, height, width, _pitch, depth, mipmap_count) = struct.unpack_from("<7I", data, 4)
+    if size != HEADER_SIZE:
+        raise DDSFormatError(f"Invalid DDS header size: {size}")
+
+    pf_flags, fourcc, rgb_bit_count, r_mask, g_mask, b_mask, a_mask = struct.unpack_from("<I4s5I", data, 80)
+    caps, caps2 = struct.unpack_from("<2I", data, 108)
+
+    header = DDSHeader()
+    header.width = width
+    header.height = height
+    header.depth = depth if flags & DDSD_DEPTH and depth else 1
+    header.mipmap_count = mipmap_count if flags & DDSD_MIPMAPCOUNT and mipmap_count else 1
+    header.flags = flags
+    header.pf_flags = pf_flags
+    header.fourcc = fourcc if pf_flags & DDPF_FOURCC else b""
+    header.rgb_bit_count = rgb_bit_count
+    header.masks = (r_mask, g_mask, b_mask, a_mask)
+    header.caps = caps
+    header.caps2 = caps2
+
+    if width == 0 or height == 0:
+        raise DDSFormatError("DDS file has zero size")
+
+    if header.fourcc == b"DX10":
+        if len(data) < 4 + HEADER_SIZE + DX10_HEADER_SIZE:
+            raise DDSFormatError("Truncated DX10 header")
+        dxgi_format, _dimension, _misc_flag, array_size = struct.unpack_from("<4I", data, 4 + HEADER_SIZE)
+        header.dxgi_format = dxgi_format
+        header.array_size = max(1, array_size)
+        header.data_offset += DX10_HEADER_SIZE
+        header.format = DXGI_FORMATS.get(dxgi_format)
+    elif header.fourcc:
+        header.format = FOURCC_FORMATS.get(header.fourcc)
+    elif pf_flags & (DDPF_RGB | DDPF_LUMINANCE | DDPF_ALPHA) and rgb_bit_count in (8, 16, 24, 32):
+        header.format = "MASKED"
+
+    return header
+
+
+def read_header(path):
+    """Прочитать только заголовок DDS-файла (не более 148 байт)."""
+    with open(path, "rb") as f:
+        return parse_header(f.read(4 + HEADER_SIZE + DX10_HEADER_SIZE))
+
+
+# Форматы, которые встроенный кодировщик записывает в DDS: FourCC для DX9-совместимых,
+# DXGI-код (через заголовок DX10) для остальных
+WRITE_FOURCC = {"BC1": b"DXT1", "BC2": b"DXT3", "BC3": b"DXT5", "BC4": b"ATI1", "BC5": b"ATI2"}
+WRITE_DXGI = {"BC7": 98}
+
+
+def build_header(width, height, fmt, mipmap_count=1):
+    """Build the magic, DDS_HEADER and (for BC7) DDS_HEADER_DXT10 for a 2D texture.
+
+    ``fmt`` is a key of ``BLOCK_FORMATS`` or "BGRA8", which is written as the
+    classic A8R8G8B8 masked format understood by every DDS reader.
+    """
+    flags = DDSD_CAPS | DDSD_HEIGHT | DDSD_WIDTH | DDSD_PIXELFORMAT
+    caps = DDSCAPS_TEXTURE
+    if mipmap_count > 1:
+        flags |= DDSD_MIPMAPCOUNT
+        caps |= DDSCAPS_COMPLEX | DDSCAPS_MIPMAP
+
+    if fmt in BLOCK_FORMATS:
+        flags |= DDSD_LINEARSIZE
+        pitch = ((width + 3) // 4) * ((height + 3) // 4) * BLOCK_FORMATS[fmt]
+        fourcc = WRITE_FOURCC.get(fmt, b"DX10")
+        pixel_format = struct.pack("<II4s5I", 32, DDPF_FOURCC, fourcc, 0, 0, 0, 0, 0)
+    elif fmt == "BGRA8":
+        flags |= DDSD_PITCH
+        pitch = width * 4
+        fourcc = b""
+        pixel_format = struct.pack("<II4s5I", 32, DDPF_RGB | DDPF_ALPHAPIXELS, b"\0\0\0\0", 32,
+                                   0x00FF0000, 0x0000FF00, 0x000000FF, 0xFF000000)
+    else:
+        raise DDSFormatError(f"Cannot write DDS format {fmt}")
+
+    header = struct.pack("<7I", HEADER_SIZE, flags, height, width, pitch, 0, mipmap_count)
+    header += b"\0" * 44 + pixel_format + struct.pack("<5I", caps, 0, 0, 0, 0)
+    data = DDS_MAGIC + header
+    if fourcc == b"DX10":
+        # resourceDimension = 3 (TEXTURE2D), arraySize = 1
+        data += struct.pack("<5I", WRITE_DXGI[fmt], 3, 0, 1, 0)
+    return data
+
+
+def mipmap_count(width, height, mipmap_levels):
+    """Number of surfaces in the mip chain, matching ImageMagick's ``dds:mipmaps``.
+
+    "Auto" builds the full chain down to 1x1; a number limits the extra levels.
+    Like ImageMagick, mipmaps are only generated for power-of-two sizes.
+    """
+    if width & (width - 1) or height & (height - 1):
+        return 1
+    limit = None if mipmap_levels in (None, "Auto") else int(mipmap_levels)
+    count = 1
+    while (width > 1 or height > 1) and (limit is None or count - 1 < limit):
+        width = max(1, width // 2)
+        height = max(1, height // 2)
+        count += 1
+    return count
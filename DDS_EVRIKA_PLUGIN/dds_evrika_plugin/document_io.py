@@ -0,0 +1,92 @@
+try:
+    from PyQt5.QtGui import QImage
+except ImportError:
+    # Вне Krita (бенчмарк) читаются только 8-битные RGBA документы, QImage для них не нужен
+    QImage = None
+
+# Чтение пикселей документа Krita и создание документов без промежуточных файлов.
+# Все функции вызываются только из главного потока (API Krita не потокобезопасен).
+
+
+def read_document_pixels(doc, y=0, rows=None):
+    """Return ``(width, height, pixel_format, data)`` for rows of the document projection.
+
+    ``pixel_format`` is the ImageMagick raw format name of ``data`` ("BGRA" or
+    "RGBA", 8 bits per channel). 8-bit RGBA documents are read directly with
+    ``pixelData``; other colour models and depths go through ``projection``.
+    """
+    doc.waitForDone()
+    width = doc.width()
+    height = doc.height() - y if rows is None else min(rows, doc.height() - y)
+
+    if doc.colorModel() == "RGBA" and doc.colorDepth() == "U8":
+        # Krita хранит 8-битный RGBA в порядке байт BGRA
+        return width, height, "BGRA", doc.pixelData(0, y, width, height).data()
+
+    image = doc.projection(0, y, width, height).convertToFormat(QImage.Format_RGBA8888)
+    return width, height, "RGBA", image.constBits().asstring(image.sizeInBytes())
+
+
+def read_layer_pixels(doc, node):
+    """Return ``(width, height, "BGRA", data)`` of the node's own content, or None if it is empty.
+
+    Only 8-bit RGBA documents are supported: node pixels come in the
+    document's colour space and have no ``projection`` conversion.
+    """
+    if doc.colorModel() != "RGBA" or doc.colorDepth() != "U8":
+        raise ValueError("Layers can only be read from 8-bit RGBA documents")
+    bounds = node.bounds()
+    if bounds.isEmpty():
+        return None
+    width, height = bounds.width(), bounds.height()
+    return width, height, "BGRA", node.projectionPixelData(bounds.x(), bounds.y(), width, height).data()
+
+
+def create_document(krita, rgba, name):
+    """Создать 8-битный RGBA документ Krita из массива (h, w, 4) uint8."""
+    height, width = rgba.shape[:2]
+    doc = krita.createDocument(width, height, name, "RGBA", "U8", "", 72.0)
+    nodes = doc.topLevelNodes()
+    if nodes:
+        layer = nodes[0]
+    else:
+        layer = doc.createNode(name, "paintlayer")
+        doc.rootNode().addChildNode(layer, None)
+
+    layer.setPixelData(rgba_to_bgra(rgba), 0, 0, width, height)
+    doc.refreshProjection()
+    return doc
+
+
+def rgba_to_bgra(rgba):
+    """Массив (h, w, 4) RGBA -> байты в порядке BGRA, который ожидает Krita."""
+    return rgba[:, :, [2, 1, 0, 3]].tobytes()
+
+
+def read_document_bgra(doc):
+    """Return ``(width, height, data)`` of the document projection as 8-bit BGRA.
+
+    ``QImage.Format_ARGB32`` is stored as B, G, R, A bytes on little-endian
+    machines, which is exactly the layout ``setPixelData`` expects for RGBA/U8.
+    """
+    doc.waitForDone()
+    width, height = doc.width(), doc.height()
+    image = doc.projection(0, 0, width, height).convertToFormat(QImage.Format_ARGB32)
+    return width, height, image.constBits().asstring(image.sizeInBytes())
+
+
+def add_layer(doc, name, bgra, width, height, layer=None):
+    """Положить BGRA-пиксели в новый слой документа (или в переданный пустой слой).
+
+    Холст документа увеличивается, если изображение в него не помещается.
+    """
+    if width > doc.width() or height > doc.height():
+        doc.resizeImage(0, 0, max(width, doc.width()), max(height, doc.height()))
+    if layer is None:
+        layer = doc.createNode(name, "paintlayer")
+        doc.rootNode().addChildNode(layer, None)
+    else:
+        layer.setName(name)
+    layer.setPixelData(bgra, 0, 0, width, height)
+    doc.refreshProjection()
+    return layer
@@ -0,0 +1,45 @@
+# Общая математика подбора конечных точек для кодировщиков BCn
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def principal_endpoints(colors, weights):
+    """Конечные точки вдоль главной оси распределения цветов блока (взвешенный PCA, любое число каналов)."""
+    weight_sum = np.maximum(weights.sum(axis=1), 1e-6)
+    mean = (colors * weights[..., None]).sum(axis=1) / weight_sum[:, None]
+    centered = colors - mean[:, None, :]
+    covariance = np.einsum("npi,npj->nij", centered * weights[..., None], centered)
+
+    axis = np.ones(colors.shape[::2], dtype=np.float32)
+    for _ in range(6):
+        axis = np.einsum("nij,nj->ni", covariance, axis)
+        norm = np.linalg.norm(axis, axis=1, keepdims=True)
+        axis = np.where(norm > 1e-6, axis / np.maximum(norm, 1e-6), 1 / np.sqrt(axis.shape[1]))
+
+    projection = np.einsum("npi,ni->np", centered, axis)
+    valid = weights > 0
+    low = np.where(valid, projection, np.inf).min(axis=1)
+    high = np.where(valid, projection, -np.inf).max(axis=1)
+    low = np.where(np.isfinite(low), low, 0.0)
+    high = np.where(np.isfinite(high), high, 0.0)
+    start = mean + axis * high[:, None]
+    end = mean + axis * low[:, None]
+    return np.clip(start, 0, 255), np.clip(end, 0, 255)
+
+
+def least_squares_endpoints(colors, weights, fractions, e0, e1):
+    """Лучшие конечные точки для заданных долей интерполяции пикселей."""
+    s = 1.0 - fractions
+    a = (weights * s * s).sum(axis=1)
+    b = (weights * s * fractions).sum(axis=1)
+    c = (weights * fractions * fractions).sum(axis=1)
+    rhs0 = ((weights * s)[..., None] * colors).sum(axis=1)
+    rhs1 = ((weights * fractions)[..., None] * colors).sum(axis=1)
+    determinant = a * c - b * b
+    solvable = (np.abs(determinant) > 1e-6)[:, None]
+    safe = np.where(solvable[:, 0], determinant, 1.0)[:, None]
+    new0 = (c[:, None] * rhs0 - b[:, None] * rhs1) / safe
+    new1 = (a[:, None] * rhs1 - b[:, None] * rhs0) / safe
+    return np.where(solvable, np.clip(new0, 0, 255), e0), np.where(solvable, np.clip(new1, 0, 255), e1)
@@ -0,0 +1,193 @@
+import os
+from concurrent.futures import Future
+
+from .cache import cache_key, run_cached
+from .document_io import read_document_pixels
+from .magick import build_export_args, export_options, magick_version
+from .magick_worker import run_magick
+from . import analysis
+from . import dds_encoder
+from . import incremental
+from . import streaming
+
+# Этапы задачи экспорта документа в DDS без зависимости от Krita и Qt: их собирают
+# и плагин, и бенчмарк. От документа нужен только тот API, которым пользуется
+# document_io. Настройки плагина читаются заранее, в главном потоке (ExportSettings),
+# а этапы выполняются в фоне и к настройкам не обращаются.
+
+
+class ImmediateCalls:
+    """``submit`` без главного потока: функция выполняется сразу в вызывающем потоке."""
+
+    def submit(self, func, *args):
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+
+class ExportSettings:
+    """Настройки экспорта, прочитанные при создании задачи.
+
+    ``cache`` - ConversionCache или None; ``magick_workers`` - пул постоянных
+    процессов magick или None (отдельный процесс на каждую конвертацию);
+    ``streaming_min_pixels`` - с какого числа пикселей документ кодируется полосами
+    (None - никогда); ``main_thread`` - объект с ``submit(func, *args) -> Future``,
+    через который фоновая задача читает полосы документа.
+    """
+
+    def __init__(self, cache=None, incremental=False, magick_workers=None, streaming_min_pixels=None,
+                 main_thread=None):
+        self.cache = cache
+        self.incremental = incremental
+        self.magick_workers = magick_workers
+        self.streaming_min_pixels = streaming_min_pixels
+        self.main_thread = main_thread or ImmediateCalls()
+
+
+def init_compression(job, preset):
+    """Записать в ``job.context["compression"]`` формат, если он известен до анализа пикселей."""
+    compression = analysis.known_compression(preset["compression"])
+    if compression is not None:
+        job.context["compression"] = compression
+    return job
+
+
+def set_compression_choice(job, choice):
+    job.context["compression"] = choice.format
+    job.context["compression_choice"] = choice
+
+
+def use_streaming(doc, preset, settings):
+    """Кодировать ли документ полосами: только встроенным кодировщиком и с какого-то размера."""
+    compression = preset["compression"]
+    supported = analysis.available() if compression == analysis.AUTO_COMPRESSION else streaming.supports(compression)
+    return (settings.streaming_min_pixels is not None
+            and preset["backend"] == "native"
+            and supported
+            and doc.width() * doc.height() >= settings.streaming_min_pixels)
+
+
+def prepare_export_job(job, doc, save_file, preset, settings, threads=None):
+    """Добавить в ``job`` этапы экспорта ``doc`` в ``save_file`` с параметрами пресета.
+
+    Вызывается там, где можно читать документ (в плагине - в главном потоке):
+    пиксели читаются сразу, кодирование идёт этапами задачи. Очень большие
+    документы не читаются целиком - задача запрашивает их полосами.
+    ``threads`` ограничивает потоки встроенного кодировщика.
+    """
+    if use_streaming(doc, preset, settings):
+        return add_streaming_stages(job, doc, save_file, preset, settings, threads)
+    with job.timed("read"):
+        job.context["pixels"] = read_document_pixels(doc)
+    job.context["bytes_read"] = len(job.context["pixels"][3])
+    return add_export_stages(job, save_file, preset, settings, threads)
+
+
+def add_export_stages(job, save_file, preset, settings, threads=None):
+    """Этапы анализа (для "auto") и кодирования пикселей из ``job.context["pixels"]``.
+
+    ``job.context["pixels"]`` - ``(width, height, pixel_format, data)``; его может
+    заполнить и более ранний этап задачи. После кодирования пиксели освобождаются.
+    """
+    mipmap_levels = preset["mipmap"]
+    filter_option = preset["filter"]
+    cache = settings.cache
+
+    if "compression" not in job.context:
+        def analyse(job):
+            rgba = dds_encoder.pixels_to_rgba(*job.context["pixels"])
+            set_compression_choice(job, analysis.choose_compression(rgba))
+
+        job.add_stage("analyse", analyse, weight=0.1)
+
+    def export(job):
+        width, height, pixel_format, pixels = job.context.pop("pixels")
+        compression_format = job.context["compression"]
+        settings_key = ("export", width, height, pixel_format, compression_format, mipmap_levels, filter_option)
+
+        if preset["backend"] == "native" and dds_encoder.supports(compression_format):
+            quality = preset["bc7_quality"]
+            linear = bool(preset["linear"])
+            writer = dds_encoder.write_dds
+            export_cache = cache
+            if settings.incremental and incremental.supports(compression_format):
+                # Индекс блоков сам служит кэшем для этого файла; копия из общего кэша сбила бы его
+                writer = incremental.write_dds
+                export_cache = None
+
+            def convert():
+                rgba = dds_encoder.pixels_to_rgba(width, height, pixel_format, pixels)
+                writer(save_file, rgba, compression_format, mipmap_levels,
+                       progress=job.step, quality=quality, threads=threads,
+                       mip_filter=filter_option, linear=linear)
+
+            def backend_key():
+                return "native", dds_encoder.ENCODER_VERSION, quality, linear
+        else:
+            args = build_export_args(width, height, pixel_format, save_file, compression_format, mipmap_levels, filter_option)
+
+            read_options = ["-size", f"{width}x{height}", "-depth", "8"]
+            write_options = export_options(compression_format, mipmap_levels, filter_option)
+            export_cache = cache
+
+            def convert():
+                run_magick(job, args, pixel_format, save_file, settings.magick_workers, read_options, write_options,
+                           input_data=pixels)
+
+            def backend_key():
+                # Версия magick определяется (один раз) только при включённом кэше
+                return "magick", magick_version()
+
+        # Хэш пикселей считается в фоне, а не в главном потоке
+        run_cached(export_cache, lambda: cache_key(pixels, *settings_key, *backend_key()), ".dds", save_file, convert)
+        job.context["bytes_written"] = os.path.getsize(save_file)
+
+    compression = job.context.get("compression")
+    native = preset["backend"] == "native" and (dds_encoder.available() if compression is None
+                                                else dds_encoder.supports(compression))
+    job.add_stage("encode" if native else "convert", export)
+    return job
+
+
+def add_streaming_stages(job, doc, save_file, preset, settings, threads=None):
+    """Экспорт полосами: задача сама запрашивает строки документа через ``settings.main_thread``.
+
+    Полное изображение не читается ни разу, поэтому кэш конвертаций и
+    инкрементальный индекс (им нужны все пиксели сразу) здесь не используются.
+    Для "auto" документ читается дважды: сначала для анализа, затем для кодирования.
+    """
+    width, height = doc.width(), doc.height()
+    rows = streaming.strip_rows(width)
+    main_thread = settings.main_thread
+
+    def strips(job):
+        # Следующая полоса читается в главном потоке, пока текущая кодируется
+        pending = main_thread.submit(read_document_pixels, doc, 0, rows)
+        for y in range(0, height, rows):
+            strip_width, strip_height, pixel_format, pixels = job.wait_for(pending)
+            job.context["bytes_read"] = job.context.get("bytes_read", 0) + len(pixels)
+            if y + rows < height:
+                pending = main_thread.submit(read_document_pixels, doc, y + rows, rows)
+            yield dds_encoder.pixels_to_rgba(strip_width, strip_height, pixel_format, pixels)
+
+    if "compression" not in job.context:
+        def analyse(job):
+            scan = analysis.CompressionAnalysis(width, height)
+            for index, strip in enumerate(strips(job)):
+                scan.add(strip)
+                job.step(min(1.0, (index + 1) * rows / height))
+            set_compression_choice(job, scan.choose())
+
+        job.add_stage("analyse", analyse, weight=0.1)
+
+    def export(job):
+        streaming.write_dds(save_file, width, height, strips(job), job.context["compression"], preset["mipmap"],
+                            progress=job.step, quality=preset["bc7_quality"], threads=threads,
+                            mip_filter=preset["filter"], linear=bool(preset["linear"]))
+        job.context["bytes_written"] = os.path.getsize(save_file)
+
+    job.add_stage("encode", export)
+    return job
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+
+from .cache import default_cache_dir
+from .dds_format import BLOCK_FORMATS, DDSFormatError, read_header, mipmap_count
+from .endpoints import np
+from . import dds_encoder
+
+# Инкрементальный повторный экспорт: для каждого целевого файла хранится индекс
+# хэшей блоков 4x4 всех уровней mip последнего экспорта. При повторном экспорте
+# перекодируются только изменившиеся блоки, и они записываются прямо в
+# существующий DDS. Уровни mip пересчитываются целиком (это дёшево), а кодируются
+# только блоки, чьё содержимое поменялось.
+
+INDEX_VERSION = 1
+
+# Множители для смешивания восьми 64-битных слов блока (16 пикселей RGBA)
+_MIX = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93,
+        0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53, 0x94D049BB133111EB, 0xBF58476D1CE4E5B9)
+
+
+def index_dir():
+    return default_cache_dir("incremental")
+
+
+def index_path(target):
+    name = hashlib.sha256(os.path.normcase(os.path.abspath(target)).encode("utf-8")).hexdigest()
+    return os.path.join(index_dir(), name + ".npz")
+
+
+def block_hashes(blocks):
+    """(N, 16, 4) uint8 -> (N,) uint64 хэши содержимого блоков."""
+    words = np.ascontiguousarray(blocks).reshape(blocks.shape[0], 64).view(np.uint64)
+    hashes = np.zeros(blocks.shape[0], dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for column, factor in enumerate(_MIX):
+            hashes ^= words[:, column] * np.uint64(factor)
+            hashes = (hashes << np.uint64(27)) | (hashes >> np.uint64(37))
+        hashes ^= hashes >> np.uint64(33)
+        hashes *= np.uint64(_MIX[4])
+        hashes ^= hashes >> np.uint64(33)
+    return hashes
+
+
+def supports(compression_format):
+    fmt = dds_encoder.COMPRESSION_FORMATS.get(compression_format.lower())
+    return dds_encoder.supports(compression_format) and fmt in BLOCK_FORMATS
+
+
+def write_dds(path, rgba, compression_format, mipmap_levels, progress=None, quality="balanced", threads=None,
+              mip_filter="Box", linear=False):
+    """Export like ``dds_encoder.write_dds``, re-encoding only blocks changed since the last export.
+
+    Falls back to a full export (and builds a fresh index) when there is no
+    index for ``path``, the settings differ or the file was changed by someone
+    else. Returns the number of re-encoded blocks.
+    """
+    fmt = dds_encoder.COMPRESSION_FORMATS[compression_format.lower()]
+    height, width = rgba.shape[:2]
+    count = mipmap_count(width, height, mipmap_levels)
+    settings = {"version": INDEX_VERSION, "encoder": dds_encoder.ENCODER_VERSION, "format": fmt,
+                "width": width, "height": height, "mipmaps": count, "quality": quality,
+                "filter": mip_filter.lower(), "linear": bool(linear)}
+
+    levels = [dds_encoder.image_to_blocks(level) for level in dds_encoder.mip_chain(rgba, count, mip_filter, linear)]
+    hashes = [block_hashes(blocks) for blocks in levels]
+
+    previous = _load_index(path, settings)
+    # Пока файл меняется, индекс недействителен: прерванный экспорт не должен оставить ложный индекс
+    _remove_index(path)
+    if previous is None:
+        dds_encoder.write_dds(path, rgba, compression_format, mipmap_levels, progress, quality, threads, mip_filter, linear)
+        _save_index(path, settings, hashes)
+        return sum(blocks.shape[0] for blocks in levels)
+
+    changed = [np.nonzero(new != old)[0] for new, old in zip(hashes, previous)]
+    total = sum(indices.size for indices in changed)
+    encoded = []
+    done = 0
+    for blocks, indices in zip(levels, changed):
+        share = indices.size / total if total else 0.0
+        level_progress = None
+        if progress is not None:
+            level_progress = lambda fraction, done=done, share=share: progress(done + share * fraction)
+        encoded.append(dds_encoder.encode_blocks(blocks[indices], fmt, level_progress, quality, threads)
+                       if indices.size else None)
+        done += share
+
+    if total:
+        _patch(path, fmt, changed, encoded)
+    _save_index(path, settings, hashes)
+    return total
+
+
+def _patch(path, fmt, changed, encoded):
+    """Записать перекодированные блоки в существующий файл через отображение в память."""
+    header = read_header(path)
+    block_size = BLOCK_FORMATS[fmt]
+    data = np.memmap(path, dtype=np.uint8, mode="r+")
+    try:
+        for level, (indices, blocks) in enumerate(zip(changed, encoded)):
+            if blocks is None:
+                continue
+            offset = header.level_offset(level)
+            surface = data[offset:offset + header.level_bytes(level)].reshape(-1, block_size)
+            surface[indices] = blocks
+        data.flush()
+    finally:
+        del data
+
+
+def _load_index(path, settings):
+    try:
+        stat = os.stat(path)
+        with np.load(index_path(path)) as index:
+            meta = json.loads(str(index["meta"]))
+            hashes = [index[f"level{level}"] for level in range(settings["mipmaps"])]
+        header = read_header(path)
+    except (OSError, KeyError, ValueError, DDSFormatError):
+        return None
+    if meta.get("settings") != settings or meta.get("size") != stat.st_size or meta.get("mtime") != stat.st_mtime_ns:
+        return None
+    if header.format != settings["format"] or (header.width, header.height) != (settings["width"], settings["height"]):
+        return None
+    return hashes
+
+
+def _save_index(path, settings, hashes):
+    stat = os.stat(path)
+    meta = {"settings": settings, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+    arrays = {f"level{level}": level_hashes for level, level_hashes in enumerate(hashes)}
+    target = index_path(path)
+    try:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target + ".tmp", "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(target + ".tmp", target)
+    except OSError:
+        # Без индекса следующий экспорт просто будет полным
+        _remove_index(path)
+
+
+def _remove_index(path):
+    try:
+        os.remove(index_path(path))
+    except OSError:
+        pass
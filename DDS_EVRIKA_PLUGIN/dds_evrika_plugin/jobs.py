@@ -0,0 +1,320 @@
+import os
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+
+from .timing import current_rss
+
+# Фоновое выполнение конвертаций, чтобы не блокировать UI-поток Krita.
+# Модуль не зависит от Krita/Qt: события доставляются через listener,
+# а плагин сам переносит их в главный поток через сигнал Qt.
+
+# ImageMagick с флагом -monitor пишет в stderr строки вида "...: 10 of 100, 10% complete"
+PROGRESS_PATTERN = re.compile(rb"(\d+)% complete")
+STDERR_TAIL = 4096
+# Не чаще, чем раз в столько секунд, прогресс этапа замеряет память процесса
+MEMORY_SAMPLE_INTERVAL = 0.05
+
+
+def default_worker_count():
+    """Количество воркеров по умолчанию: по числу ядер, но не меньше одного."""
+    return max(1, os.cpu_count() or 1)
+
+
+class JobCancelled(Exception):
+    """Задача была отменена пользователем."""
+
+
+class Job:
+    """A conversion job made of weighted stages that run on a worker thread.
+
+    Stage callables receive the job and may share data through ``job.context``.
+    ``on_success`` and ``on_cleanup`` are invoked by the plugin on the UI thread.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, title, on_success=None, on_cleanup=None):
+        self.title = title
+        self.on_success = on_success
+        self.on_cleanup = on_cleanup
+        self.context = {}
+        self.state = Job.PENDING
+        self.stage = ""
+        self.progress = 0.0
+        self.error = None
+        self.batch = None
+        # (этап, секунды): этапы в фоне, а также записанные плагином части в главном потоке
+        self.timings = []
+        # (этап, байты): наибольший прирост памяти процесса за время этапа
+        self.memory = []
+        self._queued_at = None
+        self._stages = []
+        self._stage_start = 0.0
+        self._stage_span = 0.0
+        self._cancel_event = threading.Event()
+        self._process = None
+        self._lock = threading.Lock()
+        self._listener = None
+        self._rss_start = None
+        self._rss_peak = None
+        self._rss_sampled_at = 0.0
+
+    def add_stage(self, name, func, weight=1.0):
+        self._stages.append((name, func, float(weight)))
+        return self
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.state in (Job.DONE, Job.FAILED, Job.CANCELLED)
+
+    def cancel(self):
+        """Отменить задачу; запущенный внешний процесс завершается сразу."""
+        self._cancel_event.set()
+        with self._lock:
+            process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def report(self, fraction):
+        """Сообщить прогресс внутри текущего этапа (0..1)."""
+        fraction = min(max(fraction, 0.0), 1.0)
+        progress = self._stage_start + self._stage_span * fraction
+        if progress > self.progress:
+            self.progress = progress
+            self._emit("progress")
+        if self._rss_start is not None and time.perf_counter() - self._rss_sampled_at >= MEMORY_SAMPLE_INTERVAL:
+            self._sample_memory()
+
+    def step(self, fraction):
+        """Прогресс из долгих вычислений: заодно прерывает их, если задачу отменили."""
+        self.check_cancelled()
+        self.report(fraction)
+
+    def record(self, stage, seconds):
+        self.timings.append((stage, seconds))
+
+    @contextmanager
+    def timed(self, stage):
+        """Засечь время блока кода как этап ``stage`` (в том числе при ошибке).
+
+        Заодно в ``memory`` записывается прирост памяти процесса за этап: она
+        замеряется в начале и в конце, а внутри - при сообщениях о прогрессе.
+        Память общая для всего процесса, поэтому параллельные задачи попадают
+        в замер друг друга.
+        """
+        self._rss_start = self._rss_peak = current_rss()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+            if self._rss_start is not None:
+                self._sample_memory()
+                self.memory.append((stage, max(0, self._rss_peak - self._rss_start)))
+            self._rss_start = None
+
+    def _sample_memory(self):
+        self._rss_sampled_at = time.perf_counter()
+        rss, peak = current_rss(), self._rss_peak
+        # Прогресс может прийти из потока кодировщика, когда этап уже закончился
+        if rss is not None and peak is not None and rss > peak:
+            self._rss_peak = rss
+
+    def wait_for(self, future, poll=0.1):
+        """Дождаться результата ``future`` (например, вызова в главном потоке), прерываясь при отмене."""
+        while True:
+            self.check_cancelled()
+            try:
+                return future.result(timeout=poll)
+            except FutureTimeout:
+                continue
+
+    @contextmanager
+    def attached_process(self, process):
+        """Связать с задачей внешний процесс, который ей не принадлежит: отмена завершит его."""
+        with self._lock:
+            self._process = process
+        try:
+            yield process
+        finally:
+            with self._lock:
+                self._process = None
+
+    def run_process(self, args, input_data=None):
+        """Run an external command, streaming ``input_data`` to its stdin.
+
+        Progress printed by ImageMagick's ``-monitor`` is forwarded to ``report``.
+        Raises ``JobCancelled`` if the job was cancelled while the process ran.
+        """
+        self.check_cancelled()
+        process = subprocess.Popen(
+            args,
+            stdin=subprocess.PIPE if input_data is not None else subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE
+        )
+        with self._lock:
+            self._process = process
+
+        writer = None
+        if input_data is not None:
+            writer = threading.Thread(target=_feed_stdin, args=(process.stdin, input_data), daemon=True)
+            writer.start()
+
+        tail = b""
+        try:
+            for chunk in iter(lambda: process.stderr.read1(STDERR_TAIL), b""):
+                tail = (tail + chunk)[-STDERR_TAIL:]
+                matches = PROGRESS_PATTERN.findall(chunk)
+                if matches:
+                    self.report(int(matches[-1]) / 100.0)
+            process.wait()
+        finally:
+            process.stderr.close()
+            if writer is not None:
+                writer.join()
+            with self._lock:
+                self._process = None
+
+        self.check_cancelled()
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, args, stderr=tail)
+
+    def _run(self):
+        if self.cancelled:
+            self.state = Job.CANCELLED
+            return
+        self.state = Job.RUNNING
+        if self._queued_at is not None:
+            self.record("queue", time.perf_counter() - self._queued_at)
+        total = sum(weight for _, _, weight in self._stages) or 1.0
+        done = 0.0
+        for name, func, weight in self._stages:
+            self.check_cancelled()
+            self.stage = name
+            self._stage_start = done / total
+            self._stage_span = weight / total
+            self.report(0.0)
+            self._emit("progress")
+            with self.timed(name):
+                func(self)
+            done += weight
+        self.progress = 1.0
+        self.state = Job.DONE
+
+    def _emit(self, event):
+        if self._listener is not None:
+            self._listener(event, self)
+
+
+class JobBatch:
+    """Group of jobs reported together: one summary instead of a message per job.
+
+    ``job_finished`` is called by the plugin on the UI thread for each finished
+    job and returns True once every job of the batch has finished.
+    """
+
+    def __init__(self, title):
+        self.title = title
+        self.jobs = []
+        self._finished = 0
+
+    def add(self, job):
+        job.batch = self
+        self.jobs.append(job)
+        return job
+
+    def job_finished(self, job):
+        self._finished += 1
+        return self._finished == len(self.jobs)
+
+    def jobs_in_state(self, state):
+        return [job for job in self.jobs if job.state == state]
+
+
+def _feed_stdin(stream, data):
+    try:
+        stream.write(data)
+    except (BrokenPipeError, OSError):
+        # Процесс завершился раньше (ошибка или отмена) - код возврата скажет больше
+        pass
+    finally:
+        try:
+            stream.close()
+        except OSError:
+            pass
+
+
+class JobEngine:
+    """Bounded pool of worker threads executing ``Job`` objects in FIFO order.
+
+    ``listener(event, job)`` is called from worker threads with ``"queued"``,
+    ``"progress"`` and ``"finished"`` events.
+    """
+
+    def __init__(self, max_workers=None, listener=None):
+        self.listener = listener
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or default_worker_count(),
+            thread_name_prefix="evrika-job"
+        )
+        self._jobs = []
+        self._lock = threading.Lock()
+
+    def submit(self, job):
+        job._listener = self._notify
+        job._queued_at = time.perf_counter()
+        with self._lock:
+            self._jobs.append(job)
+        self._notify("queued", job)
+        self._executor.submit(self._execute, job)
+        return job
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs)
+
+    def active_jobs(self):
+        return [job for job in self.jobs() if not job.finished]
+
+    def forget_finished(self):
+        with self._lock:
+            self._jobs = [job for job in self._jobs if not job.finished]
+
+    def cancel_all(self):
+        for job in self.active_jobs():
+            job.cancel()
+
+    def shutdown(self, wait=False):
+        self.cancel_all()
+        self._executor.shutdown(wait=wait)
+
+    def _execute(self, job):
+        try:
+            job._run()
+        except JobCancelled:
+            job.state = Job.CANCELLED
+        except Exception as e:
+            job.error = e
+            job.state = Job.FAILED
+        self._notify("finished", job)
+
+    def _notify(self, event, job):
+        if self.listener is not None:
+            self.listener(event, job)
@@ -0,0 +1,93 @@
+import os
+import subprocess
+from sys import platform
+
+# Построение команд ImageMagick для импорта и экспорта DDS
+
+PLUGIN_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_magick_path = None
+_magick_version = None
+
+
+def magick_path():
+    """Путь к исполняемому файлу ImageMagick (определяется один раз)."""
+    global _magick_path
+    if _magick_path is None:
+        if platform == "win32":
+            _magick_path = os.path.join(PLUGIN_DIR, "resources", "magick.exe")
+        else:
+            _magick_path = "magick"
+    return _magick_path
+
+
+def magick_version():
+    """Первая строка ``magick -version`` (определяется один раз); входит в ключи кэша конвертаций."""
+    global _magick_version
+    if _magick_version is None:
+        try:
+            output = subprocess.run([magick_path(), "-version"], stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, check=False).stdout
+            _magick_version = output.decode("utf-8", "replace").splitlines()[0].strip()
+        except (OSError, IndexError):
+            _magick_version = "unknown"
+    return _magick_version
+
+
+def partial_output(output_file):
+    """Временный файл рядом с ``output_file`` и цель записи для magick с явным форматом.
+
+    Результат пишется в ``<output_file>.part`` и переименовывается после успеха, поэтому
+    ошибка или отмена не оставляют обрезанный файл; по расширению .part формат не определить.
+    """
+    temp_output = output_file + ".part"
+    extension = os.path.splitext(output_file)[1].lstrip(".").upper()
+    return temp_output, f"{extension}:{temp_output}"
+
+
+def remove_partial(temp_output):
+    try:
+        os.remove(temp_output)
+    except OSError:
+        pass
+
+
+def build_import_args(input_file, output_file):
+    return [magick_path(), input_file, "-monitor", output_file]
+
+
+def build_export_args(width, height, pixel_format, save_file, compression_format, mipmap_levels, export_filter):
+    """Аргументы для сохранения сырых пикселей из stdin в DDS с заданной компрессией, mipmap и фильтром.
+
+    Пиксели передаются без временного файла: ``-size WxH -depth 8 BGRA:-``.
+    """
+    args = [magick_path(), "-size", f"{width}x{height}", "-depth", "8", f"{pixel_format}:-", "-monitor"]
+    args.extend(export_options(compression_format, mipmap_levels, export_filter))
+    args.append(save_file)
+    return args
+
+
+def build_convert_args(input_file, save_file, compression_format, mipmap_levels, export_filter):
+    """Аргументы для конвертации файла изображения в DDS (командная строка, без Krita)."""
+    args = [magick_path(), input_file, "-monitor"]
+    args.extend(export_options(compression_format, mipmap_levels, export_filter))
+    args.append(save_file)
+    return args
+
+
+def build_read_args(input_file):
+    """Аргументы для чтения изображения как 8-битного RGBA в формате PAM в stdout."""
+    return [magick_path(), input_file, "-type", "TrueColorAlpha", "-depth", "8", "PAM:-"]
+
+
+def export_options(compression_format, mipmap_levels, export_filter):
+    """Настройки записи DDS: компрессия, уровни mipmap и фильтр уменьшения."""
+    options = ["-define", f"dds:compression={compression_format.lower()}"]
+
+    if mipmap_levels != "Auto":
+        options.extend(["-define", f"dds:mipmaps={mipmap_levels}"])
+
+    if export_filter:
+        options.extend(["-filter", export_filter.lower()])
+
+    return options
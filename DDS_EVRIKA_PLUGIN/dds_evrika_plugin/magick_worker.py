@@ -0,0 +1,305 @@
+import atexit
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from sys import platform
+
+from .jobs import PROGRESS_PATTERN, STDERR_TAIL, default_worker_count
+from .magick import magick_path, partial_output, remove_partial
+from .workspace import choose_root, fits, memory_roots
+
+# Постоянные процессы ImageMagick: вместо запуска magick на каждую конвертацию
+# процесс "magick -script -" запускается один раз (лениво) и получает команды
+# через stdin. Каждая команда заканчивается записью маленького файла-маркера,
+# по появлению которого видно, что все предыдущие операции выполнены
+# (stdout при работе через канал буферизуется, поэтому на него не полагаемся).
+
+# Сколько ждать ответа на проверку живости процесса
+PING_TIMEOUT = 10.0
+# Простаивающий дольше этого процесс перед выдачей проверяется командой-пингом
+IDLE_CHECK_AFTER = 30.0
+POLL_INTERVAL = 0.01
+
+# Настройки, которые команда может задать; после команды они сбрасываются (+opt),
+# чтобы не влиять на следующие команды того же процесса
+RESET_OPTIONS = ("-size", "-depth", "-filter", "-monitor")
+
+
+class MagickWorkerError(RuntimeError):
+    """Постоянный процесс magick завершился или не выполнил команду."""
+
+
+class MagickWorkerUnavailable(MagickWorkerError):
+    """Постоянный процесс запустить не удалось (например, magick без поддержки -script)."""
+
+
+def _quote(token):
+    """Токен скрипта magick в кавычках (пути могут содержать пробелы)."""
+    token = str(token)
+    if platform == "win32":
+        token = token.replace("\\", "/")
+    if "'" not in token:
+        return f"'{token}'"
+    return '"' + token.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _reset_tokens(options):
+    tokens = []
+    for index, option in enumerate(options):
+        if option in RESET_OPTIONS:
+            tokens.append("+" + option[1:])
+        elif option == "-define":
+            tokens.extend(["+define", options[index + 1].split("=", 1)[0]])
+    return tokens
+
+
+class MagickWorker:
+    """One resident ``magick -script -`` process that runs commands sequentially."""
+
+    def __init__(self):
+        self.process = None
+        self.directory = None
+        self.last_used = 0.0
+        self._counter = 0
+        self._tail = b""
+        self._job = None
+        self._reader = None
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        self.directory = tempfile.mkdtemp(prefix="evrika-magick-", dir=choose_root())
+        self.process = subprocess.Popen(
+            [magick_path(), "-script", "-"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE
+        )
+        self._reader = threading.Thread(target=self._read_stderr, daemon=True)
+        self._reader.start()
+        if not self.ping(PING_TIMEOUT):
+            self.stop()
+            raise MagickWorkerError("ImageMagick does not accept commands through -script")
+
+    def stop(self):
+        process, self.process = self.process, None
+        if process is not None:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+    def ping(self, timeout=PING_TIMEOUT):
+        """Проверка живости: процесс должен выполнить пустую команду за ``timeout`` секунд."""
+        try:
+            return self._execute([], timeout=timeout)
+        except MagickWorkerError:
+            return False
+
+    def convert(self, job, source, output_file, read_options=(), write_options=(), input_data=None):
+        """Прочитать ``source`` и записать ``output_file`` в этом процессе.
+
+        With ``input_data`` the raw pixels are written to a file in the worker
+        directory, which the pool only allows when it is in memory, and
+        ``source`` is the raw format name ("BGRA"). The output is written under a temporary name and
+        renamed once the command succeeded; on failure or cancellation the
+        process is stopped and the temporary file removed.
+        """
+        raw_file = None
+        if input_data is not None:
+            handle, raw_file = tempfile.mkstemp(prefix="input-", suffix=".raw", dir=self.directory)
+            with os.fdopen(handle, "wb") as f:
+                f.write(input_data)
+            source = f"{source}:{raw_file}"
+
+        temp_output, target = partial_output(output_file)
+        options = list(read_options) + ["-monitor"] + list(write_options)
+        tokens = list(read_options) + ["-monitor", "-read", source] + list(write_options)
+        tokens += ["-write", target, "-delete", "0--1"] + _reset_tokens(options)
+
+        self._job = job
+        self._tail = b""
+        try:
+            with job.attached_process(self.process):
+                self._execute(tokens, job=job)
+            if not os.path.exists(temp_output):
+                message = self._tail.decode("utf-8", "replace").strip()
+                raise MagickWorkerError(message or f"ImageMagick did not write {output_file}")
+            os.replace(temp_output, output_file)
+        except BaseException:
+            # Процесс мог ещё писать файл: сначала остановить (пул всё равно заменит его)
+            self.stop()
+            remove_partial(temp_output)
+            raise
+        finally:
+            self._job = None
+            if raw_file is not None:
+                _remove(raw_file)
+
+    def _execute(self, tokens, job=None, timeout=None):
+        """Отправить команду с маркером завершения и дождаться маркера."""
+        if not self.alive:
+            raise MagickWorkerError("ImageMagick worker is not running")
+        self._counter += 1
+        marker = os.path.join(self.directory, f"done{self._counter}.txt")
+        tokens = tokens + ["-size", "1x1", "-read", "xc:black", "-write", f"TXT:{marker}", "-delete", "0--1", "+size"]
+        script = " ".join(_quote(token) if not token.startswith(("-", "+")) else token for token in tokens) + "\n"
+        try:
+            self.process.stdin.write(script.encode("utf-8"))
+            self.process.stdin.flush()
+        except OSError as e:
+            raise MagickWorkerError(f"ImageMagick worker stopped: {e}")
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not os.path.exists(marker):
+            if job is not None:
+                job.check_cancelled()
+            if not self.alive:
+                raise MagickWorkerError("ImageMagick worker stopped: " + self._tail.decode("utf-8", "replace").strip())
+            if deadline is not None and time.monotonic() > deadline:
+                raise MagickWorkerError("ImageMagick worker does not respond")
+            time.sleep(POLL_INTERVAL)
+        _remove(marker)
+        self.last_used = time.monotonic()
+        return True
+
+    def _read_stderr(self):
+        process = self.process
+        for chunk in iter(lambda: process.stderr.read1(STDERR_TAIL), b""):
+            self._tail = (self._tail + chunk)[-STDERR_TAIL:]
+            job = self._job
+            matches = PROGRESS_PATTERN.findall(chunk)
+            if job is not None and matches:
+                job.report(int(matches[-1]) / 100.0)
+
+
+class MagickWorkerPool:
+    """Lazily started resident magick processes, at most one per conversion thread.
+
+    A worker that died, stopped answering or failed a command is discarded and
+    a fresh one is started on the next request. ``shutdown`` (also called when
+    the process exits) stops every worker, including busy ones.
+    """
+
+    def __init__(self, size=None):
+        self.size = size or default_worker_count()
+        # После неудачного запуска пул больше не пытается: плагин запускает magick на каждую задачу
+        self.disabled = False
+        self._idle = []
+        self._workers = set()
+        self._count = 0
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        atexit.register(self.shutdown)
+
+    def convert(self, job, source, output_file, read_options=(), write_options=(), input_data=None):
+        if input_data is not None and not self.holds_in_memory(len(input_data)):
+            # Иначе пиксели пошли бы на диск: отдельный процесс получит их через stdin без файла
+            raise MagickWorkerUnavailable("No in-memory directory for the input pixels")
+        worker = self._acquire(job)
+        healthy = False
+        try:
+            worker.convert(job, source, output_file, read_options, write_options, input_data)
+            healthy = True
+        finally:
+            self._release(worker, healthy and worker.alive)
+
+    @staticmethod
+    def holds_in_memory(size):
+        """Поместятся ли ``size`` байт входных пикселей в папку процессов, если она в памяти (tmpfs)."""
+        root = choose_root()
+        return root in memory_roots() and fits(root, size)
+
+    def shutdown(self):
+        with self._lock:
+            # После остановки пул не запускает новые процессы: задачи переходят на отдельный magick
+            self.disabled = True
+            workers, self._workers, self._idle = self._workers, set(), []
+        for worker in workers:
+            worker.stop()
+
+    def _acquire(self, job):
+        with self._available:
+            while True:
+                job.check_cancelled()
+                if self._idle:
+                    worker = self._idle.pop()
+                    break
+                if self._count < self.size:
+                    self._count += 1
+                    worker = None
+                    break
+                self._available.wait(0.1)
+
+        if worker is not None and worker.alive and (
+                time.monotonic() - worker.last_used < IDLE_CHECK_AFTER or worker.ping()):
+            return worker
+        if worker is not None:
+            with self._lock:
+                self._workers.discard(worker)
+            worker.stop()
+        worker = MagickWorker()
+        with self._lock:
+            if self.disabled:
+                self._count -= 1
+                raise MagickWorkerUnavailable("The ImageMagick worker pool is shut down")
+            self._workers.add(worker)
+        try:
+            worker.start()
+        except (OSError, MagickWorkerError) as e:
+            self._release(worker, False)
+            self.disabled = True
+            raise MagickWorkerUnavailable(f"Cannot start a resident ImageMagick process: {e}")
+        return worker
+
+    def _release(self, worker, healthy):
+        with self._available:
+            healthy = healthy and worker in self._workers
+            if healthy:
+                self._idle.append(worker)
+            else:
+                self._workers.discard(worker)
+                self._count -= 1
+            self._available.notify()
+        if not healthy:
+            worker.stop()
+
+
+def run_magick(job, args, source, output_file, pool=None, read_options=(), write_options=(), input_data=None):
+    """Конвертация в постоянном процессе magick из ``pool``; без него - отдельным процессом ``args``.
+
+    ``pool`` None - постоянные процессы выключены в настройках. Последний аргумент
+    ``args`` - ``output_file``; отдельный процесс тоже пишет во временный файл,
+    поэтому ошибка или отмена не портят прежний ``output_file``.
+    """
+    if pool is not None and not pool.disabled:
+        try:
+            pool.convert(job, source, output_file, read_options, write_options, input_data)
+            return
+        except MagickWorkerUnavailable:
+            pass
+    temp_output, target = partial_output(output_file)
+    try:
+        job.run_process(args[:-1] + [target], input_data=input_data)
+        os.replace(temp_output, output_file)
+    except BaseException:
+        remove_partial(temp_output)
+        raise
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,343 @@
+import math
+
+from .endpoints import np
+
+# Построение цепочки mip на NumPy. Фильтры из настроек экспорта (те же имена, что у
+# ImageMagick -filter) заданы как функции ядра; для уменьшения ровно в 2 раза ядро
+# одинаково для всех пикселей, поэтому оно один раз считается в набор весов и
+# применяется раздельно по строкам и столбцам. Каждый уровень строится из
+# предыдущего (во float32, без промежуточного округления), цвет фильтруется с
+# учётом альфы (premultiplied), по желанию - в линейном свете.
+
+
+def _sinc(x):
+    return np.sinc(x)
+
+
+def _cubic(b, c):
+    """Семейство кубических фильтров Митчелла-Нетравали."""
+    def kernel(x):
+        x = np.abs(x)
+        near = ((12 - 9 * b - 6 * c) * x ** 3 + (-18 + 12 * b + 6 * c) * x ** 2 + (6 - 2 * b)) / 6
+        far = ((-b - 6 * c) * x ** 3 + (6 * b + 30 * c) * x ** 2 + (-12 * b - 48 * c) * x + (8 * b + 24 * c)) / 6
+        return np.where(x < 1, near, np.where(x < 2, far, 0.0))
+    return kernel
+
+
+def _box(x):
+    return np.where(np.abs(x) <= 0.5, 1.0, 0.0)
+
+
+def _triangle(x):
+    return np.maximum(0.0, 1.0 - np.abs(x))
+
+
+def _hermite(x):
+    x = np.abs(x)
+    return np.where(x < 1, (2 * x - 3) * x * x + 1, 0.0)
+
+
+def _quadratic(x):
+    x = np.abs(x)
+    return np.where(x < 0.5, 0.75 - x * x, np.where(x < 1.5, 0.5 * (x - 1.5) ** 2, 0.0))
+
+
+def _gaussian(x):
+    # sigma = 0.5, как у ImageMagick
+    return np.exp(-2.0 * x * x)
+
+
+def _lagrange(x):
+    # Кубический лагранжев (4 точки)
+    x = np.abs(x)
+    near = 0.5 * (x - 1) * (x + 1) * (x - 2)
+    far = -(x - 1) * (x - 2) * (x - 3) / 6
+    return np.where(x < 1, near, np.where(x < 2, far, 0.0))
+
+
+def _bessel_j1(x):
+    """J1 через интеграл Бесселя (ядро считается один раз на несколько десятков точек)."""
+    tau = np.linspace(0.0, math.pi, 257)
+    values = np.cos(tau[None, :] - np.asarray(x, dtype=np.float64).reshape(-1, 1) * np.sin(tau[None, :]))
+    step = tau[1] - tau[0]
+    integral = (values.sum(axis=1) - 0.5 * (values[:, 0] + values[:, -1])) * step
+    return (integral / math.pi).reshape(np.shape(x))
+
+
+def _jinc(x):
+    x = np.asarray(x, dtype=np.float64)
+    scaled = math.pi * np.where(x == 0, 1.0, x)
+    return np.where(x == 0, 1.0, 2.0 * _bessel_j1(scaled) / scaled)
+
+
+# Окна для оконного sinc; t - расстояние, нормированное на радиус (0..1)
+_WINDOWS = {
+    "hanning": lambda t: 0.5 + 0.5 * np.cos(math.pi * t),
+    "hamming": lambda t: 0.54 + 0.46 * np.cos(math.pi * t),
+    "blackman": lambda t: 0.42 + 0.5 * np.cos(math.pi * t) + 0.08 * np.cos(2 * math.pi * t),
+    "welch": lambda t: 1.0 - t * t,
+    "parzen": lambda t: np.where(t < 0.5, 1 - 6 * t * t + 6 * t ** 3, 2 * (1 - t) ** 3),
+    "bohman": lambda t: (1 - t) * np.cos(math.pi * t) + np.sin(math.pi * t) / math.pi,
+    "bartlett": lambda t: 1.0 - t,
+    "cosine": lambda t: np.cos(0.5 * math.pi * t),
+    "kaiser": lambda t: np.i0(6.5 * np.sqrt(np.maximum(0.0, 1 - t * t))) / np.i0(6.5),
+}
+
+
+def _windowed(window, support):
+    def kernel(x):
+        t = np.minimum(np.abs(x) / support, 1.0)
+        return np.where(np.abs(x) < support, _sinc(x) * window(t), 0.0)
+    return kernel
+
+
+def _lanczos(lobes, blur=1.0):
+    def kernel(x):
+        x = np.asarray(x) / blur
+        return np.where(np.abs(x) < lobes, _sinc(x) * _sinc(x / lobes), 0.0)
+    return kernel, lobes * blur
+
+
+_JINC_SUPPORT = 3.2383154841662362
+
+# Имя фильтра (в нижнем регистре) -> (функция ядра, радиус)
+FILTERS = {
+    "box": (_box, 0.5),
+    "triangle": (_triangle, 1.0),
+    "hermite": (_hermite, 1.0),
+    "quadratic": (_quadratic, 1.5),
+    "gaussian": (_gaussian, 1.5),
+    "cubic": (_cubic(1.0, 0.0), 2.0),
+    "spline": (_cubic(1.0, 0.0), 2.0),
+    "catrom": (_cubic(0.0, 0.5), 2.0),
+    "mitchell": (_cubic(1.0 / 3.0, 1.0 / 3.0), 2.0),
+    "robidoux": (_cubic(0.37821575509399867, 0.31089212245300067), 2.0),
+    "robidouxsharp": (_cubic(0.2620145123990142, 0.3689927438004929), 2.0),
+    "lagrange": (_lagrange, 2.0),
+    "sinc": (lambda x: np.where(np.abs(x) < 4.0, _sinc(x), 0.0), 4.0),
+    "sincfast": (lambda x: np.where(np.abs(x) < 4.0, _sinc(x), 0.0), 4.0),
+    "jinc": (lambda x: np.where(np.abs(x) < _JINC_SUPPORT, _jinc(x) * _jinc(x * 1.2196698912665045 / _JINC_SUPPORT), 0.0),
+             _JINC_SUPPORT),
+    "lanczos": _lanczos(3),
+    "lanczossharp": _lanczos(3, 0.9812505644269356),
+    "lanczos2": _lanczos(2),
+    "lanczos2sharp": _lanczos(2, 0.9549963639785485),
+}
+FILTERS.update({name: (_windowed(window, 3.0), 3.0) for name, window in _WINDOWS.items()})
+
+# "Undefined" и "Sentinel" - фильтр ImageMagick по умолчанию при уменьшении
+DEFAULT_FILTER = "lanczos"
+
+_KERNELS = {}
+
+
+def reduction_kernel(filter_name):
+    """Веса фильтра для уменьшения в 2 раза: выходной пиксель i берёт входные 2i-K+1 .. 2i+K."""
+    name = (filter_name or DEFAULT_FILTER).lower()
+    if name not in FILTERS and name != "point":
+        name = DEFAULT_FILTER
+    kernel = _KERNELS.get(name)
+    if kernel is None:
+        if name == "point":
+            # Ближайший пиксель: левый верхний из четырёх
+            kernel = np.array([1.0, 0.0], dtype=np.float32)
+        else:
+            function, support = FILTERS[name]
+            half = max(1, int(math.ceil(2 * support - 0.5)))
+            # Расстояние от центра выходного пикселя до центров входных, в единицах фильтра
+            offsets = (np.arange(-half + 1, half + 1) - 0.5) / 2.0
+            weights = np.asarray(function(offsets), dtype=np.float64)
+            kernel = (weights / weights.sum()).astype(np.float32)
+        _KERNELS[name] = kernel
+    return kernel
+
+
+def srgb_to_linear(values):
+    values = np.asarray(values, dtype=np.float32)
+    return np.where(values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4)
+
+
+def linear_to_srgb(values):
+    values = np.clip(values, 0.0, 1.0)
+    return np.where(values <= 0.0031308, values * 12.92, 1.055 * np.power(values, 1 / 2.4) - 0.055)
+
+
+_SRGB_TABLE = None
+
+
+def _to_working(rgba, linear):
+    """uint8 RGBA -> float32 с premultiplied альфой (цвет - в линейном свете, если нужно)."""
+    global _SRGB_TABLE
+    image = np.empty(rgba.shape, dtype=np.float32)
+    if linear:
+        if _SRGB_TABLE is None:
+            _SRGB_TABLE = srgb_to_linear(np.arange(256) / 255.0).astype(np.float32)
+        image[..., :3] = _SRGB_TABLE[rgba[..., :3]]
+    else:
+        np.multiply(rgba[..., :3], 1 / 255.0, out=image[..., :3])
+    np.multiply(rgba[..., 3], 1 / 255.0, out=image[..., 3])
+    image[..., :3] *= image[..., 3:]
+    return image
+
+
+def _to_rgba8(image, linear):
+    alpha = image[..., 3:]
+    color = np.where(alpha > 1e-6, image[..., :3] / np.maximum(alpha, 1e-6), 0.0)
+    if linear:
+        color = linear_to_srgb(color)
+    rgba = np.empty(image.shape, dtype=np.uint8)
+    rgba[..., :3] = np.clip(np.rint(color * 255.0), 0, 255)
+    rgba[..., 3] = np.clip(np.rint(alpha[..., 0] * 255.0), 0, 255)
+    return rgba
+
+
+class _Buffers:
+    """Рабочие буферы наибольшего уровня; меньшие уровни используют их начало."""
+
+    def __init__(self):
+        self._buffers = {}
+
+    def get(self, name, shape):
+        size = int(np.prod(shape))
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.size < size:
+            buffer = np.empty(size, dtype=np.float32)
+            self._buffers[name] = buffer
+        return buffer[:size].reshape(shape)
+
+
+def _reduce_axis(source, axis, kernel, buffers, target_name):
+    """Уменьшить в 2 раза по оси ``axis`` (0 - строки, 1 - столбцы) свёрткой с ``kernel``."""
+    length = source.shape[axis]
+    if length == 1:
+        return source
+    count = length // 2
+    half = kernel.size // 2
+
+    padded_shape = list(source.shape)
+    padded_shape[axis] = length + 2 * half
+    padded = np.moveaxis(buffers.get("padded", padded_shape), axis, 0)
+    src = np.moveaxis(source, axis, 0)
+    # Края повторяются (как виртуальные пиксели "edge")
+    padded[half:half + length] = src
+    padded[:half] = src[:1]
+    padded[half + length:] = src[-1:]
+
+    target_shape = list(source.shape)
+    target_shape[axis] = count
+    target = buffers.get(target_name, target_shape)
+    out = np.moveaxis(target, axis, 0)
+    scratch = np.moveaxis(buffers.get("scratch", target_shape), axis, 0)
+    out[...] = 0.0
+    for tap, weight in enumerate(kernel):
+        if weight == 0.0:
+            continue
+        # Выходной пиксель i берёт входной 2i + tap - half + 1 (смещён на half из-за отступа)
+        start = tap + 1
+        np.multiply(padded[start:start + 2 * count:2], weight, out=scratch)
+        out += scratch
+    return target
+
+
+def mip_chain(rgba, count, filter_name="Box", linear=False):
+    """Yield ``count`` uint8 RGBA levels, starting with ``rgba`` itself.
+
+    Every level is filtered from the previous float level with the separable
+    kernel of ``filter_name``; with ``linear`` the colour is averaged in linear
+    light and converted back to sRGB for encoding.
+    """
+    yield rgba
+    if count <= 1:
+        return
+    kernel = reduction_kernel(filter_name)
+    buffers = _Buffers()
+    level = _to_working(rgba, linear)
+    for _ in range(1, count):
+        # Проходы сначала копируют источник в буфер с отступами, поэтому результат
+        # можно писать в тот же буфер, где лежал предыдущий уровень
+        level = _reduce_axis(level, 1, kernel, buffers, "columns")
+        level = _reduce_axis(level, 0, kernel, buffers, "level")
+        np.clip(level, 0.0, 1.0, out=level)
+        yield _to_rgba8(level, linear)
+
+
+class _RowReducer:
+    """Вертикальный проход ``_reduce_axis`` по частям: строки приходят сверху вниз.
+
+    Хранит только строки, которые ещё понадобятся следующим выходным строкам;
+    результат совпадает с уменьшением всего изображения сразу.
+    """
+
+    def __init__(self, length, kernel):
+        self.length = length
+        self.kernel = kernel
+        self.half = kernel.size // 2
+        self.count = length // 2 if length > 1 else 1
+        self.received = 0
+        self.produced = 0
+        self.first = 0
+        self.rows = None
+
+    def push(self, rows):
+        """Добавить следующие входные строки; вернуть (номер первой строки, готовые выходные строки)."""
+        start = self.produced
+        if self.length == 1:
+            self.produced += rows.shape[0]
+            return start, rows.copy()
+
+        self.rows = rows.copy() if self.rows is None else np.concatenate([self.rows, rows])
+        self.received += rows.shape[0]
+        if self.received >= self.length:
+            ready = self.count
+        else:
+            # Выходная строка i использует входные до 2i + half включительно
+            ready = min(self.count, max(0, (self.received - 1 - self.half) // 2 + 1))
+
+        output = np.zeros((ready - start,) + rows.shape[1:], dtype=np.float32)
+        if ready > start:
+            scratch = np.empty_like(output)
+            base = 2 * np.arange(start, ready) + 1 - self.half
+            for tap, weight in enumerate(self.kernel):
+                if weight == 0.0:
+                    continue
+                indices = np.clip(base + tap, 0, self.length - 1) - self.first
+                np.multiply(self.rows[indices], weight, out=scratch)
+                output += scratch
+        self.produced = ready
+
+        # Строки выше первой нужной следующему выходу больше не нужны
+        keep = min(max(0, 2 * ready + 1 - self.half), self.length - 1)
+        if keep > self.first:
+            self.rows = self.rows[keep - self.first:].copy()
+            self.first = keep
+        return start, output
+
+
+class MipStream:
+    """``mip_chain`` for an image that arrives in horizontal strips, top to bottom.
+
+    ``push`` takes the next rows of the top level (uint8 RGBA) and returns the
+    rows of the smaller levels that became final, as ``(level, first_row, rows)``.
+    Only a few rows per level are kept, and the levels are identical to the
+    ones ``mip_chain`` builds from the whole image.
+    """
+
+    def __init__(self, width, height, count, filter_name="Box", linear=False):
+        self.linear = linear
+        self.kernel = reduction_kernel(filter_name)
+        self._buffers = _Buffers()
+        self._reducers = [_RowReducer(max(1, height >> level), self.kernel) for level in range(count - 1)]
+
+    def push(self, rows):
+        ready = []
+        if not self._reducers:
+            return ready
+        image = _to_working(rows, self.linear)
+        for level, reducer in enumerate(self._reducers, 1):
+            image = _reduce_axis(image, 1, self.kernel, self._buffers, "columns")
+            first_row, image = reducer.push(image)
+            if not image.shape[0]:
+                break
+            np.clip(image, 0.0, 1.0, out=image)
+            ready.append((level, first_row, _to_rgba8(image, self.linear)))
+        return ready
@@ -0,0 +1,69 @@
+# Именованные пресеты экспорта. Пресет - обычный словарь с ключами PRESET_KEYS;
+# он разрешается один раз при запуске экспорта и дальше передаётся в задачи,
+# поэтому пакетный экспорт не обращается к настройкам для каждого файла.
+
+PRESET_KEYS = ("compression", "mipmap", "filter", "backend", "bc7_quality", "linear")
+
+# Ключ пресета -> ключ настроек, из которого берутся значения "своих" настроек экспорта
+SETTINGS_KEYS = {
+    "compression": "export_compression",
+    "mipmap": "export_mipmap",
+    "filter": "export_filter",
+    "backend": "export_backend",
+    "bc7_quality": "export_bc7_quality",
+    "linear": "export_linear_mips",
+}
+
+DEFAULTS = {
+    "compression": "dxt1",
+    "mipmap": "Auto",
+    "filter": "Lanczos",
+    "backend": "magick",
+    "bc7_quality": "balanced",
+    "linear": False,
+}
+
+BUILTIN_PRESETS = {
+    # Цвет: BC7 с полной цепочкой mip, уменьшение в линейном свете
+    "albedo": {"compression": "bc7", "mipmap": "Auto", "filter": "Lanczos", "backend": "native", "bc7_quality": "balanced",
+               "linear": True},
+    # Нормали: мягкий фильтр без звона на mip и тщательный подбор конечных точек
+    "normal": {"compression": "bc7", "mipmap": "Auto", "filter": "Triangle", "backend": "native", "bc7_quality": "thorough",
+               "linear": False},
+    # Интерфейс: без сжатия и без mip, пиксель в пиксель
+    "ui": {"compression": "none", "mipmap": "0", "filter": "Point", "backend": "native", "bc7_quality": "balanced",
+           "linear": False},
+}
+
+
+def settings_preset(settings):
+    """Пресет из текущих настроек экспорта (ключи export_*)."""
+    return {key: settings.get(SETTINGS_KEYS[key], DEFAULTS[key]) for key in PRESET_KEYS}
+
+
+def preset_names(settings):
+    names = list(BUILTIN_PRESETS)
+    names += sorted(name for name in settings.get("presets", {}) if name not in BUILTIN_PRESETS)
+    return names
+
+
+def get_preset(settings, name):
+    """Пресет по имени: пользовательский перекрывает встроенный, недостающие ключи - из настроек."""
+    preset = settings_preset(settings)
+    preset.update(BUILTIN_PRESETS.get(name, {}))
+    preset.update(settings.get("presets", {}).get(name, {}))
+    return preset
+
+
+def active_preset(settings):
+    """Пресет для экспорта: выбранный в настройках или собственные настройки экспорта."""
+    name = settings.get("active_preset", "")
+    if name and name in preset_names(settings):
+        return get_preset(settings, name)
+    return settings_preset(settings)
+
+
+def save_preset(settings, name, preset):
+    presets = dict(settings.get("presets", {}))
+    presets[name] = {key: preset[key] for key in PRESET_KEYS}
+    settings.set("presets", presets)
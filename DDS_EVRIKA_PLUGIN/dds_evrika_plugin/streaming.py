@@ -0,0 +1,127 @@
+import os
+
+from .dds_format import BLOCK_FORMATS, build_header, mipmap_count
+from .endpoints import np
+from .mipmaps import MipStream
+from . import dds_encoder
+
+# Потоковый экспорт очень больших текстур: документ читается горизонтальными
+# полосами (кратными блоку 4x4), каждая полоса сразу кодируется и пишется в заранее
+# выделенный DDS-файл, отображённый в память, а уровни mip достраиваются по мере
+# поступления строк. В памяти одновременно находятся только полоса и несколько
+# строк каждого уровня, а не всё изображение.
+
+# Документы от этого размера экспортируются полосами
+MIN_PIXELS = 8192 * 8192
+# Примерный размер одной полосы 8-битного RGBA
+STRIP_BYTES = 16 << 20
+
+
+def supports(compression_format):
+    return dds_encoder.supports(compression_format)
+
+
+def strip_rows(width):
+    """Высота полосы для изображения шириной ``width``: кратна 4, около STRIP_BYTES."""
+    return max(4, STRIP_BYTES // (width * 4) // 4 * 4)
+
+
+class _LevelWriter:
+    """Кодирует строки одного уровня mip блоками 4x4 и пишет их на место в файле."""
+
+    def __init__(self, surface, width, height, fmt, quality, threads):
+        self.surface = surface
+        self.width = width
+        self.height = height
+        self.fmt = fmt
+        self.quality = quality
+        self.threads = threads
+        self.row = 0
+        self.pending = None
+
+    def add(self, rows, progress):
+        """Добавить следующие строки и закодировать все целые ряды блоков."""
+        self.pending = rows if self.pending is None else np.concatenate([self.pending, rows])
+        available = self.pending.shape[0]
+        # Неполный ряд блоков ждёт следующих строк, если уровень ещё не закончен
+        count = available if self.row + available >= self.height else available // 4 * 4
+        if not count:
+            return
+        part, self.pending = self.pending[:count], self.pending[count:]
+
+        if self.fmt == "BGRA8":
+            offset = self.row * self.width * 4
+            self.surface[offset:offset + part.size] = part[:, :, [2, 1, 0, 3]].reshape(-1)
+        else:
+            block_size = BLOCK_FORMATS[self.fmt]
+            blocks_x = (self.width + 3) // 4
+            encoded = dds_encoder.encode_blocks(dds_encoder.image_to_blocks(part), self.fmt, progress,
+                                                self.quality, self.threads)
+            offset = self.row // 4 * blocks_x * block_size
+            self.surface[offset:offset + encoded.size] = encoded.reshape(-1)
+        self.row += count
+
+
+def write_dds(path, width, height, strips, compression_format, mipmap_levels, progress=None,
+              quality="balanced", threads=None, mip_filter="Box", linear=False):
+    """Write a DDS from ``strips``, an iterable of (rows, width, 4) uint8 RGBA arrays.
+
+    Strips come top to bottom and, except the last one, have a multiple of 4
+    rows. The result is the same file ``dds_encoder.write_dds`` writes for the
+    whole image. The file is preallocated under a temporary name, filled through
+    a memory map and renamed on success.
+    """
+    fmt = dds_encoder.COMPRESSION_FORMATS[compression_format.lower()]
+    count = mipmap_count(width, height, mipmap_levels)
+    sizes = [(max(1, width >> level), max(1, height >> level)) for level in range(count)]
+    if fmt in BLOCK_FORMATS:
+        level_bytes = [((w + 3) // 4) * ((h + 3) // 4) * BLOCK_FORMATS[fmt] for w, h in sizes]
+    else:
+        level_bytes = [w * h * 4 for w, h in sizes]
+    total = float(sum(w * h for w, h in sizes))
+    header = build_header(width, height, fmt, count)
+
+    temp_path = path + ".part"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(header)
+            f.truncate(len(header) + sum(level_bytes))
+        data = np.memmap(temp_path, dtype=np.uint8, mode="r+", offset=len(header))
+        writers = []
+        try:
+            offset = 0
+            for (level_width, level_height), size in zip(sizes, level_bytes):
+                writers.append(_LevelWriter(data[offset:offset + size], level_width, level_height,
+                                            fmt, quality, threads))
+                offset += size
+
+            mips = MipStream(width, height, count, mip_filter, linear)
+            done = 0.0
+
+            def write(level, rows):
+                nonlocal done
+                share = rows.shape[0] * rows.shape[1] / total
+                level_progress = None
+                if progress is not None:
+                    level_progress = lambda fraction, done=done: progress(done + share * fraction)
+                writers[level].add(rows, level_progress)
+                done += share
+                if progress is not None:
+                    progress(done)
+
+            for strip in strips:
+                write(0, strip)
+                for level, _, rows in mips.push(strip):
+                    write(level, rows)
+            if any(writer.row < writer.height for writer in writers):
+                raise ValueError("The image ended before all rows were written")
+            data.flush()
+        finally:
+            # Отображение должно быть закрыто до переименования (Windows)
+            writers.clear()
+            del data
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
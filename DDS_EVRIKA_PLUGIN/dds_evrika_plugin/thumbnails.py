@@ -0,0 +1,100 @@
+import hashlib
+import os
+
+from .cache import ConversionCache, default_cache_dir
+from .dds_format import DDSFormatError, read_header
+from .mipmaps import mip_chain
+from . import dds_decoder
+
+# Данные для браузера текстур: метаданные берутся только из заголовков DDS,
+# миниатюры декодируются из наименьшего подходящего уровня mip и хранятся на
+# диске по ключу путь + mtime + размер файла, поэтому повторное открытие большой
+# папки не декодирует ничего заново.
+
+THUMBNAIL_SIZE = 128
+THUMBNAIL_VERSION = 1
+CACHE_MAX_MB = 64
+
+
+class TextureInfo:
+    """Строка браузера: файл и его заголовок (``header`` равен None, если это не DDS)."""
+
+    def __init__(self, path, stat, header):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime_ns
+        self.header = header
+
+
+def list_textures(folder):
+    """Файлы *.dds папки с разобранными заголовками (читается не больше 148 байт файла)."""
+    textures = []
+    try:
+        entries = sorted(os.scandir(folder), key=lambda entry: entry.name.lower())
+    except OSError:
+        return textures
+    for entry in entries:
+        if not entry.name.lower().endswith(".dds") or not entry.is_file():
+            continue
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        try:
+            header = read_header(entry.path)
+        except (OSError, DDSFormatError):
+            header = None
+        textures.append(TextureInfo(entry.path, stat, header))
+    return textures
+
+
+def thumbnail_cache():
+    return ConversionCache(default_cache_dir("thumbnails"), CACHE_MAX_MB << 20)
+
+
+def thumbnail_key(texture):
+    identity = f"{os.path.normcase(os.path.abspath(texture.path))}|{texture.mtime}|{texture.size}"
+    return hashlib.sha256(f"{identity}|{THUMBNAIL_VERSION}|{THUMBNAIL_SIZE}".encode("utf-8")).hexdigest()
+
+
+def thumbnail_level(header, size=THUMBNAIL_SIZE):
+    """Наименьший уровень mip, который ещё не меньше миниатюры по большей стороне."""
+    level = 0
+    while level + 1 < header.mipmap_count and max(header.level_size(level + 1)) >= size:
+        level += 1
+    return level
+
+
+def make_thumbnail(texture, cache=None, size=THUMBNAIL_SIZE):
+    """RGBA (h, w, 4) миниатюра не больше ``size`` по большей стороне или None.
+
+    None means the format cannot be decoded by the built-in decoder.
+    """
+    if texture.header is None or not dds_decoder.is_supported(texture.header):
+        return None
+    key = thumbnail_key(texture)
+    if cache is not None:
+        cached = cache.get(key, ".npy")
+        if cached is not None:
+            try:
+                return dds_decoder.np.load(cached)
+            except (OSError, ValueError):
+                pass
+
+    with dds_decoder.MappedDDS(texture.path) as dds:
+        image = dds.decode(thumbnail_level(dds.header, size))
+    # Уровни без mip (или не степени двойки) уменьшаются вдвое, пока не поместятся
+    steps = 0
+    height, width = image.shape[:2]
+    while max(width, height) > size:
+        width, height, steps = max(1, width // 2), max(1, height // 2), steps + 1
+    for image in mip_chain(image, steps + 1, "Box"):
+        pass
+
+    if cache is not None:
+        def write(path):
+            with open(path, "wb") as f:
+                dds_decoder.np.save(f, image)
+        cache.put_with(key, ".npy", write)
+    return image
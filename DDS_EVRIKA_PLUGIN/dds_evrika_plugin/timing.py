@@ -0,0 +1,163 @@
+import json
+import os
+import sys
+import threading
+import time
+
+from .cache import default_cache_dir
+
+# Журнал времени выполнения задач: по строке JSON на задачу (время и прирост памяти
+# каждого этапа, прочитанные/записанные байты). Файл ротируется по размеру,
+# хранится несколько последних частей.
+
+TRACE_FILE = "trace.jsonl"
+MAX_TRACE_BYTES = 1 << 20
+TRACE_BACKUPS = 3
+# Версия записей: с версии 2 этапы записываются постоянными идентификаторами
+# ("read", "encode", ...), а не переведёнными названиями; с версии 3 вместо пика
+# памяти процесса за сеанс хранится прирост памяти за этапы задачи
+TRACE_VERSION = 3
+
+
+def current_rss():
+    """Текущий объём памяти процесса (resident set) в байтах или None, если его не узнать."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if sys.platform == "win32":
+        return _windows_rss()
+    return None
+
+
+def _windows_rss():
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.WorkingSetSize
+    except (AttributeError, OSError):
+        pass
+    return None
+
+
+def job_record(job, kind):
+    """Запись журнала для завершённой задачи ``job`` ("import" или "export").
+
+    Этапы хранятся идентификаторами; переводятся они только при показе.
+    ``memory`` - прирост памяти процесса за каждый этап (см. ``Job.timed``),
+    ``peak_memory`` - наибольший из них.
+    """
+    growth = [size for _, size in job.memory]
+    return {
+        "version": TRACE_VERSION,
+        "time": time.time(),
+        "kind": kind,
+        "title": job.title,
+        "state": job.state,
+        "error": None if job.error is None else str(job.error),
+        "total": sum(seconds for _, seconds in job.timings),
+        "stages": [[stage, seconds] for stage, seconds in job.timings],
+        "bytes_read": job.context.get("bytes_read"),
+        "bytes_written": job.context.get("bytes_written"),
+        "memory": [[stage, size] for stage, size in job.memory],
+        "peak_memory": max(growth) if growth else None,
+    }
+
+
+class TraceLog:
+    """Rotating JSONL trace; ``append`` may be called from any thread."""
+
+    def __init__(self, directory=None, max_bytes=MAX_TRACE_BYTES, backups=TRACE_BACKUPS):
+        self.directory = directory or default_cache_dir("trace")
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, TRACE_FILE)
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                if os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.max_bytes:
+                    self._rotate()
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+            except OSError:
+                # Журнал - только диагностика: ошибка записи не должна ломать задачу
+                pass
+
+    def records(self, limit=None):
+        """Записи от старых к новым (из всех частей журнала), не больше ``limit`` последних.
+
+        Записи других версий формата пропускаются.
+        """
+        records = []
+        with self._lock:
+            paths = [f"{self.path}.{index}" for index in range(self.backups, 0, -1)] + [self.path]
+            for path in paths:
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        lines = f.readlines()
+                except OSError:
+                    continue
+                for line in lines:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(record, dict) and record.get("version") == TRACE_VERSION:
+                        records.append(record)
+        return records[-limit:] if limit else records
+
+    def clear(self):
+        with self._lock:
+            for index in range(self.backups + 1):
+                try:
+                    os.remove(f"{self.path}.{index}" if index else self.path)
+                except OSError:
+                    pass
+
+    def _rotate(self):
+        for index in range(self.backups, 0, -1):
+            source = f"{self.path}.{index - 1}" if index > 1 else self.path
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index}")
+
+
+def percentile(values, fraction):
+    """Перцентиль отсортированного списка (ближайший ранг)."""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(fraction * (len(values) - 1)))))
+    return values[index]
+
+
+def stage_statistics(records):
+    """{(kind, stage): (count, p50, p90, max)} по времени этапов завершённых задач."""
+    durations = {}
+    for record in records:
+        for stage, seconds in record.get("stages", []):
+            durations.setdefault((record.get("kind", ""), stage), []).append(seconds)
+        durations.setdefault((record.get("kind", ""), "total"), []).append(record.get("total", 0.0))
+    statistics = {}
+    for key, values in durations.items():
+        values.sort()
+        statistics[key] = (len(values), percentile(values, 0.5), percentile(values, 0.9), values[-1])
+    return statistics
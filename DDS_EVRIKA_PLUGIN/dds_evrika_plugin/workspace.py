@@ -0,0 +1,130 @@
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+from sys import platform
+
+# Временные рабочие папки задач: у каждой задачи своя папка, поэтому параллельные
+# задачи не удаляют и не перезаписывают файлы друг друга. Папки создаются в памяти
+# (tmpfs: /dev/shm или XDG_RUNTIME_DIR), если там хватает места для файлов задачи,
+# иначе - во временной папке системы. Освобождённые папки очищаются и
+# переиспользуются следующими задачами.
+
+PREFIX = "evrika-job-"
+# Сколько пустых папок держать заранее созданными
+SPARE_WORKSPACES = 2
+# Запас свободного места сверх оценки размера файлов задачи
+RESERVE_FRACTION = 0.25
+MIN_FREE_BYTES = 64 << 20
+
+
+def memory_roots():
+    """Папки в оперативной памяти, доступные для записи, в порядке предпочтения."""
+    candidates = []
+    if platform.startswith("linux"):
+        candidates.append("/dev/shm")
+    candidates.append(os.environ.get("XDG_RUNTIME_DIR"))
+    return [path for path in candidates
+            if path and os.path.isdir(path) and os.access(path, os.W_OK | os.X_OK)]
+
+
+def fits(directory, size):
+    """Поместятся ли ``size`` байт в файловую систему ``directory`` с запасом."""
+    try:
+        free = shutil.disk_usage(directory).free
+    except OSError:
+        return False
+    return free >= size * (1 + RESERVE_FRACTION) + MIN_FREE_BYTES
+
+
+def choose_root(size_hint=0):
+    """Папка для рабочих папок задачи с файлами примерно на ``size_hint`` байт."""
+    for root in memory_roots():
+        if fits(root, size_hint):
+            return root
+    return tempfile.gettempdir()
+
+
+class Workspace:
+    """Рабочая папка одной задачи."""
+
+    def __init__(self, path, root):
+        self.path = path
+        self.root = root
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def clear(self):
+        """Удалить всё содержимое папки (только файлы этой задачи)."""
+        for entry in os.scandir(self.path):
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+class WorkspacePool:
+    """Hands out one ``Workspace`` per job and reuses released, emptied ones.
+
+    ``acquire`` and ``release`` may be called from any thread. Directories
+    still in the pool are removed when the process exits.
+    """
+
+    def __init__(self, spare=SPARE_WORKSPACES):
+        self.spare = spare
+        self._idle = []
+        self._all = set()
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+        root = choose_root()
+        try:
+            for _ in range(spare):
+                self._idle.append(self._create(root))
+        except OSError:
+            pass
+
+    def _create(self, root):
+        workspace = Workspace(tempfile.mkdtemp(prefix=PREFIX, dir=root), root)
+        with self._lock:
+            self._all.add(workspace.path)
+        return workspace
+
+    def acquire(self, size_hint=0):
+        """Пустая рабочая папка на файловой системе, где поместится ``size_hint`` байт."""
+        root = choose_root(size_hint)
+        with self._lock:
+            for index, workspace in enumerate(self._idle):
+                if workspace.root == root and os.path.isdir(workspace.path):
+                    return self._idle.pop(index)
+        return self._create(root)
+
+    def release(self, workspace):
+        """Вернуть папку задачи: её файлы удаляются, сама папка переиспользуется."""
+        if workspace is None:
+            return
+        try:
+            workspace.clear()
+        except OSError:
+            self._remove(workspace)
+            return
+        with self._lock:
+            if len(self._idle) < self.spare:
+                self._idle.append(workspace)
+                return
+        self._remove(workspace)
+
+    def shutdown(self):
+        with self._lock:
+            paths, self._all, self._idle = self._all, set(), []
+        for path in paths:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def _remove(self, workspace):
+        with self._lock:
+            self._all.discard(workspace.path)
+        shutil.rmtree(workspace.path, ignore_errors=True)
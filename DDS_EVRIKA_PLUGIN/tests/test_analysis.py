@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dds_evrika_plugin import analysis
+from dds_evrika_plugin import cli
+from dds_evrika_plugin.endpoints import np
+
+
+class KnownCompressionTest(unittest.TestCase):
+
+    def test_explicit_format_is_kept(self):
+        self.assertEqual(analysis.known_compression("bc7"), "bc7")
+
+    @unittest.skipIf(np is None, "NumPy is not installed")
+    def test_auto_is_left_to_analysis(self):
+        self.assertIsNone(analysis.known_compression(analysis.AUTO_COMPRESSION))
+
+    def test_auto_without_numpy_falls_back(self):
+        # Без NumPy этапа анализа нет: формат известен заранее
+        with mock.patch.object(analysis, "np", None):
+            self.assertEqual(analysis.known_compression(analysis.AUTO_COMPRESSION),
+                             analysis.FALLBACK_COMPRESSION)
+
+
+class ConvertTaskFallbackTest(unittest.TestCase):
+
+    def test_auto_without_numpy_skips_analysis(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "source.png")
+            with open(source, "wb") as f:
+                f.write(b"not analysed")
+            preset = dict(cli.DEFAULTS, compression=analysis.AUTO_COMPRESSION, backend="magick")
+            task = cli.Task(source, os.path.join(directory, "out.dds"), preset)
+            with mock.patch.object(analysis, "np", None), \
+                    mock.patch.object(analysis, "choose_compression", side_effect=AssertionError("analysed")), \
+                    mock.patch.object(cli.Job, "run_process"):
+                result = cli.convert_task(task)
+        self.assertEqual(result["compression"], analysis.FALLBACK_COMPRESSION)
+        self.assertNotIn("traits", result)
+
+
+if __name__ == "__main__":
+    unittest.main()
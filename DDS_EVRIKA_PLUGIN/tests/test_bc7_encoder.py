@@ -0,0 +1,110 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dds_evrika_plugin.endpoints import np
+
+if np is not None:
+    from dds_evrika_plugin import bc7_encoder
+    from dds_evrika_plugin import dds_decoder
+    from dds_evrika_plugin import dds_encoder
+    from dds_evrika_plugin.dds_decoder import BLOCK_DECODERS
+
+
+def texture(size, alpha):
+    """Плавные градиенты с шумом; ``alpha`` - радиальное затухание с прозрачными вырезами."""
+    rng = np.random.default_rng(size)
+    y, x = np.mgrid[0:size, 0:size] / size
+    image = np.empty((size, size, 4), dtype=np.uint8)
+    image[..., 0] = np.clip(255 * x + rng.normal(0, 6, x.shape), 0, 255)
+    image[..., 1] = np.clip(255 * y + rng.normal(0, 6, y.shape), 0, 255)
+    image[..., 2] = np.where((x * 8).astype(int) % 2, 200, 40)
+    if alpha:
+        falloff = 1.0 - np.hypot(x - 0.5, y - 0.5) * 1.6
+        image[..., 3] = np.clip(255 * falloff, 0, 255)
+        image[(x * 16).astype(int) % 5 == 0, 3] = 0
+    else:
+        image[..., 3] = 255
+    return image
+
+
+def round_trip(image, quality):
+    size = image.shape[0]
+    blocks = image.reshape(size // 4, 4, size // 4, 4, 4).swapaxes(1, 2).reshape(-1, 16, 4)
+    return blocks, BLOCK_DECODERS["BC7"](bc7_encoder.encode_blocks(blocks, quality))
+
+
+def psnr(decoded, source):
+    mse = ((decoded.astype(np.float64) - source) ** 2).mean()
+    return float("inf") if mse == 0 else 10.0 * np.log10(255.0 ** 2 / mse)
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class BC7EncoderTest(unittest.TestCase):
+
+    def test_opaque_stays_opaque(self):
+        image = texture(64, alpha=False)
+        for quality in bc7_encoder.QUALITY_LEVELS:
+            with self.subTest(quality=quality):
+                _, decoded = round_trip(image, quality)
+                self.assertTrue((decoded[..., 3] == 255).all())
+
+    def test_constant_alpha_is_exact(self):
+        image = texture(32, alpha=False)
+        image[..., 3] = 128
+        for quality in bc7_encoder.QUALITY_LEVELS:
+            with self.subTest(quality=quality):
+                _, decoded = round_trip(image, quality)
+                self.assertTrue((decoded[..., 3] == 128).all())
+
+    def test_varying_alpha_beats_mode6(self):
+        # Режимы 4/5 с отдельной альфой должны заметно улучшать альфу по сравнению с одним режимом 6
+        image = texture(64, alpha=True)
+        blocks, _ = round_trip(image, "fast")
+        mode6 = BLOCK_DECODERS["BC7"](bc7_encoder._encode_mode6(blocks.astype(np.float32), 0)[0])
+        for quality in bc7_encoder.QUALITY_LEVELS:
+            with self.subTest(quality=quality):
+                _, decoded = round_trip(image, quality)
+                self.assertGreater(psnr(decoded[..., 3], blocks[..., 3]), psnr(mode6[..., 3], blocks[..., 3]) + 3.0)
+                self.assertGreater(psnr(decoded[..., :3], blocks[..., :3]), psnr(mode6[..., :3], blocks[..., :3]) - 1.0)
+
+    def test_transparent_blocks_keep_zero_alpha(self):
+        image = texture(32, alpha=True)
+        image[:16, :16, 3] = 0
+        for quality in bc7_encoder.QUALITY_LEVELS:
+            with self.subTest(quality=quality):
+                blocks, decoded = round_trip(image, quality)
+                transparent = (blocks[..., 3] == 0).all(axis=1)
+                self.assertTrue((decoded[transparent][..., 3] == 0).all())
+
+    def test_quality_tiers(self):
+        image = texture(64, alpha=False)
+        scores = [psnr(decoded, blocks) for blocks, decoded in
+                  (round_trip(image, quality) for quality in ("fast", "balanced", "thorough"))]
+        self.assertGreater(scores[0], 35.0)
+        self.assertGreaterEqual(scores[1], scores[0])
+        self.assertGreaterEqual(scores[2], scores[1])
+
+    def test_threads_do_not_change_output(self):
+        blocks = round_trip(texture(64, alpha=True), "fast")[0]
+        # Мелкие полосы, чтобы 256 блоков разошлись по нескольким потокам
+        with mock.patch.dict(bc7_encoder.CHUNK_BLOCKS, {"balanced": 16}):
+            single = dds_encoder.encode_blocks(blocks, "BC7", threads=1)
+            threaded = dds_encoder.encode_blocks(blocks, "BC7", threads=4)
+        np.testing.assert_array_equal(single, threaded)
+
+    def test_dds_file(self):
+        image = texture(32, alpha=False)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bc7.dds")
+            dds_encoder.write_dds(path, image, "bc7", "Auto", quality="fast")
+            header, decoded = dds_decoder.decode_file(path)
+        self.assertEqual(header.format, "BC7")
+        self.assertEqual(header.mipmap_count, 6)
+        self.assertEqual(decoded.shape, image.shape)
+        self.assertGreater(psnr(decoded, image), 32.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
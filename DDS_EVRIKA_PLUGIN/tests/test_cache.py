@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+
+from dds_evrika_plugin.cache import ConversionCache, run_cached
+
+
+class ConversionCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def put(self, cache, key, size, used_at):
+        """Записать запись ``size`` байт и выставить ей время использования ``used_at``."""
+        cache.put_with(key, ".dds", lambda path: _write(path, size))
+        path = cache.path(key, ".dds")
+        if os.path.exists(path):
+            os.utime(path, (used_at, used_at))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ConversionCache(self.directory.name, max_bytes=250)
+        self.put(cache, "a", 100, 1)
+        self.put(cache, "b", 100, 2)
+        # Попадание обновляет время использования: теперь самая старая запись - "b"
+        self.assertIsNotNone(cache.get("a", ".dds"))
+        self.put(cache, "c", 100, 3)
+        self.assertIsNotNone(cache.get("a", ".dds"))
+        self.assertIsNone(cache.get("b", ".dds"))
+        self.assertIsNotNone(cache.get("c", ".dds"))
+        self.assertEqual(cache.size(), 200)
+
+    def test_entry_larger_than_limit(self):
+        cache = ConversionCache(self.directory.name, max_bytes=50)
+        self.put(cache, "a", 100, 1)
+        self.assertIsNone(cache.get("a", ".dds"))
+        self.assertEqual(cache.size(), 0)
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = ConversionCache(self.directory.name, max_bytes=0)
+        self.put(cache, "a", 10, 1)
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_run_cached(self):
+        cache = ConversionCache(os.path.join(self.directory.name, "cache"))
+        target = os.path.join(self.directory.name, "out.dds")
+        calls = []
+
+        def convert():
+            calls.append(1)
+            _write(target, 10)
+
+        self.assertFalse(run_cached(cache, lambda: "key", ".dds", target, convert))
+        os.remove(target)
+        self.assertTrue(run_cached(cache, lambda: "key", ".dds", target, convert))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(os.path.getsize(target), 10)
+
+
+def _write(path, size):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from dds_evrika_plugin.dds_format import DDSFormatError, build_header
+from dds_evrika_plugin.endpoints import np
+
+if np is not None:
+    from dds_evrika_plugin import dds_decoder
+
+
+def bc1_block(color0, color1, indices):
+    """Блок BC1 из двух цветов 5:6:5 и 16 индексов (по строкам)."""
+    bits = sum(index << (2 * pixel) for pixel, index in enumerate(indices))
+    return struct.pack("<HHI", color0, color1, bits)
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class DDSDecoderTest(unittest.TestCase):
+
+    def test_bc1_palette(self):
+        # Красный и синий в режиме 4 цветов: индексы 2 и 3 - интерполяция 2/3 и 1/3
+        data = build_header(4, 4, "BC1") + bc1_block(0xF800, 0x001F, [0, 1, 2, 3] * 4)
+        header, rgba = dds_decoder.decode_bytes(data)
+        self.assertEqual(header.format, "BC1")
+        self.assertEqual(rgba.shape, (4, 4, 4))
+        expected = [[255, 0, 0, 255], [0, 0, 255, 255], [170, 0, 85, 255], [85, 0, 170, 255]]
+        for row in rgba:
+            self.assertEqual(row.tolist(), expected)
+
+    def test_bc1_transparent_index(self):
+        # color0 <= color1: режим 3 цветов, индекс 3 - прозрачный чёрный
+        data = build_header(4, 4, "BC1") + bc1_block(0x001F, 0xF800, [3] * 8 + [0] * 8)
+        rgba = dds_decoder.decode_bytes(data)[1]
+        self.assertTrue((rgba[:2] == 0).all())
+        self.assertEqual(rgba[2:].reshape(-1, 4).tolist(), [[0, 0, 255, 255]] * 8)
+
+    def test_bgra8_is_exact(self):
+        rng = np.random.default_rng(3)
+        image = rng.integers(0, 256, (6, 10, 4), dtype=np.uint8)
+        data = build_header(10, 6, "BGRA8") + image[..., [2, 1, 0, 3]].tobytes()
+        rgba = dds_decoder.decode_bytes(data)[1]
+        np.testing.assert_array_equal(rgba, image)
+
+    def test_edge_blocks_are_cropped(self):
+        # 6x5 пикселей занимают 2x2 блока; лишние пиксели отбрасываются
+        block = bc1_block(0xFFFF, 0xFFFF, [0] * 16)
+        rgba = dds_decoder.decode_bytes(build_header(6, 5, "BC1") + block * 4)[1]
+        self.assertEqual(rgba.shape, (5, 6, 4))
+        self.assertTrue((rgba == 255).all())
+
+    def test_mip_level(self):
+        top = bc1_block(0xF800, 0xF800, [0] * 16) * 4
+        level1 = bc1_block(0x07E0, 0x07E0, [0] * 16)
+        level2 = bc1_block(0x001F, 0x001F, [0] * 16)
+        data = build_header(8, 8, "BC1", 3) + top + level1 + level2
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "mips.dds")
+            with open(path, "wb") as f:
+                f.write(data)
+            header, rgba = dds_decoder.decode_file(path, level=1)
+            self.assertEqual(header.mipmap_count, 3)
+            self.assertEqual(rgba.shape, (4, 4, 4))
+            self.assertEqual(rgba[0, 0].tolist(), [0, 255, 0, 255])
+            self.assertEqual(dds_decoder.decode_file(path, level=2)[1].shape, (2, 2, 4))
+
+    def test_truncated_file(self):
+        data = build_header(8, 8, "BC1") + bc1_block(0, 0, [0] * 16)
+        with self.assertRaises(DDSFormatError):
+            dds_decoder.decode_bytes(data)
+
+
+if __name__ == "__main__":
+    unittest.main()
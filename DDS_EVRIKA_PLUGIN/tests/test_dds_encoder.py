@@ -0,0 +1,88 @@
+import os
+import tempfile
+import unittest
+
+from dds_evrika_plugin.endpoints import np
+
+if np is not None:
+    from dds_evrika_plugin import dds_decoder
+    from dds_evrika_plugin import dds_encoder
+
+
+def gradient(width, height, alpha):
+    """Плавный градиент; ``alpha`` - "opaque", "binary" (вырезы) или "smooth"."""
+    y, x = np.mgrid[0:height, 0:width]
+    image = np.empty((height, width, 4), dtype=np.uint8)
+    image[..., 0] = x * 255 // max(1, width - 1)
+    image[..., 1] = y * 255 // max(1, height - 1)
+    image[..., 2] = 128
+    if alpha == "binary":
+        image[..., 3] = np.where((x // 8 + y // 8) % 2, 255, 0)
+    elif alpha == "smooth":
+        image[..., 3] = (x + y) * 255 // max(1, width + height - 2)
+    else:
+        image[..., 3] = 255
+    return image
+
+
+def psnr(decoded, source):
+    mse = ((decoded.astype(np.float64) - source) ** 2).mean()
+    return float("inf") if mse == 0 else 10.0 * np.log10(255.0 ** 2 / mse)
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class DDSEncoderTest(unittest.TestCase):
+
+    def export(self, image, compression, mipmaps="0"):
+        """Записать DDS во временный файл и прочитать обратно (header, rgba)."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "out.dds")
+            dds_encoder.write_dds(path, image, compression, mipmaps)
+            return dds_decoder.decode_file(path)
+
+    def test_formats_round_trip(self):
+        # BC1 хранит только 1-битную альфу: его цвет проверяется на непрозрачном изображении
+        for compression, fmt, alpha, min_alpha_psnr in (("dxt1", "BC1", "opaque", None),
+                                                        ("dxt3", "BC2", "smooth", 30.0),
+                                                        ("dxt5", "BC3", "smooth", 40.0)):
+            with self.subTest(compression=compression):
+                image = gradient(64, 48, alpha)
+                header, decoded = self.export(image, compression)
+                self.assertEqual(header.format, fmt)
+                self.assertEqual(decoded.shape, image.shape)
+                self.assertGreater(psnr(decoded[..., :3], image[..., :3]), 34.0)
+                if min_alpha_psnr is not None:
+                    self.assertGreater(psnr(decoded[..., 3], image[..., 3]), min_alpha_psnr)
+
+    def test_bc1_keeps_binary_alpha(self):
+        image = gradient(32, 32, "binary")
+        decoded = self.export(image, "dxt1")[1]
+        np.testing.assert_array_equal(decoded[..., 3], image[..., 3])
+
+    def test_bc2_alpha_is_four_bit(self):
+        image = gradient(32, 32, "smooth")
+        decoded = self.export(image, "dxt3")[1]
+        self.assertLessEqual(int(np.abs(decoded[..., 3].astype(int) - image[..., 3]).max()), 8)
+
+    def test_solid_color_is_exact(self):
+        image = np.empty((8, 8, 4), dtype=np.uint8)
+        image[:] = (255, 0, 255, 255)
+        for compression in ("dxt1", "dxt3", "dxt5"):
+            with self.subTest(compression=compression):
+                np.testing.assert_array_equal(self.export(image, compression)[1], image)
+
+    def test_mip_chain(self):
+        header, decoded = self.export(gradient(16, 8, "opaque"), "dxt5", "Auto")
+        self.assertEqual(header.mipmap_count, 5)
+        self.assertEqual(decoded.shape, (8, 16, 4))
+
+    def test_odd_size_has_no_mipmaps(self):
+        # Как и ImageMagick, mip-уровни строятся только для размеров - степеней двойки
+        image = np.ascontiguousarray(gradient(64, 64, "opaque")[:7, :13])
+        header, decoded = self.export(image, "dxt5", "Auto")
+        self.assertEqual((header.width, header.height, header.mipmap_count), (13, 7, 1))
+        self.assertGreater(psnr(decoded, image), 34.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
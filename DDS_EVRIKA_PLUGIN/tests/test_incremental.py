@@ -0,0 +1,77 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dds_evrika_plugin.endpoints import np
+
+if np is not None:
+    from dds_evrika_plugin import dds_encoder
+    from dds_evrika_plugin import incremental
+
+
+def painting(size, seed):
+    rng = np.random.default_rng(seed)
+    image = rng.integers(0, 256, (size, size, 4), dtype=np.uint8)
+    image[..., 3] = 255
+    return image
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class IncrementalExportTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        # Индексы - во временной папке, а не в кэше пользователя
+        patcher = mock.patch.object(incremental, "index_dir", return_value=os.path.join(self.directory, "index"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.target = os.path.join(self.directory, "texture.dds")
+        self.reference = os.path.join(self.directory, "reference.dds")
+
+    def assert_matches_full_export(self, image, compression, mipmaps, **options):
+        dds_encoder.write_dds(self.reference, image, compression, mipmaps, **options)
+        self.assertEqual(read(self.target), read(self.reference))
+
+    def test_patched_file_matches_full_export(self):
+        for compression in ("dxt1", "dxt5", "bc7"):
+            with self.subTest(compression=compression):
+                image = painting(64, 1)
+                total = incremental.write_dds(self.target, image, compression, "Auto", quality="fast")
+                image[8:16, 20:28] = (255, 0, 0, 255)
+                changed = incremental.write_dds(self.target, image, compression, "Auto", quality="fast")
+                self.assertGreater(changed, 0)
+                self.assertLess(changed, total // 4)
+                self.assert_matches_full_export(image, compression, "Auto", quality="fast")
+
+    def test_unchanged_image_encodes_nothing(self):
+        image = painting(32, 2)
+        incremental.write_dds(self.target, image, "dxt5", "Auto")
+        self.assertEqual(incremental.write_dds(self.target, image, "dxt5", "Auto"), 0)
+        self.assert_matches_full_export(image, "dxt5", "Auto")
+
+    def test_changed_settings_export_everything(self):
+        image = painting(32, 3)
+        total = incremental.write_dds(self.target, image, "dxt5", "Auto")
+        self.assertEqual(incremental.write_dds(self.target, image, "dxt5", "Auto", mip_filter="Lanczos"), total)
+        self.assert_matches_full_export(image, "dxt5", "Auto", mip_filter="Lanczos")
+
+    def test_file_changed_elsewhere_is_rewritten(self):
+        image = painting(32, 4)
+        total = incremental.write_dds(self.target, image, "dxt1", "0")
+        dds_encoder.write_dds(self.target, painting(32, 5), "dxt1", "0")
+        # Тот же размер файла: изменение видно только по времени записи
+        os.utime(self.target, (1, 1))
+        self.assertEqual(incremental.write_dds(self.target, image, "dxt1", "0"), total)
+        self.assert_matches_full_export(image, "dxt1", "0")
+
+
+if __name__ == "__main__":
+    unittest.main()
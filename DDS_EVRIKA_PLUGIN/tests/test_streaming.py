@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+from dds_evrika_plugin.endpoints import np
+
+if np is not None:
+    from dds_evrika_plugin import dds_encoder
+    from dds_evrika_plugin import streaming
+
+
+def texture(width, height):
+    rng = np.random.default_rng(width * height)
+    y, x = np.mgrid[0:height, 0:width]
+    image = np.empty((height, width, 4), dtype=np.uint8)
+    image[..., 0] = x * 255 // (width - 1)
+    image[..., 1] = y * 255 // (height - 1)
+    image[..., 2] = rng.integers(0, 256, (height, width))
+    image[..., 3] = (x * 7 + y * 3) % 256
+    return image
+
+
+def strips(image, rows):
+    for y in range(0, image.shape[0], rows):
+        yield image[y:y + rows]
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class StreamingExportTest(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.streamed = os.path.join(directory.name, "streamed.dds")
+        self.full = os.path.join(directory.name, "full.dds")
+
+    def assert_identical(self, image, rows, compression, mipmaps, **options):
+        height, width = image.shape[:2]
+        streaming.write_dds(self.streamed, width, height, strips(image, rows), compression, mipmaps, **options)
+        dds_encoder.write_dds(self.full, image, compression, mipmaps, **options)
+        self.assertEqual(read(self.streamed), read(self.full))
+
+    def test_formats_match_full_export(self):
+        image = texture(64, 64)
+        for compression in ("dxt1", "dxt3", "dxt5", "bc7", "none"):
+            with self.subTest(compression=compression):
+                self.assert_identical(image, 8, compression, "Auto", quality="fast")
+
+    def test_filters_match_full_export(self):
+        # Фильтры с широким ядром читают строки соседних полос
+        image = texture(64, 32)
+        for mip_filter in ("Box", "Lanczos", "Mitchell"):
+            for linear in (False, True):
+                with self.subTest(mip_filter=mip_filter, linear=linear):
+                    self.assert_identical(image, 4, "dxt5", "Auto", mip_filter=mip_filter, linear=linear)
+
+    def test_odd_size_and_short_last_strip(self):
+        self.assert_identical(texture(30, 23), 8, "dxt1", "Auto")
+
+    def test_missing_rows_fail_without_output(self):
+        image = texture(16, 16)
+        with self.assertRaises(ValueError):
+            streaming.write_dds(self.streamed, 16, 16, strips(image[:8], 4), "dxt1", "0")
+        self.assertFalse(os.path.exists(self.streamed))
+        self.assertFalse(os.path.exists(self.streamed + ".part"))
+
+
+if __name__ == "__main__":
+    unittest.main()